@@ -0,0 +1,440 @@
+"""Local HTTP scoring API for the IUP Performance Comparison application.
+
+Serves the dashboard's scoring to planning and BI tools without Streamlit:
+
+- ``GET /parameters``: the parameter registry, category weights and adjustment levels
+- ``POST /score``: score one or many scenarios per call (JSON or CSV body)
+- ``GET /scores``: scores of the stored current inputs (``?iups=A,B&method=minmax``)
+- ``GET /rankings``: best or worst IUPs of the stored inputs (``?target=final&k=10&order=top``)
+- ``GET /stats``: request counts and p50/p95/p99 latency per endpoint
+
+``POST /score`` takes a scenario in any ``importer`` layout: a CSV body
+(``Content-Type: text/csv``), a JSON list of row records or an ``{iup: ...}``
+mapping, or several at once as ``{"scenarios": {name: scenario}, "method": ...}``.
+Result tables are JSON columns (``?orient=records`` for row objects), or an
+Arrow IPC stream with ``Accept: application/vnd.apache.arrow.stream``
+(or ``?format=arrow``).
+
+The registry metadata is encoded once at startup, and the stored inputs are
+scored once per store revision and normalization method, then served from
+memory until the store changes.
+
+Usage:
+    python api.py [--host 127.0.0.1] [--port 8770]
+"""
+
+import argparse
+import io
+import itertools
+import json
+import socket
+import sys
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+import numpy as np
+from batch_score import COLUMNS, arrow_table, score_imported
+from config import ADJUSTMENT_LEVELS, API_CONFIG, CATEGORY_WEIGHTS, LABELS, NORMALIZATION_METHODS
+from importer import ImportedData, parse_json, read_csv
+from profiling import Profiler
+from ranking import FINAL, RankingIndex
+from registry import REGISTRY
+
+JSON_TYPE = 'application/json'
+ARROW_TYPE = 'application/vnd.apache.arrow.stream'
+CSV_TYPE = 'text/csv'
+DEFAULT_SCENARIO = 'default'
+
+
+def parameter_metadata():
+    """Get the registry as a JSON-ready dict (categories, parameters, adjustment levels)."""
+    return {
+        'categories': [
+            {
+                'key': category,
+                'name': LABELS['categories'].get(category, category),
+                'weight': CATEGORY_WEIGHTS[category],
+                'subcategories': [
+                    subcategory for owner, subcategory in REGISTRY.subcategories if owner == category
+                ]
+            }
+            for category in REGISTRY.categories
+        ],
+        'parameters': [
+            {
+                'key': spec.key,
+                'name': spec.name,
+                'unit': spec.unit,
+                'weight': spec.weight,
+                'optimal_direction': spec.optimal_direction,
+                'category': spec.category,
+                'subcategory': spec.subcategory,
+                'tooltip': spec.tooltip
+            }
+            for spec in REGISTRY.specs
+        ],
+        'adjustments': [
+            {'key': key, 'label': LABELS['adjustments'][key], 'multiplier': multiplier}
+            for key, multiplier in ADJUSTMENT_LEVELS.items()
+        ],
+        'normalization_methods': list(NORMALIZATION_METHODS)
+    }
+
+
+def _concat_columns(results):
+    """Join result columns of several scenarios into one set of columns."""
+    if len(results) == 1:
+        return results[0]
+    return {
+        name: (
+            [cell for columns in results for cell in columns[name]]
+            if isinstance(results[0][name], list)
+            else np.concatenate([columns[name] for columns in results])
+        )
+        for name in COLUMNS
+    }
+
+
+def _jsonable(column):
+    return column.tolist() if isinstance(column, np.ndarray) else column
+
+
+class Table:
+    """A columnar response, encoded as JSON or an Arrow IPC stream on the way out."""
+
+    def __init__(self, columns, meta=None):
+        self.columns = columns
+        self.meta = meta or {}
+
+    def __len__(self):
+        return len(next(iter(self.columns.values()), ()))
+
+    def to_json(self, orient='columns'):
+        data = {name: _jsonable(column) for name, column in self.columns.items()}
+        if orient == 'records':
+            data = [dict(zip(data, row)) for row in zip(*data.values())]
+        return {**self.meta, 'rows': len(self), 'columns': list(self.columns), 'data': data}
+
+    def to_arrow(self):
+        import pyarrow as pa
+
+        if list(self.columns) == COLUMNS:
+            table = arrow_table(self.columns)
+        else:
+            table = pa.table(self.columns)
+        table = table.replace_schema_metadata({key: json.dumps(value) for key, value in self.meta.items()})
+        sink = pa.BufferOutputStream()
+        with pa.ipc.new_stream(sink, table.schema) as writer:
+            writer.write_table(table)
+        return sink.getvalue().to_pybytes()
+
+
+class ScoringAPI:
+    """Route handling independent of HTTP, with the data kept resident between requests.
+
+    ``handle`` returns ``(status, content_type, body)``. Every request is
+    timed as one profiled "rerun" of ``profiler``, under the stage
+    ``'<METHOD> <path>'``.
+    """
+
+    def __init__(self, store=None, window=API_CONFIG['window']):
+        self._store = store
+        self._parameters = json.dumps(parameter_metadata(), separators=(',', ':')).encode()
+        self._reference = {}
+        self._lock = threading.Lock()
+        self._requests = itertools.count(1)
+        self.profiler = Profiler(window)
+        self.routes = {
+            ('GET', '/parameters'): self.parameters,
+            ('POST', '/score'): self.score,
+            ('GET', '/scores'): self.scores,
+            ('GET', '/rankings'): self.rankings,
+            ('GET', '/stats'): self.stats,
+            ('GET', '/health'): lambda request: {'status': 'ok'}
+        }
+
+    @property
+    def store(self):
+        if self._store is None:
+            from storage import Store
+
+            self._store = Store()
+        return self._store
+
+    # Reference data
+
+    def reference(self, method):
+        """Get ``(columns, ranking)`` of the stored current inputs, rebuilt only when the store changed."""
+        revision = self.store.revision()
+        with self._lock:
+            cached = self._reference.get(method)
+        if cached is not None and cached[0] == revision:
+            return cached[1], cached[2]
+
+        iups = [name for name, _ in self.store.iups()]
+        values, adjustments = self.store.load_matrix(iups)
+        rows = np.flatnonzero(~np.isnan(values).all(axis=1))
+        imported = ImportedData.from_rows([iups[row] for row in rows], values[rows], adjustments[rows])
+        columns = score_imported(imported, 'stored', method)
+        ranking = RankingIndex(
+            columns['iup'],
+            imported.values,
+            np.column_stack([columns[category] for category in REGISTRY.categories]),
+            columns['final_score']
+        )
+        with self._lock:
+            self._reference[method] = (revision, columns, ranking)
+        return columns, ranking
+
+    def warm_up(self):
+        """Score the stored inputs and a dated CSV row once, so first requests skip that setup."""
+        self.reference('minmax')
+        score_imported(read_csv(io.BytesIO(b'iup,period,adjustment,' + REGISTRY.keys[0].encode() + b'\nA,2024-01,NORMAL,1\n')), '')
+        self.profiler.reset()
+
+    # Routes
+
+    def parameters(self, request):
+        return self._parameters
+
+    def score(self, request):
+        method = request.param('method', 'minmax')
+        if request.content_type == CSV_TYPE:
+            scenarios = {request.param('scenario', DEFAULT_SCENARIO): read_csv(io.BytesIO(request.body))}
+        else:
+            payload = json.loads(request.body or b'null')
+            if isinstance(payload, dict) and 'scenarios' in payload:
+                method = payload.get('method', method)
+                scenarios = payload['scenarios']
+                if not isinstance(scenarios, dict):
+                    raise ValueError("'scenarios' must map scenario names to scenarios")
+            else:
+                scenarios = {request.param('scenario', DEFAULT_SCENARIO): payload}
+            if not scenarios:
+                raise ValueError("No scenarios to score")
+            scenarios = {name: parse_json(scenario) for name, scenario in scenarios.items()}
+
+        _check_method(method)
+        results = [score_imported(imported, str(name), method) for name, imported in scenarios.items()]
+        return Table(_concat_columns(results), {'method': method, 'scenarios': len(results)})
+
+    def scores(self, request):
+        method = _check_method(request.param('method', 'minmax'))
+        columns, _ = self.reference(method)
+        iups = request.param('iups')
+        if iups:
+            index = {iup: row for row, iup in enumerate(columns['iup'])}
+            wanted = [iup.strip() for iup in iups.split(',')]
+            missing = [iup for iup in wanted if iup not in index]
+            if missing:
+                raise KeyError(f"No stored inputs for: {', '.join(missing)}")
+            rows = [index[iup] for iup in wanted]
+            columns = {
+                name: [column[row] for row in rows] if isinstance(column, list) else column[rows]
+                for name, column in columns.items()
+            }
+        return Table(columns, {'method': method})
+
+    def rankings(self, request):
+        method = _check_method(request.param('method', 'minmax'))
+        target = request.param('target', FINAL)
+        if target != FINAL and target not in REGISTRY and target not in REGISTRY.categories:
+            raise KeyError(f"Unknown ranking target: {target}")
+        k = int(request.param('k', 10))
+        order = request.param('order', 'top')
+        if order not in ('top', 'bottom'):
+            raise ValueError("'order' must be 'top' or 'bottom'")
+
+        _, ranking = self.reference(method)
+        entries = ranking.top_k(target, k) if order == 'top' else ranking.bottom_k(target, k)
+        iups = [iup for iup, _ in entries]
+        return Table(
+            {
+                'rank': [ranking.rank(iup, target) for iup in iups],
+                'iup': iups,
+                'value': [value for _, value in entries]
+            },
+            {'method': method, 'target': target, 'order': order}
+        )
+
+    def stats(self, request):
+        stages = self.profiler.stats()
+        overall = stages.pop('rerun', None)
+        return {'requests': self.profiler.reruns, 'all': overall, 'endpoints': stages}
+
+    # Dispatch
+
+    def handle(self, method, target, body=b'', headers=None):
+        """Serve one request; returns ``(status, content_type, body)``."""
+        request = Request(method, target, body, headers or {})
+        route = self.routes.get((method, request.path))
+        self.profiler.start_rerun('api', next(self._requests))
+        try:
+            with self.profiler.span(f"{method} {request.path}" if route else 'unrouted'):
+                if route is None:
+                    known = any(path == request.path for _, path in self.routes)
+                    return _error(405 if known else 404, f"No route for {method} {request.path}")
+                try:
+                    result = route(request)
+                except KeyError as exc:
+                    return _error(404, str(exc.args[0]) if exc.args else 'Not found')
+                except (ValueError, TypeError, AttributeError) as exc:
+                    return _error(400, f"{type(exc).__name__}: {exc}")
+                return _encode(result, request)
+        finally:
+            self.profiler.finish_rerun()
+
+
+class Request:
+    """The parts of an HTTP request the routes read."""
+
+    __slots__ = ('method', 'path', 'query', 'body', 'headers')
+
+    def __init__(self, method, target, body, headers):
+        url = urlsplit(target)
+        self.method = method
+        self.path = url.path.rstrip('/') or '/'
+        self.query = parse_qs(url.query)
+        self.body = body
+        self.headers = headers
+
+    def param(self, name, default=None):
+        values = self.query.get(name)
+        return values[-1] if values else default
+
+    def header(self, name):
+        return self.headers.get(name) or self.headers.get(name.lower()) or ''
+
+    @property
+    def content_type(self):
+        return self.header('Content-Type').split(';')[0].strip().lower()
+
+    @property
+    def wants_arrow(self):
+        return self.param('format') == 'arrow' or ARROW_TYPE in self.header('Accept')
+
+
+def _check_method(method):
+    if method not in NORMALIZATION_METHODS:
+        raise ValueError(f"Unknown normalization method: {method}")
+    return method
+
+
+def _error(status, message):
+    return status, JSON_TYPE, json.dumps({'error': message}).encode()
+
+
+def _encode(result, request):
+    if isinstance(result, bytes):
+        return 200, JSON_TYPE, result
+    if isinstance(result, Table):
+        if request.wants_arrow:
+            return 200, ARROW_TYPE, result.to_arrow()
+        result = result.to_json(request.param('orient', 'columns'))
+    return 200, JSON_TYPE, json.dumps(result, separators=(',', ':')).encode()
+
+
+class APIRequestHandler(BaseHTTPRequestHandler):
+    """Keep-alive HTTP/1.1 front end of ``server.api``."""
+
+    protocol_version = 'HTTP/1.1'
+    server_version = 'IUPScoringAPI/1.0'
+    # Headers and body are separate writes; Nagle would hold the body for the client's delayed ACK
+    disable_nagle_algorithm = True
+
+    def _serve(self, method):
+        try:
+            length = int(self.headers.get('Content-Length') or 0)
+        except ValueError:
+            length = -1
+        if length < 0:
+            # Without a usable length the body cannot be skipped, so the connection ends here
+            status, content_type, body = _error(400, "Invalid Content-Length")
+            self.close_connection = True
+        elif length > API_CONFIG['max_body_bytes']:
+            status, content_type, body = _error(413, "Request body too large")
+            self.close_connection = True
+        else:
+            status, content_type, body = self.server.api.handle(
+                method, self.path, self.rfile.read(length) if length else b'', self.headers
+            )
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        self._serve('GET')
+
+    def do_POST(self):
+        self._serve('POST')
+
+    def log_message(self, format, *args):
+        # Per-request latency is in /stats; access logging would dominate small requests
+        pass
+
+
+class APIServer(ThreadingHTTPServer):
+    """One thread per connection, sharing one ``ScoringAPI``.
+
+    With ``reuse_port`` several server processes can bind the same port and
+    the kernel spreads connections across them (``SO_REUSEPORT``).
+    """
+
+    daemon_threads = True
+    request_queue_size = 128
+
+    def __init__(self, address, api=None, reuse_port=False):
+        self.allow_reuse_port = reuse_port
+        super().__init__(address, APIRequestHandler)
+        self.api = api or ScoringAPI()
+
+
+def serve(host, port, reuse_port=False):
+    """Run one server process until interrupted."""
+    server = APIServer((host, port), reuse_port=reuse_port)
+    server.api.warm_up()
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Serve IUP scoring, parameters and rankings over local HTTP.")
+    parser.add_argument('--host', default=API_CONFIG['host'])
+    parser.add_argument('--port', type=int, default=API_CONFIG['port'])
+    parser.add_argument('--workers', type=int, default=API_CONFIG['workers'],
+                        help="Server processes sharing the port; each reports its own /stats")
+    args = parser.parse_args(argv)
+    if args.workers > 1 and not hasattr(socket, 'SO_REUSEPORT'):
+        parser.error("--workers needs SO_REUSEPORT, which this platform lacks")
+
+    import multiprocessing
+    import signal
+
+    # Stop (and stop the workers) on SIGTERM the way Ctrl-C does
+    signal.signal(signal.SIGTERM, signal.default_int_handler)
+    # Scoring holds the GIL, so extra processes are what scale with concurrent clients
+    workers = [
+        multiprocessing.Process(target=serve, args=(args.host, args.port, True), daemon=True)
+        for _ in range(args.workers - 1)
+    ]
+    for worker in workers:
+        worker.start()
+    print(
+        f"Serving the IUP scoring API on http://{args.host}:{args.port} with {args.workers} process(es)",
+        file=sys.stderr
+    )
+    serve(args.host, args.port, args.workers > 1)
+    for worker in workers:
+        worker.terminate()
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -1,20 +1,35 @@
 """Main Streamlit application for IUP Performance Comparison."""
 
 import streamlit as st
-import pandas as pd
+import numpy as np
+from contextlib import contextmanager
 from datetime import datetime
-import json
+from uuid import uuid4
 
+from cache import FIGURE_CACHE
 from config import (
-    IUP_LIST, ADJUSTMENT_LEVELS, ADJUSTMENT_DESCRIPTIONS,
-    THEME, LABELS
+    ADJUSTMENT_LEVELS, ADJUSTMENT_DESCRIPTIONS, THEME, LABELS,
+    SENSITIVITY_CONFIG, NORMALIZATION_METHODS, LEADERBOARD_SIZE, IUP_DISPLAY_CONFIG,
+    PROFILING_CONFIG, TELEMETRY_CONFIG
 )
-from parameters import PARAMETERS
-from utils import calculate_category_score, calculate_final_score, format_number
+from history import HistoryStore
+from importer import ImportedData, read_table
+from iups import load_iup_registry
+from profiling import PROFILER
+from ranking import FINAL, RankingIndex
+from registry import ADJUSTMENT_CODES, REGISTRY
+from scoring import ScoringState
+from session import SessionData
+from snapshots import SUFFIX, build_metadata, diff_snapshots, read_snapshot, snapshot_bytes
+from storage import Store, check_periods
+from sensitivity import run_sensitivity
+from utils import format_number
 from visualization import (
     create_radar_chart,
-    create_bar_chart,
-    create_comparison_table
+    update_radar_chart,
+    create_trend_chart,
+    create_comparison_table,
+    create_rank_probability_chart
 )
 
 # Page configuration
@@ -38,138 +53,999 @@ st.markdown(f"""
     </style>
 """, unsafe_allow_html=True)
 
-def main():
-    st.title(f"⛏️ {LABELS['title']}")
+@st.cache_resource
+def get_store():
+    """Get the SQLite store shared by all sessions."""
+    return Store()
+
+@st.cache_resource
+def get_iup_registry():
+    """Get the IUP registry shared by all sessions, including every stored IUP."""
+    registry = load_iup_registry()
+    stored = get_store().iups()
+    registry.add([name for name, _ in stored], [group for _, group in stored])
+    get_store().add_iups(registry.names, registry.groups)
+    return registry
+
+@st.cache_resource(max_entries=2)
+def load_history(revision):
+    """Build the history cube of the stored monthly data for one history revision."""
+    return HistoryStore.from_imported(get_store().load_history())
+
+def get_history():
+    """Get the history cube, shared by all sessions until dated data changes."""
+    return load_history(get_store().revision('history_revision'))
+
+def sync_iups(registry, scoring):
+    """Add session rows for IUPs registered since this session started."""
+    if len(scoring.iups) < len(registry):
+        scoring.add_iups(registry.names[len(scoring.iups):])
+
+def drop_widget_state(iups):
+    """Forget input widget state so widgets show the stored inputs again."""
+    for iup in iups:
+        for spec in REGISTRY.specs:
+            st.session_state.pop(f"{iup}_{spec.key}", None)
+            st.session_state.pop(f"{iup}_{spec.key}_adj", None)
+
+def sync_store(registry, scoring):
+    """Reload the inputs other sessions stored since this session last read the store.
+
+    Returns the IUPs whose rows were replaced.
+    """
+    store = get_store()
+    revision = store.revision()
+    if st.session_state.get('store_revision') == revision:
+        return []
     
-    # Sidebar
-    st.sidebar.header(LABELS['settings'])
-    selected_iups = st.sidebar.multiselect(
-        LABELS['select_iups'],
-        IUP_LIST,
-        default=IUP_LIST[:2]
+    stored = store.iups()
+    registry.add([name for name, _ in stored], [group for _, group in stored])
+    sync_iups(registry, scoring)
+    
+    values, adjustments = store.load_matrix(scoring.iups)
+    present = ~np.isnan(values)
+    changed = (
+        ~((values == scoring.values) | (~present & np.isnan(scoring.values)))
+        | (present & (adjustments != scoring.adjustments))
     )
+    rows = np.flatnonzero(changed.any(axis=1))
+    if len(rows):
+        iups = [scoring.iups[row] for row in rows]
+        scoring.set_rows(iups, values[rows], adjustments[rows])
+        drop_widget_state(iups)
+    else:
+        iups = []
+    st.session_state.store_revision = revision
+    return iups
+
+@st.cache_resource
+def get_telemetry():
+    """Start the live telemetry service shared by all sessions (``TELEMETRY_CONFIG``)."""
+    from telemetry import TelemetryService
     
-    # Main content
-    if not selected_iups:
-        st.warning("Silakan pilih minimal satu IUP untuk dianalisis.")
-        return
+    registry = get_iup_registry()
+    # Only IUPs already registered: a misspelled event must not add an IUP for every session
+    return TelemetryService.from_config(TELEMETRY_CONFIG, iups=registry.names, known=registry).start()
+
+def sync_telemetry(registry, scoring):
+    """Apply the KPI values published since this session last applied them, one column at a time.
+
+    Returns the IUPs that changed.
+    """
+    from kpi import KPI_KEYS
     
-    # Initialize session state for storing data
-    if 'data' not in st.session_state:
-        st.session_state.data = {iup: {} for iup in IUP_LIST}
+    version, iups, _, values = get_telemetry().live.changes_since(st.session_state.get('telemetry_version', 0))
+    st.session_state.telemetry_version = version
+    known = [row for row, iup in enumerate(iups) if iup in registry.index]
+    if not known:
+        return []
     
-    # Create tabs for different sections
-    tabs = st.tabs([
-        LABELS['tabs']['input'],
-        LABELS['tabs']['analysis'],
-        LABELS['tabs']['comparison']
-    ])
+    iups, values = [iups[row] for row in known], values[known]
+    sync_iups(registry, scoring)
+    for col, key in enumerate(KPI_KEYS):
+        # KPIs without data yet this month (e.g. no fuel tickets) keep their current value
+        rows = np.flatnonzero(~np.isnan(values[:, col]))
+        if len(rows):
+            scoring.set_values([iups[row] for row in rows], key, values[rows, col])
+    drop_widget_state(iups)
+    return iups
+
+def persisted():
+    """Skip reloading this session's own store write, unless another session also wrote."""
+    revision = get_store().last_revision()
+    if revision is not None and revision == st.session_state.get('store_revision', -1) + 1:
+        st.session_state.store_revision = revision
+
+def group_label(group):
+    """Get the display label of an IUP group."""
+    return group or LABELS['iups']['ungrouped']
+
+def group_means(iups, matrix):
+    """Average the per-IUP rows of ``matrix`` per group; returns ``(labels, means)``."""
+    groups, means = get_iup_registry().aggregate(iups, matrix)
+    return [group_label(group) for group in groups], means
+
+def aggregating():
+    """Check whether charts and tables show group averages instead of IUPs."""
+    return st.session_state.get('aggregate_groups', False)
+
+def paginate_iups(iups, key):
+    """Get the page of ``iups`` to render, with a page selector for large selections."""
+    page_size = IUP_DISPLAY_CONFIG['page_size']
+    if len(iups) <= page_size:
+        return iups
+    
+    pages = -(-len(iups) // page_size)
+    page = st.number_input(LABELS['iups']['page'], min_value=1, max_value=pages, value=1, key=f"{key}_page")
+    start = (int(page) - 1) * page_size
+    end = min(start + page_size, len(iups))
+    st.caption(LABELS['iups']['page_caption'].format(start=start + 1, end=end, total=len(iups)))
+    return iups[start:end]
+
+def store_input(iup, category, param_key, value, adjustment):
+    """Store one changed input in session state and the database, rescoring only what changed."""
+    inputs = st.session_state.data[iup].setdefault(category)
+    entry = {'value': value, 'adjustment': adjustment}
+    if inputs.get(param_key) == entry:
+        return
     
-    # Input Parameters Tab
-    with tabs[0]:
-        st.header(LABELS['tabs']['input'])
+    inputs[param_key] = entry
+    get_store().set_cell(iup, param_key, value, ADJUSTMENT_CODES[adjustment])
+    persisted()
+
+def current_input(iup, category, param_key):
+    """Get the stored input for a parameter, or the widget defaults."""
+    return st.session_state.data[iup].get(category, {}).get(param_key, {
+        'value': 0.0,
+        'adjustment': list(ADJUSTMENT_LEVELS.keys())[0]
+    })
+
+def render_field_inputs(selected_iups, scoring):
+    """Render one number input and one selectbox per parameter per IUP."""
+    adjustment_keys = list(ADJUSTMENT_LEVELS.keys())
+    
+    for category in REGISTRY.categories:
+        st.subheader(LABELS['categories'][category])
+        cols = st.columns(len(selected_iups))
         
-        for category, subcategories in PARAMETERS.items():
-            st.subheader(LABELS['categories'][category])
-            cols = st.columns(len(selected_iups))
-            
-            for idx, iup in enumerate(selected_iups):
-                with cols[idx]:
-                    st.markdown(f"### {iup}")
+        for idx, iup in enumerate(selected_iups):
+            with cols[idx]:
+                st.markdown(f"### {iup}")
+                
+                for subcategory, specs in REGISTRY.subcategory_groups(category):
+                    st.markdown(f"**{LABELS['subcategories'].get(subcategory, subcategory)}**")
                     
-                    for subcategory, params in subcategories.items():
-                        st.markdown(f"**{LABELS['subcategories'].get(subcategory, subcategory)}**")
+                    for spec in specs:
+                        current = current_input(iup, category, spec.key)
+                        value = st.number_input(
+                            f"{spec.name} ({spec.unit})",
+                            key=f"{iup}_{spec.key}",
+                            help=spec.tooltip,
+                            value=float(current['value']),
+                            step=0.1
+                        )
+                        
+                        adjustment = st.selectbox(
+                            f"{LABELS['adjustments']['title']} - {spec.name}",
+                            adjustment_keys,
+                            index=adjustment_keys.index(current['adjustment']),
+                            key=f"{iup}_{spec.key}_adj",
+                            format_func=lambda x: LABELS['adjustments'][x],
+                            help=ADJUSTMENT_DESCRIPTIONS[adjustment_keys[0]][category]
+                        )
                         
-                        for param_key, param_config in params.items():
-                            value = st.number_input(
-                                f"{param_config['name']} ({param_config['unit']})",
-                                key=f"{iup}_{param_key}",
-                                help=param_config['tooltip'],
-                                value=0.0,
-                                step=0.1
-                            )
-                            
-                            adjustment = st.selectbox(
-                                f"{LABELS['adjustments']['title']} - {param_config['name']}",
-                                list(ADJUSTMENT_LEVELS.keys()),
-                                key=f"{iup}_{param_key}_adj",
-                                format_func=lambda x: LABELS['adjustments'][x],
-                                help=ADJUSTMENT_DESCRIPTIONS[list(ADJUSTMENT_LEVELS.keys())[0]][category]
-                            )
-                            
-                            # Store data
-                            if category not in st.session_state.data[iup]:
-                                st.session_state.data[iup][category] = {}
-                            
-                            st.session_state.data[iup][category][param_key] = {
-                                'value': value,
-                                'adjustment': adjustment
-                            }
-    
-    # Performance Analysis Tab
-    with tabs[1]:
-        st.header(LABELS['tabs']['analysis'])
+                        store_input(iup, category, spec.key, value, adjustment)
+
+def render_grid_inputs(selected_iups, scoring):
+    """Render one editable grid per category and commit all edits on submit."""
+    import pandas as pd
+    
+    adjustment_keys = list(ADJUSTMENT_LEVELS.keys())
+    adjustment_label = LABELS['adjustments']['title']
+    
+    with st.form('grid_inputs'):
+        edited = {}
+        for category in REGISTRY.categories:
+            st.subheader(LABELS['categories'][category])
+            specs = REGISTRY.category_params(category)
+            
+            grid = {}
+            column_config = {}
+            for iup in selected_iups:
+                inputs = [current_input(iup, category, spec.key) for spec in specs]
+                grid[iup] = [entry['value'] for entry in inputs]
+                grid[f"{iup} - {adjustment_label}"] = [entry['adjustment'] for entry in inputs]
+                column_config[iup] = st.column_config.NumberColumn(iup, step=0.1, required=True)
+                column_config[f"{iup} - {adjustment_label}"] = st.column_config.SelectboxColumn(
+                    adjustment_label,
+                    options=adjustment_keys,
+                    required=True,
+                    help=ADJUSTMENT_DESCRIPTIONS[adjustment_keys[0]][category]
+                )
+            
+            df = pd.DataFrame(grid, index=[f"{spec.name} ({spec.unit})" for spec in specs])
+            edited[category] = (df, st.data_editor(
+                df,
+                key=f"grid_{category}_{selected_iups[0]}",
+                column_config=column_config,
+                use_container_width=True,
+                num_rows='fixed'
+            ))
         
-        # Calculate scores
-        scores = {}
-        for iup in selected_iups:
-            scores[iup] = {}
-            for category, subcategories in PARAMETERS.items():
-                if category in st.session_state.data[iup]:
-                    category_data = st.session_state.data[iup][category]
-                    scores[iup][category] = calculate_category_score(
-                        category_data,
-                        subcategories,
-                        st.session_state.data
+        submitted = st.form_submit_button(LABELS['input_mode']['submit'])
+    
+    if not submitted:
+        return
+    
+    # Apply the whole batch in one transaction, touching only the edited cells
+    with get_store().batch():
+        for category, (original, result) in edited.items():
+            specs = REGISTRY.category_params(category)
+            changed = result.ne(original)
+            for iup in selected_iups:
+                adjustment_column = f"{iup} - {adjustment_label}"
+                rows = (changed[iup] | changed[adjustment_column]).to_numpy().nonzero()[0]
+                for row in rows:
+                    store_input(
+                        iup, category, specs[row].key,
+                        float(result[iup].iat[row]),
+                        result[adjustment_column].iat[row]
                     )
+    persisted()
+
+def import_inputs(imported, scoring):
+    """Load each IUP's most recent imported period into the session."""
+    latest = imported.latest()
+    known = list(latest)
+    rows = [latest[iup] for iup in known]
+    
+    # Cells left empty in the file keep their current value
+    current = scoring.values[[scoring.rows[iup] for iup in known]]
+    values = imported.values[rows]
+    values = np.where(np.isnan(values), current, values)
+    adjustments = imported.adjustments[rows]
+    scoring.set_rows(known, values, adjustments)
+    get_store().write_inputs(known, values, adjustments)
+    
+    drop_widget_state(known)
+    return known
+
+def render_import_panel(registry, scoring):
+    """Render the CSV/Excel bulk import controls in the sidebar."""
+    with st.sidebar.expander(LABELS['import']['title']):
+        uploaded = st.file_uploader(
+            LABELS['import']['file'],
+            type=['csv', 'xlsx', 'json'],
+            help=LABELS['import']['help']
+        )
+        if uploaded is None or not st.button(LABELS['import']['submit']):
+            return
         
-        # Display radar charts
-        for category in PARAMETERS.keys():
-            st.subheader(LABELS['categories'][category])
-            st.plotly_chart(
-                create_radar_chart(scores, category),
-                use_container_width=True
-            )
+        try:
+            imported = read_table(uploaded, uploaded.name)
+            check_periods(imported.periods)
+        except ValueError as exc:
+            st.error(f"{LABELS['import']['error']}: {exc}")
+            return
         
-        # Display final scores
-        st.subheader(LABELS['analysis']['final_scores'])
-        cols = st.columns(len(selected_iups))
-        for idx, iup in enumerate(selected_iups):
-            with cols[idx]:
-                final_score = calculate_final_score(scores[iup])
-                st.metric(
-                    iup,
-                    f"{final_score:.2f}",
-                    delta=None
-                )
+        # IUPs missing from the registry are registered rather than skipped
+        added = registry.add(imported.iups)
+        sync_iups(registry, scoring)
+        
+        store = get_store()
+        with store.batch():
+            store.write_imported(imported)
+            loaded = import_inputs(imported, scoring)
+        persisted()
+        st.success(LABELS['import']['loaded'].format(rows=len(imported), iups=len(loaded)))
+        if added:
+            st.info(LABELS['import']['added'].format(count=len(added)))
+
+def session_inputs():
+    """Get the session inputs of every IUP with data as undated rows."""
+    iups, values, adjustments = st.session_state.data.snapshot()
+    rows = np.flatnonzero(~np.isnan(values).all(axis=1))
+    return ImportedData.from_rows([iups[row] for row in rows], values[rows], adjustments[rows])
+
+def get_snapshot_file(scoring, author):
+    """Get the current scenario as snapshot bytes, rebuilt only when inputs change."""
+    history = get_history()
+    key = (scoring.version, scoring.method, id(history), author)
+    cached = st.session_state.get('snapshot_file')
+    if cached is None or cached[0] != key:
+        created = datetime.now()
+        parts = [session_inputs()] + ([history.to_imported()] if len(history) else [])
+        metadata = build_metadata(created.isoformat(timespec='seconds'), author, scoring.method)
+        cached = (key, f"skenario_{created:%Y%m%d_%H%M%S}{SUFFIX}",
+                  snapshot_bytes(ImportedData.concat(parts), metadata))
+        st.session_state.snapshot_file = cached
+    return cached[1], cached[2]
+
+def render_snapshot_download(slot, scoring):
+    """Fill the save slot of the snapshot panel once this rerun's inputs are stored.
+    
+    The file (full history plus pyarrow) is only built once the user asks for it.
+    """
+    container = slot.container()
+    if not container.toggle(LABELS['snapshot']['prepare'], key='snapshot_prepare'):
+        return
+    
+    file_name, data = get_snapshot_file(scoring, st.session_state.get('snapshot_author', ''))
+    container.download_button(
+        LABELS['snapshot']['save'],
+        data,
+        file_name=file_name,
+        mime='application/vnd.apache.arrow.file'
+    )
+
+def render_snapshot_panel(registry, scoring):
+    """Render scenario snapshot controls in the sidebar; returns the slot for the save button."""
+    import pandas as pd
     
-    # Detailed Comparison Tab
-    with tabs[2]:
-        st.header(LABELS['tabs']['comparison'])
+    labels = LABELS['snapshot']
+    with st.sidebar.expander(labels['title']):
+        st.text_input(labels['author'], key='snapshot_author')
+        slot = st.empty()
         
-        for category, subcategories in PARAMETERS.items():
-            st.subheader(LABELS['categories'][category])
-            
-            # Create comparison tables
-            headers, rows = create_comparison_table(
-                {
-                    param_key: {
-                        'name': param_config['name'],
-                        'unit': param_config['unit'],
-                        'values': {
-                            iup: st.session_state.data[iup][category][param_key]
-                            for iup in selected_iups
-                            if category in st.session_state.data[iup]
-                        }
-                    }
-                    for subcategory, params in subcategories.items()
-                    for param_key, param_config in params.items()
-                },
-                category
+        uploaded = st.file_uploader(labels['file'], type=[SUFFIX.lstrip('.')], key='snapshot_upload')
+        if uploaded is None:
+            return slot
+        
+        try:
+            snapshot = read_snapshot(uploaded)
+            check_periods(snapshot.data.periods)
+        except ValueError as exc:
+            st.error(f"{labels['error']}: {exc}")
+            return slot
+        
+        metadata = snapshot.metadata
+        st.caption(labels['info'].format(
+            created=metadata['created'],
+            author=metadata['author'] or '-',
+            rows=len(snapshot.data),
+            method=LABELS['normalization'].get(metadata['weights']['normalization'], '-')
+        ))
+        if not snapshot.weights_match():
+            st.warning(labels['weights_differ'])
+        
+        inputs = snapshot.inputs()
+        diff = diff_snapshots(session_inputs(), inputs)
+        st.caption(labels['changes'].format(cells=len(diff), added=diff.added, removed=diff.removed))
+        if len(diff):
+            st.dataframe(pd.DataFrame(diff.records(limit=100)), hide_index=True)
+        
+        if not st.button(labels['load']):
+            return slot
+        registry.add(snapshot.data.iups)
+        sync_iups(registry, scoring)
+        
+        store = get_store()
+        with store.batch():
+            store.write_imported(snapshot.data)
+            loaded = import_inputs(inputs, scoring)
+        persisted()
+        dated = ~np.isnat(snapshot.data.periods)
+        st.success(labels['loaded'].format(iups=len(loaded), periods=len(np.unique(snapshot.data.periods[dated]))))
+    return slot
+
+def seed_defaults(selected_iups, scoring):
+    """Fill widget defaults for categories that have no input yet, in one rescore.
+    
+    The defaults live in this session only: the store (shared with other
+    sessions and the API) only receives values a user actually entered.
+    """
+    rows = np.array([scoring.rows[iup] for iup in selected_iups])
+    missing = ~(~np.isnan(scoring.values[rows]) @ REGISTRY.category_membership > 0)
+    pending = missing.any(axis=1)
+    if not pending.any():
+        return
+    
+    # Only the parameters of categories without any value are filled
+    rows = rows[pending]
+    fill = missing[pending][:, REGISTRY.category_ids]
+    values = np.where(fill, 0.0, scoring.values[rows])
+    adjustments = np.where(
+        fill, ADJUSTMENT_CODES[list(ADJUSTMENT_LEVELS.keys())[0]], scoring.adjustments[rows]
+    )
+    iups = [scoring.iups[row] for row in rows]
+    scoring.set_rows(iups, values, adjustments)
+
+def render_input_tab(selected_iups, scoring):
+    """Render the Input Parameters section."""
+    st.header(LABELS['tabs']['input'])
+    
+    input_mode = st.radio(
+        LABELS['input_mode']['title'],
+        ['grid', 'fields'],
+        format_func=lambda x: LABELS['input_mode'][x],
+        horizontal=True
+    )
+    
+    page_iups = paginate_iups(selected_iups, 'input')
+    with PROFILER.span('render_inputs'):
+        if input_mode == 'grid':
+            render_grid_inputs(page_iups, scoring)
+        else:
+            render_field_inputs(page_iups, scoring)
+
+def get_radar_figure(names, axes, scores):
+    """Get this session's radar figure showing ``scores``.
+    
+    The figure is built once per set of traces and axes; later reruns only
+    replace its ``r`` values instead of rebuilding and validating every trace.
+    """
+    fig = st.session_state.get('radar_figure')
+    if fig is None or not update_radar_chart(fig, names, axes, scores):
+        fig = create_radar_chart(names, axes, scores, LABELS['radar']['title'])
+        st.session_state.radar_figure = fig
+    return fig
+
+@st.fragment
+def render_radar_charts(selected_iups, scoring):
+    """Render one radar chart with every category (or subcategory) as an axis."""
+    labels = LABELS['radar']
+    level = st.radio(
+        labels['level'],
+        ['category', 'subcategory'],
+        format_func=lambda x: labels[x],
+        horizontal=True,
+        key='radar_level'
+    )
+    
+    hierarchy = scoring.hierarchy()
+    rows = [scoring.rows[iup] for iup in selected_iups]
+    subcategories = hierarchy.subcategories[rows]
+    if level == 'category':
+        axes = [LABELS['categories'][category] for category in REGISTRY.categories]
+        has_category = ~np.isnan(subcategories) @ REGISTRY.subcategory_category_membership > 0
+        scores = np.where(has_category, hierarchy.categories[rows], np.nan)
+    else:
+        axes = [LABELS['subcategories'].get(subcategory, subcategory) for _, subcategory in REGISTRY.subcategories]
+        scores = subcategories
+    
+    names = selected_iups
+    if aggregating():
+        names, scores = group_means(selected_iups, scores)
+    
+    st.plotly_chart(
+        get_radar_figure(names, axes, scores),
+        use_container_width=True,
+        key='radar_chart'
+    )
+
+@st.fragment
+def render_final_scores(selected_iups, scoring):
+    """Render the final score metric of every selected IUP (or IUP group)."""
+    import pandas as pd
+    
+    final_scores = scoring.final_scores()[[scoring.rows[iup] for iup in selected_iups]]
+    names = selected_iups
+    if aggregating():
+        names, means = group_means(selected_iups, final_scores)
+        final_scores = means[:, 0]
+    
+    st.subheader(LABELS['analysis']['final_scores'])
+    if len(names) > IUP_DISPLAY_CONFIG['page_size']:
+        with PROFILER.span('render_table'):
+            st.dataframe(pd.DataFrame({
+                'IUP': names,
+                LABELS['analysis']['final_scores']: final_scores
+            }), use_container_width=True, hide_index=True)
+        return
+    
+    cols = st.columns(len(names))
+    for idx, name in enumerate(names):
+        with cols[idx]:
+            final_score = final_scores[idx]
+            st.metric(
+                name,
+                f"{final_score:.2f}",
+                delta=None
             )
-            
-            df = pd.DataFrame(rows, columns=headers)
-            st.dataframe(df, use_container_width=True)
+
+@st.fragment
+def render_sensitivity(selected_iups, scoring):
+    """Render the Monte Carlo sensitivity sub-page."""
+    import pandas as pd
+    
+    labels = LABELS['sensitivity']
+    st.caption(labels['description'])
+    
+    samples = st.number_input(
+        labels['samples'],
+        min_value=1_000,
+        max_value=1_000_000,
+        value=SENSITIVITY_CONFIG['samples'],
+        step=10_000,
+        key='sensitivity_samples'
+    )
+    
+    run_key = (tuple(selected_iups), scoring.version, int(samples))
+    if st.button(labels['run']):
+        rows = [scoring.rows[iup] for iup in selected_iups]
+        with st.spinner(labels['running']):
+            st.session_state.sensitivity = (run_key, run_sensitivity(
+                selected_iups,
+                scoring.values[rows],
+                scoring.adjustments[rows],
+                samples=int(samples),
+                normalized=scoring.normalized()[rows]
+            ))
+    
+    if 'sensitivity' not in st.session_state:
+        return
+    result_key, result = st.session_state.sensitivity
+    if result_key != run_key:
+        st.info(labels['stale'])
+    
+    confidence = f"{result.confidence:.0%}"
+    st.dataframe(pd.DataFrame({
+        'IUP': result.iups,
+        labels['baseline']: result.baseline,
+        labels['mean']: result.mean,
+        f"{labels['ci_low']} ({confidence})": result.ci_low,
+        f"{labels['ci_high']} ({confidence})": result.ci_high,
+        labels['baseline_rank']: result.baseline_ranks + 1,
+        labels['rank_stability']: result.rank_stability,
+        labels['top_probability']: result.rank_probabilities[:, 0]
+    }), use_container_width=True, hide_index=True)
+    if result.ci_samples < result.samples:
+        st.caption(labels['ci_subsample'].format(kept=result.ci_samples, samples=result.samples))
+    
+    st.plotly_chart(
+        create_rank_probability_chart(result.iups, result.rank_probabilities),
+        use_container_width=True
+    )
+    
+    st.subheader(labels['drivers'])
+    st.dataframe(
+        pd.DataFrame(result.drivers[:10], columns=[labels['factor'], labels['influence']]),
+        use_container_width=True,
+        hide_index=True
+    )
+
+@st.fragment
+def render_drilldown(selected_iups, scoring):
+    """Render one category's score broken down into subcategories and parameters."""
+    import pandas as pd
+    
+    labels = LABELS['drilldown']
+    category = st.selectbox(
+        labels['category'],
+        REGISTRY.categories,
+        format_func=lambda x: LABELS['categories'][x],
+        key='drilldown_category'
+    )
+    category_id = REGISTRY.categories.index(category)
+    
+    # Breakdown rows: final, category, then each subcategory followed by its parameters
+    levels = [('final', labels['final']), ('category', LABELS['categories'][category])]
+    subcategory_ids = np.flatnonzero(REGISTRY.subcategory_category_ids == category_id)
+    columns = []
+    for subcategory_id in subcategory_ids:
+        _, subcategory = REGISTRY.subcategories[subcategory_id]
+        levels.append(('subcategory', LABELS['subcategories'].get(subcategory, subcategory)))
+        specs = REGISTRY.specs[REGISTRY.subcategory_slices[subcategory_id]]
+        levels.extend(('parameter', spec.name) for spec in specs)
+        columns.extend([-1] + [spec.index for spec in specs])
+    
+    hierarchy = scoring.hierarchy()
+    rows = [scoring.rows[iup] for iup in selected_iups]
+    subcategories = hierarchy.subcategories[rows][:, subcategory_ids]
+    has_category = ~np.isnan(subcategories).all(axis=1)
+    items = hierarchy.parameters[rows][:, [max(col, 0) for col in columns]]
+    items[:, np.array(columns) < 0] = subcategories
+    breakdown = np.column_stack([
+        hierarchy.final[rows],
+        np.where(has_category, hierarchy.categories[rows, category_id], np.nan),
+        items
+    ])
+    
+    if aggregating():
+        names, breakdown = group_means(selected_iups, breakdown)
+    else:
+        names = paginate_iups(selected_iups, 'drilldown')
+        breakdown = breakdown[[selected_iups.index(iup) for iup in names]]
+    
+    with PROFILER.span('render_table'):
+        indent = {'final': '', 'category': '', 'subcategory': '\u2003', 'parameter': '\u2003\u2003'}
+        table = pd.DataFrame(breakdown.T, columns=names)
+        table.insert(0, labels['item'], [indent[level] + name for level, name in levels])
+        table.insert(0, labels['level'], [labels['levels'][level] for level, _ in levels])
+        st.dataframe(
+            table,
+            use_container_width=True,
+            hide_index=True,
+            column_config={name: st.column_config.NumberColumn(format='%.3f') for name in names}
+        )
+    st.caption(labels['help'])
+
+def render_analysis_tab(selected_iups, scoring):
+    """Render the Performance Analysis section."""
+    st.header(LABELS['tabs']['analysis'])
+    
+    view = st.radio(
+        LABELS['analysis']['view'],
+        ['overview', 'drilldown', 'sensitivity'],
+        format_func=lambda x: LABELS['analysis'][x],
+        horizontal=True,
+        key='analysis_view'
+    )
+    
+    if view == 'sensitivity':
+        render_sensitivity(selected_iups, scoring)
+        return
+    if view == 'drilldown':
+        render_drilldown(selected_iups, scoring)
+        return
+    
+    # Scores are kept current by the input section
+    render_radar_charts(selected_iups, scoring)
+    render_final_scores(selected_iups, scoring)
+
+@st.fragment
+def render_comparison_table(category, columns, values, ranking=None):
+    """Render the detailed comparison table of one category.
+    
+    ``values`` holds one parameter row per column (IUP or IUP group).
+    """
+    import pandas as pd
+    
+    st.subheader(LABELS['categories'][category])
+    specs = REGISTRY.category_params(category)
+    
+    headers, rows = create_comparison_table(
+        {
+            spec.key: {
+                'name': spec.name,
+                'unit': spec.unit,
+                'values': {
+                    column: {'value': float(values[idx, spec.index])}
+                    for idx, column in enumerate(columns)
+                    if not np.isnan(values[idx, spec.index])
+                }
+            }
+            for spec in specs
+        },
+        category,
+        None if ranking is None else ranking.best_performers([spec.key for spec in specs]),
+        columns
+    )
+    
+    with PROFILER.span('render_table'):
+        df = pd.DataFrame(rows, columns=headers)
+        st.dataframe(df, use_container_width=True)
+
+def get_ranking(selected_iups, scoring):
+    """Get the ranking index of the selected IUPs, rebuilt only when data changes."""
+    key = (tuple(selected_iups), scoring.version)
+    cached = st.session_state.get('ranking')
+    if cached is None or cached[0] != key:
+        cached = (key, RankingIndex.from_scoring(scoring, selected_iups))
+        st.session_state.ranking = cached
+    return cached[1]
+
+def render_leaderboard(selected_iups, ranking):
+    """Render the final-score leaderboard of the selected IUPs."""
+    import pandas as pd
+    
+    labels = LABELS['leaderboard']
+    st.subheader(labels['title'])
+    
+    top = ranking.top_k(FINAL, LEADERBOARD_SIZE)
+    with PROFILER.span('render_table'):
+        st.dataframe(pd.DataFrame({
+            labels['rank']: range(1, len(top) + 1),
+            'IUP': [iup for iup, _ in top],
+            labels['score']: [score for _, score in top],
+            labels['percentile']: [ranking.percentile(iup, FINAL) for iup, _ in top]
+        }), use_container_width=True, hide_index=True)
+
+def render_comparison_tab(selected_iups, scoring):
+    """Render the Detailed Comparison section."""
+    st.header(LABELS['tabs']['comparison'])
+    ranking = get_ranking(selected_iups, scoring)
+    
+    render_leaderboard(selected_iups, ranking)
+    
+    if aggregating():
+        columns, values = group_means(
+            selected_iups, scoring.values[[scoring.rows[iup] for iup in selected_iups]]
+        )
+        ranking = None
+    else:
+        columns = paginate_iups(selected_iups, 'comparison')
+        values = scoring.values[[scoring.rows[iup] for iup in columns]]
+    
+    for category in REGISTRY.categories:
+        render_comparison_table(category, columns, values, ranking)
+
+@st.fragment
+def render_trend_chart(selected_iups):
+    """Render the historical trend of one parameter from the stored history."""
+    history = get_history()
+    month_labels = history.months.astype(str).tolist()
+    
+    cols = st.columns([2, 2, 1])
+    with cols[0]:
+        spec = st.selectbox(
+            LABELS['trends']['parameter'],
+            REGISTRY.specs,
+            format_func=lambda x: f"{x.name} ({x.unit})",
+            key='trend_parameter'
+        )
+    with cols[1]:
+        measure = st.radio(
+            LABELS['trends']['measure'],
+            ['raw', 'moving_average', 'yoy'],
+            format_func=lambda x: LABELS['trends'][x],
+            horizontal=True,
+            key='trend_measure'
+        )
+    with cols[2]:
+        window = st.number_input(
+            LABELS['trends']['window'],
+            min_value=1,
+            max_value=36,
+            value=3,
+            key='trend_window',
+            disabled=measure != 'moving_average'
+        )
+    
+    start, end = month_labels[0], month_labels[-1]
+    if len(month_labels) > 1:
+        start, end = st.select_slider(
+            LABELS['trends']['range'],
+            options=month_labels,
+            value=(month_labels[0], month_labels[-1]),
+            key='trend_range'
+        )
+    
+    values = None
+    if measure == 'moving_average':
+        values = history.rolling_mean(int(window))
+    elif measure == 'yoy':
+        values = history.yoy_delta()
+    
+    iups = [iup for iup in selected_iups if iup in history.rows]
+    if aggregating() and iups:
+        months, cube = history.slice([spec.key], iups, start, end, values)
+        labels, means = group_means(iups, cube[0])
+        months = months.astype(str).tolist()
+        series = {
+            label: {months[col]: float(row[col]) for col in np.flatnonzero(~np.isnan(row))}
+            for label, row in zip(labels, means)
+        }
+    elif measure == 'raw':
+        series = get_store().parameter_series(spec.key, iups, start, end)
+    else:
+        series = history.series(spec.key, iups, start, end, values)
+    
+    st.plotly_chart(
+        create_trend_chart(series, spec.name, spec.unit),
+        use_container_width=True
+    )
+
+def render_trends_tab(selected_iups, scoring):
+    """Render the Historical Trends section."""
+    st.header(LABELS['tabs']['trends'])
+    
+    if not len(get_history()):
+        st.info(LABELS['trends']['empty'])
+        return
+    
+    render_trend_chart(selected_iups)
+
+@st.fragment(run_every=TELEMETRY_CONFIG['publish_interval'])
+def render_live_telemetry(selected_iups, scoring):
+    """Render the live telemetry status, applying newly published KPI values on every run."""
+    import pandas as pd
+    from kpi import KPI_KEYS
+    
+    labels = LABELS['telemetry']
+    service = get_telemetry()
+    changed = sync_telemetry(get_iup_registry(), scoring)
+    # Set by the dashboard when this run is part of a full rerun
+    app_run = st.session_state.pop('telemetry_app_run', False)
+    
+    with st.expander(labels['title']):
+        for source, error in service.source_errors.items():
+            st.error(labels['source_error'].format(source=source, error=error))
+        stats = service.stats()
+        if stats['updated'] is None:
+            st.caption(labels['waiting'])
+            return
+        st.caption(labels['status'].format(
+            rate=stats['rate'],
+            iups=stats['iups'],
+            errors=stats['errors'],
+            updated=datetime.fromtimestamp(stats['updated']).strftime('%H:%M:%S')
+        ))
+        
+        _, iups, months, values = service.live.changes_since(0)
+        shown = set(selected_iups)
+        rows = [row for row, iup in enumerate(iups) if iup in shown][:IUP_DISPLAY_CONFIG['page_size']]
+        if rows:
+            specs = [REGISTRY.specs[REGISTRY.index[key]] for key in KPI_KEYS]
+            table = {labels['period']: [str(months[row]) for row in rows]}
+            for col, spec in enumerate(specs):
+                table[f"{spec.name} ({spec.unit})"] = [
+                    '' if np.isnan(values[row, col]) else format_number(values[row, col], spec.unit)
+                    for row in rows
+                ]
+            st.dataframe(pd.DataFrame(table, index=[iups[row] for row in rows]), use_container_width=True)
+        
+        follow = st.toggle(labels['follow'], key='telemetry_follow', help=labels['follow_help'])
+    
+    # Charts and tables outside this fragment only change on a full rerun
+    if follow and not app_run and shown.intersection(changed):
+        st.rerun()
+
+def cache_stats():
+    """Get the figure/table and database query cache counters."""
+    return {'figures': FIGURE_CACHE.stats(), 'store': get_store().stats()}
+
+@contextmanager
+def profiled_rerun():
+    """Profile this rerun while the diagnostics panel is open (or always, per ``PROFILING_CONFIG``)."""
+    if not (PROFILING_CONFIG['enabled'] or st.session_state.get('debug_panel')):
+        yield
+        return
+    
+    session = st.session_state.setdefault('profile_session', uuid4().hex[:12])
+    st.session_state.profile_reruns = st.session_state.get('profile_reruns', 0) + 1
+    PROFILER.start_rerun(session, st.session_state.profile_reruns)
+    try:
+        yield
+    finally:
+        st.session_state.last_profile = PROFILER.finish_rerun(caches=cache_stats())
+
+def render_cache_stats(title, stats):
+    st.markdown(f"**{title}**")
+    cols = st.columns(2)
+    cols[0].metric('Hits', stats['hits'])
+    cols[1].metric('Misses', stats['misses'])
+    st.caption(
+        f"{LABELS['debug']['hit_rate']}: {stats['hit_rate']:.0%} · "
+        f"{stats['entries']}/{stats['max_entries']} entries · "
+        f"{stats['evictions']} evictions"
+    )
+
+def render_debug_panel():
+    """Render cache counters and per-stage rerun timings in the sidebar."""
+    import pandas as pd
+    
+    labels = LABELS['debug']
+    stats = cache_stats()
+    last = st.session_state.get('last_profile')
+    
+    with st.sidebar.expander(labels['title'], expanded=True):
+        render_cache_stats(labels['cache'], stats['figures'])
+        render_cache_stats(labels['store_cache'], stats['store'])
+        
+        if last is None:
+            return
+        st.markdown(f"**{labels['profile']}**")
+        cols = st.columns(2)
+        cols[0].metric(labels['reruns'], st.session_state.profile_reruns)
+        cols[1].metric(labels['last_rerun'], f"{last['stages']['rerun']['ms']:.0f} ms")
+        
+        percentiles = PROFILER.stats()
+        stages = sorted(last['stages'], key=lambda stage: -last['stages'][stage]['ms'])
+        st.dataframe(pd.DataFrame({
+            labels['stage']: stages,
+            labels['calls']: [last['stages'][stage]['calls'] for stage in stages],
+            labels['last_ms']: [last['stages'][stage]['ms'] for stage in stages],
+            labels['p50_ms']: [percentiles[stage]['p50_ms'] for stage in stages],
+            labels['p95_ms']: [percentiles[stage]['p95_ms'] for stage in stages]
+        }), use_container_width=True, hide_index=True)
+
+# Sections in navigation order; only the active one is rendered per rerun
+SECTIONS = {
+    'input': render_input_tab,
+    'analysis': render_analysis_tab,
+    'comparison': render_comparison_tab,
+    'trends': render_trends_tab
+}
+
+def render_iup_selector(registry):
+    """Render the sidebar IUP selection, filtered by group for large portfolios."""
+    labels = LABELS['iups']
+    groups = registry.group_names()
+    
+    group = None
+    if len(groups) > 1:
+        group = st.sidebar.selectbox(
+            labels['group'],
+            [None] + groups,
+            format_func=lambda x: labels['all_groups'] if x is None else group_label(x)
+        )
+    options = registry.in_group(group)
+    
+    if st.sidebar.checkbox(labels['select_all'], key=f"select_all_{group}"):
+        st.sidebar.caption(labels['selected'].format(count=len(options)))
+        selected_iups = options
+    else:
+        selected_iups = st.sidebar.multiselect(
+            LABELS['select_iups'],
+            options,
+            default=options[:2],
+            key=f"select_iups_{group}"
+        )
+    
+    if len(groups) > 1:
+        st.sidebar.toggle(
+            labels['aggregate'],
+            value=len(selected_iups) > IUP_DISPLAY_CONFIG['group_threshold'],
+            help=labels['aggregate_help'],
+            key='aggregate_groups'
+        )
+    return selected_iups
+
+def render_dashboard():
+    """Render one rerun of the dashboard, timing its stages when profiled."""
+    st.title(f"⛏️ {LABELS['title']}")
+    with PROFILER.span('registry'):
+        registry = get_iup_registry()
+    
+    # Sidebar
+    st.sidebar.header(LABELS['settings'])
+    with PROFILER.span('selector'):
+        selected_iups = render_iup_selector(registry)
+    
+    # Main content
+    if not selected_iups:
+        st.warning("Silakan pilih minimal satu IUP untuk dianalisis.")
+        return
+    
+    # Initialize session state for storing data
+    if 'data' not in st.session_state:
+        st.session_state.scoring = ScoringState(registry.names, rows=registry.index)
+        st.session_state.data = SessionData(st.session_state.scoring)
+    scoring = st.session_state.scoring
+    with PROFILER.span('sync'):
+        sync_iups(registry, scoring)
+        if sync_store(registry, scoring):
+            # Stored rows replaced any live values; take them all again
+            st.session_state.pop('telemetry_version', None)
+    
+    scoring.set_method(st.sidebar.selectbox(
+        LABELS['normalization']['title'],
+        NORMALIZATION_METHODS,
+        format_func=lambda x: LABELS['normalization'][x],
+        help=LABELS['normalization']['help']
+    ))
+    with PROFILER.span('panels'):
+        render_import_panel(registry, scoring)
+        snapshot_slot = render_snapshot_panel(registry, scoring)
+    seed_defaults(selected_iups, scoring)
+    if TELEMETRY_CONFIG['enabled']:
+        st.session_state.telemetry_app_run = True
+        with PROFILER.span('telemetry'):
+            render_live_telemetry(selected_iups, scoring)
+    
+    # Section navigation
+    active_section = st.radio(
+        LABELS['navigation'],
+        list(SECTIONS.keys()),
+        format_func=lambda x: LABELS['tabs'][x],
+        horizontal=True,
+        key='active_section',
+        label_visibility='collapsed'
+    )
+    
+    with PROFILER.span(f"section_{active_section}"):
+        SECTIONS[active_section](selected_iups, scoring)
+    with PROFILER.span('snapshot_download'):
+        render_snapshot_download(snapshot_slot, scoring)
+
+def main():
+    with profiled_rerun():
+        render_dashboard()
+    
+    # Rendered after the profiled rerun so it shows that rerun's timings
+    if st.sidebar.checkbox(LABELS['debug']['toggle'], key='debug_panel'):
+        render_debug_panel()
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,199 @@
+"""Headless batch scoring of IUP scenario files.
+
+Scores CSV/Excel/JSON scenario files against ``PARAMETERS``,
+``ADJUSTMENT_LEVELS`` and ``CATEGORY_WEIGHTS`` without Streamlit or Plotly,
+spreading files across a process pool and streaming results to CSV or Parquet.
+
+Usage:
+    python batch_score.py scenarios/ extra.xlsx -o scores.csv --workers 8
+"""
+
+import argparse
+import csv
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+import numpy as np
+
+from config import NORMALIZATION_METHODS
+from importer import read_table
+from registry import ADJUSTMENT_MULTIPLIERS, REGISTRY
+from scoring import ScoringEngine
+
+SUPPORTED_SUFFIXES = ('.csv', '.xlsx', '.xlsm', '.json')
+COLUMNS = ['scenario', 'period', 'iup'] + REGISTRY.categories + ['final_score', 'rank']
+
+
+def score_imported(imported, scenario, method='minmax'):
+    """Score every period of an ``ImportedData`` and return result columns.
+
+    Normalization runs across the IUPs of the same period, the way
+    the dashboard scores the IUPs it shows together.
+    """
+    period_keys = imported.periods.view(np.int64)
+    category_scores = np.empty((len(imported), len(REGISTRY.categories)))
+    final_scores = np.empty(len(imported))
+    ranks = np.empty(len(imported), dtype=np.int64)
+
+    for key in np.unique(period_keys):
+        rows = np.flatnonzero(period_keys == key)
+        engine = ScoringEngine(
+            [imported.iups[iup_id] for iup_id in imported.iup_ids[rows]],
+            imported.values[rows],
+            ADJUSTMENT_MULTIPLIERS[imported.adjustments[rows]],
+            method
+        )
+        category_scores[rows] = engine.category_scores()
+        final_scores[rows] = engine.final_scores(category_scores[rows])
+        order = np.argsort(-final_scores[rows], kind='stable')
+        ranks[rows[order]] = np.arange(1, len(rows) + 1)
+
+    return {
+        'scenario': [scenario] * len(imported),
+        'period': ['' if np.isnat(period) else str(period) for period in imported.periods],
+        'iup': [imported.iups[iup_id] for iup_id in imported.iup_ids],
+        **{category: category_scores[:, col] for col, category in enumerate(REGISTRY.categories)},
+        'final_score': final_scores,
+        'rank': ranks
+    }
+
+
+def score_file(path, method='minmax'):
+    """Score one scenario file; returns ``(path, columns, error)``.
+
+    Any failure (unreadable workbook, bad cells, ...) is reported for this
+    file only so the rest of the batch still gets scored.
+    """
+    try:
+        return path, score_imported(read_table(path), Path(path).stem, method), None
+    except Exception as exc:
+        return path, None, f"{type(exc).__name__}: {exc}"
+
+
+class CsvWriter:
+    """Append result columns to a CSV file."""
+
+    def __init__(self, path):
+        self._handle = open(path, 'w', newline='', encoding='utf-8')
+        self._writer = csv.writer(self._handle)
+        self._writer.writerow(COLUMNS)
+
+    def write(self, columns):
+        self._writer.writerows(zip(*(columns[name] for name in COLUMNS)))
+
+    def close(self):
+        self._handle.close()
+
+
+def arrow_schema():
+    """Get the pyarrow schema of the result ``COLUMNS``."""
+    import pyarrow as pa
+
+    return pa.schema(
+        [('scenario', pa.string()), ('period', pa.string()), ('iup', pa.string())]
+        + [(category, pa.float64()) for category in REGISTRY.categories]
+        + [('final_score', pa.float64()), ('rank', pa.int64())]
+    )
+
+
+def arrow_table(columns, schema=None):
+    """Get result columns as a pyarrow table."""
+    import pyarrow as pa
+
+    return pa.table({name: columns[name] for name in COLUMNS}, schema=schema or arrow_schema())
+
+
+class ParquetWriter:
+    """Append result columns to a Parquet file, one row group per batch."""
+
+    def __init__(self, path):
+        import pyarrow.parquet as pq
+
+        self._schema = arrow_schema()
+        self._writer = pq.ParquetWriter(path, self._schema)
+
+    def write(self, columns):
+        self._writer.write_table(arrow_table(columns, self._schema))
+
+    def close(self):
+        self._writer.close()
+
+
+def collect_paths(inputs):
+    """Expand files and directories into a sorted list of scenario files."""
+    paths = []
+    for entry in map(Path, inputs):
+        if entry.is_dir():
+            paths.extend(sorted(
+                str(path) for path in entry.rglob('*')
+                if path.suffix.lower() in SUPPORTED_SUFFIXES
+            ))
+        else:
+            paths.append(str(entry))
+    return paths
+
+
+def run(paths, output, workers=None, chunksize=None, method='minmax'):
+    """Score ``paths`` into ``output`` and return throughput statistics."""
+    writer = ParquetWriter(output) if str(output).endswith('.parquet') else CsvWriter(output)
+    workers = workers or os.cpu_count() or 1
+    chunksize = chunksize or max(1, len(paths) // (workers * 4))
+    stats = {'files': 0, 'rows': 0, 'failed': [], 'workers': workers}
+
+    start = time.perf_counter()
+    try:
+        methods = [method] * len(paths)
+        if workers == 1:
+            results = map(score_file, paths, methods)
+        else:
+            executor = ProcessPoolExecutor(max_workers=workers)
+            results = executor.map(score_file, paths, methods, chunksize=chunksize)
+
+        for path, columns, error in results:
+            if error is not None:
+                stats['failed'].append((path, error))
+                continue
+            writer.write(columns)
+            stats['files'] += 1
+            stats['rows'] += len(columns['iup'])
+    finally:
+        writer.close()
+        if workers != 1:
+            executor.shutdown()
+
+    stats['elapsed'] = time.perf_counter() - start
+    return stats
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Score IUP scenario files without the dashboard.")
+    parser.add_argument('inputs', nargs='+', help="Scenario files or directories (CSV, Excel, JSON)")
+    parser.add_argument('-o', '--output', default='scores.csv', help="Output .csv or .parquet file")
+    parser.add_argument('-w', '--workers', type=int, default=None, help="Worker processes (default: all cores)")
+    parser.add_argument('--chunksize', type=int, default=None, help="Files handed to a worker at a time")
+    parser.add_argument('--normalization', choices=NORMALIZATION_METHODS, default='minmax',
+                        help="Normalization strategy (default: minmax)")
+    args = parser.parse_args(argv)
+
+    paths = collect_paths(args.inputs)
+    if not paths:
+        parser.error("no scenario files found")
+
+    stats = run(paths, args.output, args.workers, args.chunksize, args.normalization)
+    elapsed = max(stats['elapsed'], 1e-9)
+    print(
+        f"Scored {stats['files']} files / {stats['rows']} IUP rows in {elapsed:.2f}s "
+        f"with {stats['workers']} workers "
+        f"({stats['files'] / elapsed:.1f} files/s, {stats['rows'] / elapsed:.0f} rows/s)",
+        file=sys.stderr
+    )
+    for path, error in stats['failed']:
+        print(f"FAILED {path}: {error}", file=sys.stderr)
+    return 1 if stats['failed'] else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
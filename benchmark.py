@@ -0,0 +1,586 @@
+"""Performance benchmarks for scoring, tables, charts and full app reruns.
+
+Generates synthetic datasets from ``PARAMETERS`` (IUPs x monthly periods),
+times each benchmark (median of repeated runs), records its tracemalloc peak
+in a separate run and compares both against a stored baseline. A benchmark
+that is slower or uses more memory than its baseline beyond the tolerances is
+reported as a regression and the script exits with status 1.
+
+Usage:
+    python benchmark.py                          # quick grid vs. benchmark_baseline.json
+    python benchmark.py --preset full            # up to 10,000 IUPs x 120 periods
+    python benchmark.py --only scoring_engine --update-baseline
+    python benchmark.py --startup --only final_score  # plus a cold-start import report
+"""
+
+import argparse
+import csv
+import gc
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import numpy as np
+
+from config import CATEGORY_WEIGHTS
+from importer import ImportedData
+from parameters import PARAMETERS
+from registry import ADJUSTMENT_KEYS, ADJUSTMENT_MULTIPLIERS, REGISTRY
+
+BASELINE_PATH = 'benchmark_baseline.json'
+APP_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'app.py')
+
+# (IUPs, periods) grids; every benchmark runs on each case within its limits
+PRESETS = {
+    'quick': [(4, 1), (50, 12), (500, 24)],
+    'full': [(4, 1), (50, 12), (500, 24), (2000, 60), (10000, 120)]
+}
+
+# Builders are timed undecorated (``.uncached``) so the figure cache does not hide their cost
+TABLE_IUPS = 1000
+CHART_IUPS = 1000
+# calculate_category_score rescans every IUP per parameter, i.e. O(IUPs^2)
+LEGACY_IUPS = 500
+# Observations seeded into the SQLite store for the headless app runs
+APP_OBSERVATIONS = 4_000_000
+# Haul trips per IUP-month in the synthetic KPI log, and the largest log generated
+KPI_TRIPS = 50
+KPI_ROWS = 10_000_000
+# JSON-line events per telemetry run
+TELEMETRY_EVENTS = 10_000
+# Largest scenario posted to the scoring API in one request
+API_IUPS = 1000
+
+MIN_REPEATS = 3
+MAX_REPEATS = 50
+TARGET_SECONDS = 0.5
+# Whole app runs and telemetry parsing are noisy, so their median needs more samples
+NOISY_REPEATS = 15
+
+
+class Dataset:
+    """Synthetic inputs for ``iups`` IUPs over ``periods`` consecutive months."""
+
+    def __init__(self, iups, periods, seed=0):
+        rng = np.random.default_rng(seed)
+        self.iups = [f"IUP-{row:05d}" for row in range(iups)]
+        self.groups = [f"Grup {row % max(1, iups // 50) + 1}" for row in range(iups)]
+        self.months = np.arange(np.datetime64('2015-01', 'M'), np.datetime64('2015-01', 'M') + periods)
+
+        low, high = self.parameter_ranges()
+        shape = (periods, iups, len(REGISTRY))
+        self.values = np.round(low + (high - low) * rng.random(shape), 2)
+        # One cell in twenty left empty
+        self.values[rng.random(shape) < 0.05] = np.nan
+        self.adjustments = rng.integers(0, len(ADJUSTMENT_KEYS), shape, dtype=np.int8)
+
+    @staticmethod
+    def parameter_ranges():
+        """Get per-parameter (low, high) arrays by unit."""
+        ranges = [(0.0, 100.0) if spec.unit == '%' else (0.0, 1000.0) for spec in REGISTRY.specs]
+        return np.array(ranges, dtype=np.float64).T
+
+    @property
+    def latest(self):
+        """Get the (values, adjustments) matrices of the last period."""
+        return self.values[-1], self.adjustments[-1]
+
+    def to_imported(self):
+        """Get every (IUP, month) row as ``importer.ImportedData``."""
+        periods, iups = len(self.months), len(self.iups)
+        return ImportedData(
+            self.iups,
+            np.tile(np.arange(iups, dtype=np.int32), periods),
+            np.repeat(self.months, iups),
+            self.values.reshape(-1, len(REGISTRY)),
+            self.adjustments.reshape(-1, len(REGISTRY))
+        )
+
+    def category_inputs(self, category, iups=None):
+        """Get ``{iup: {param_key: {'value', 'adjustment'}}}`` of one category (last period)."""
+        values, adjustments = self.latest
+        columns = REGISTRY.category_slices[REGISTRY.categories.index(category)]
+        return {
+            iup: {
+                REGISTRY.keys[col]: {
+                    'value': float(values[row, col]),
+                    'adjustment': ADJUSTMENT_KEYS[adjustments[row, col]]
+                }
+                for col in range(columns.start, columns.stop)
+                if not np.isnan(values[row, col])
+            }
+            for row, iup in enumerate(self.iups[:iups])
+        }
+
+    def write_iups(self, path):
+        """Write the IUP list in the ``iups.IUPRegistry.from_csv`` format."""
+        with open(path, 'w', newline='', encoding='utf-8') as handle:
+            writer = csv.writer(handle)
+            writer.writerow(['iup', 'group'])
+            writer.writerows(zip(self.iups, self.groups))
+
+
+# --- Benchmarks -------------------------------------------------------------
+# Each takes a Dataset and returns the zero-argument callable to measure.
+
+def bench_category_score(dataset):
+    """``utils.calculate_category_score`` for every IUP and category."""
+    from utils import calculate_category_score
+
+    inputs = {category: dataset.category_inputs(category) for category in REGISTRY.categories}
+
+    def run():
+        for category, all_data in inputs.items():
+            for category_data in all_data.values():
+                calculate_category_score(category_data, PARAMETERS[category], all_data)
+    return run
+
+
+def bench_final_score(dataset):
+    """``utils.calculate_final_score`` for every IUP."""
+    from utils import calculate_final_score
+
+    rng = np.random.default_rng(1)
+    scores = [
+        dict(zip(CATEGORY_WEIGHTS, row)) for row in rng.random((len(dataset.iups), len(CATEGORY_WEIGHTS))).tolist()
+    ]
+
+    def run():
+        for iup_scores in scores:
+            calculate_final_score(iup_scores)
+    return run
+
+
+def bench_scoring_engine(dataset):
+    """Batched category and final scores of the last period (``ScoringEngine``)."""
+    from scoring import ScoringEngine
+
+    values, adjustments = dataset.latest
+    multipliers = ADJUSTMENT_MULTIPLIERS[adjustments]
+
+    def run():
+        engine = ScoringEngine(dataset.iups, values, multipliers)
+        engine.final_scores(engine.category_scores())
+    return run
+
+
+def bench_score_hierarchy(dataset):
+    """Parameter-to-final score hierarchy of the last period (compare with ``scoring_engine``)."""
+    from scoring import ScoringEngine
+
+    values, adjustments = dataset.latest
+    multipliers = ADJUSTMENT_MULTIPLIERS[adjustments]
+
+    def run():
+        ScoringEngine(dataset.iups, values, multipliers).hierarchy()
+    return run
+
+
+def bench_scoring_update(dataset):
+    """One incremental input change (``ScoringState.set_value``)."""
+    from scoring import ScoringState
+
+    values, adjustments = dataset.latest
+    state = ScoringState(dataset.iups, values.copy(), adjustments.copy())
+    param_key = REGISTRY.keys[0]
+    toggle = iter(np.tile([1.0, 2.0], 1_000_000))
+
+    def run():
+        state.set_value(dataset.iups[0], param_key, next(toggle))
+    return run
+
+
+def bench_history(dataset):
+    """Building the history cube of every period plus its 3-month rolling mean."""
+    from history import HistoryStore
+
+    imported = dataset.to_imported()
+
+    def run():
+        HistoryStore.from_imported(imported).rolling_mean(3)
+    return run
+
+
+def bench_comparison_table(dataset):
+    """``create_comparison_table`` of the first category (capped at ``TABLE_IUPS`` columns)."""
+    from visualization import create_comparison_table
+
+    category = REGISTRY.categories[0]
+    inputs = dataset.category_inputs(category, TABLE_IUPS)
+    data = {
+        param_key: {
+            'name': REGISTRY[param_key].name,
+            'unit': REGISTRY[param_key].unit,
+            'values': {iup: entries[param_key] for iup, entries in inputs.items() if param_key in entries}
+        }
+        for param_key in (spec.key for spec in REGISTRY.category_params(category))
+    }
+
+    def run():
+        create_comparison_table.uncached(data, category)
+    return run
+
+
+def _radar_inputs(dataset):
+    from scoring import ScoringEngine
+
+    values, adjustments = dataset.latest
+    engine = ScoringEngine(dataset.iups[:CHART_IUPS], values[:CHART_IUPS], ADJUSTMENT_MULTIPLIERS[adjustments[:CHART_IUPS]])
+    return engine.iups, list(REGISTRY.categories), engine.hierarchy().categories
+
+
+def bench_radar_chart(dataset):
+    """``create_radar_chart`` with every category as an axis (capped at ``CHART_IUPS`` traces)."""
+    from visualization import create_radar_chart
+
+    names, axes, scores = _radar_inputs(dataset)
+
+    def run():
+        create_radar_chart(names, axes, scores)
+    return run
+
+
+def bench_radar_update(dataset):
+    """``update_radar_chart``: new scores written into an existing radar figure."""
+    from visualization import create_radar_chart, update_radar_chart
+
+    names, axes, scores = _radar_inputs(dataset)
+    fig = create_radar_chart(names, axes, scores)
+    versions = iter(np.tile([0.9, 1.0], 1_000_000))
+
+    def run():
+        update_radar_chart(fig, names, axes, scores * next(versions))
+    return run
+
+
+class AppRun:
+    """A headless session of ``app.py`` against the dataset in a scratch directory.
+
+    The IUP list and every period are written to ``iups.csv`` and a fresh
+    SQLite store there, exactly as the app would find them on disk.
+    """
+
+    def __init__(self, dataset):
+        import streamlit as st
+        from storage import Store
+
+        # Cached resources (store, IUP registry, history) belong to the previous case
+        st.cache_resource.clear()
+        st.cache_data.clear()
+        self._cwd = os.getcwd()
+        self._dir = tempfile.TemporaryDirectory(prefix='iup-bench-')
+        os.chdir(self._dir.name)
+        dataset.write_iups('iups.csv')
+        store = Store()
+        store.write_imported(dataset.to_imported())
+        values, adjustments = dataset.latest
+        store.write_inputs(dataset.iups, values, adjustments)
+        store.close()
+
+    def session(self):
+        from streamlit.testing.v1 import AppTest
+
+        return AppTest.from_file(APP_PATH, default_timeout=600)
+
+    def close(self):
+        os.chdir(self._cwd)
+        self._dir.cleanup()
+
+
+def bench_app_first_run(dataset):
+    """A new session's first run of ``app.main``."""
+    app = AppRun(dataset)
+
+    def run():
+        app.session().run()
+    run.close = app.close
+    run.repeats = NOISY_REPEATS
+    return run
+
+
+def bench_app_rerun(dataset):
+    """A warm rerun of ``app.main`` on the analysis section with every IUP selected."""
+    app = AppRun(dataset)
+    session = app.session().run()
+    session.checkbox(key='select_all_None').check().run()
+    session.radio(key='active_section').set_value('analysis').run()
+
+    def run():
+        session.run()
+        if session.exception:
+            raise RuntimeError(session.exception[0].value)
+    run.close = app.close
+    run.repeats = NOISY_REPEATS
+    return run
+
+
+def bench_kpi_ingest(dataset):
+    """``kpi.ingest``: a CSV haul trip log streamed into monthly KPIs."""
+    import pyarrow as pa
+    import pyarrow.csv as pa_csv
+    from kpi import ingest
+
+    rng = np.random.default_rng(0)
+    rows = len(dataset.iups) * len(dataset.months) * KPI_TRIPS
+    days = (dataset.months[-1] + 1).astype('datetime64[D]') - dataset.months[0].astype('datetime64[D]')
+    directory = tempfile.TemporaryDirectory(prefix='iup-bench-')
+    path = os.path.join(directory.name, 'trips.csv')
+    pa_csv.write_csv(pa.table({
+        'iup': np.array(dataset.iups)[rng.integers(0, len(dataset.iups), rows)],
+        'date': dataset.months[0].astype('datetime64[D]') + rng.integers(0, days.astype(int), rows),
+        'distance_km': np.round(rng.uniform(1.0, 20.0, rows), 2),
+        'tonnes': np.round(rng.uniform(10.0, 40.0, rows), 1)
+    }), path)
+
+    def run():
+        ingest({'trips': [path]})
+    run.close = directory.cleanup
+    return run
+
+
+def bench_telemetry_events(dataset):
+    """``TelemetryService.handle_lines`` and one publication: simulated events into running KPIs."""
+    from telemetry import TelemetryService, simulated_events
+
+    events = simulated_events(dataset.iups, seed=0)
+    lines = [next(events) for _ in range(TELEMETRY_EVENTS)]
+    service = TelemetryService([], iups=dataset.iups)
+
+    def run():
+        service.handle_lines(lines)
+        service.publish()
+    run.repeats = NOISY_REPEATS
+    return run
+
+
+def bench_api_score(dataset):
+    """``POST /score`` through ``ScoringAPI.handle``: a JSON scenario of every IUP (last period)."""
+    from api import ScoringAPI
+
+    values, _ = dataset.latest
+    body = json.dumps({
+        iup: {REGISTRY.keys[col]: float(value) for col, value in enumerate(values[row]) if not np.isnan(value)}
+        for row, iup in enumerate(dataset.iups)
+    }).encode()
+    api = ScoringAPI()
+
+    def run():
+        status, _, _ = api.handle('POST', '/score', body, {'Content-Type': 'application/json'})
+        if status != 200:
+            raise RuntimeError(f"/score returned {status}")
+    return run
+
+
+# name -> (setup, case filter)
+BENCHMARKS = {
+    'category_score': (bench_category_score, lambda iups, periods: iups <= LEGACY_IUPS),
+    'final_score': (bench_final_score, None),
+    'scoring_engine': (bench_scoring_engine, None),
+    'score_hierarchy': (bench_score_hierarchy, None),
+    'scoring_update': (bench_scoring_update, None),
+    'history': (bench_history, None),
+    'comparison_table': (bench_comparison_table, None),
+    'radar_chart': (bench_radar_chart, None),
+    'radar_update': (bench_radar_update, None),
+    'kpi_ingest': (bench_kpi_ingest, lambda iups, periods: iups * periods * KPI_TRIPS <= KPI_ROWS),
+    'telemetry_events': (bench_telemetry_events, None),
+    'api_score': (bench_api_score, lambda iups, periods: iups <= API_IUPS),
+    'app_first_run': (bench_app_first_run, lambda iups, periods: iups * periods * len(REGISTRY) <= APP_OBSERVATIONS),
+    'app_rerun': (bench_app_rerun, lambda iups, periods: iups * periods * len(REGISTRY) <= APP_OBSERVATIONS)
+}
+
+
+def case_name(iups, periods):
+    return f"{iups}x{periods}"
+
+
+def measure(func):
+    """Time ``func`` (median seconds over adaptive repeats), then its tracemalloc peak.
+
+    ``func.repeats`` optionally raises the minimum number of timed repeats.
+    """
+    func()  # warm-up
+    timings = []
+    min_repeats = getattr(func, 'repeats', MIN_REPEATS)
+    deadline = time.perf_counter() + TARGET_SECONDS
+    while len(timings) < min_repeats or (len(timings) < MAX_REPEATS and time.perf_counter() < deadline):
+        gc.collect()
+        start = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - start)
+
+    gc.collect()
+    tracemalloc.start()
+    try:
+        func()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return {'seconds': statistics.median(timings), 'peak_bytes': peak, 'repeats': len(timings)}
+
+
+def import_profile(module='app'):
+    """Import ``module`` in a fresh interpreter and parse its ``-X importtime`` log.
+
+    Returns ``[(name, self_us, cumulative_us, depth)]`` in completion order.
+    """
+    result = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', f"import {module}"],
+        cwd=os.path.dirname(APP_PATH), capture_output=True, text=True, check=True
+    )
+    entries = []
+    for line in result.stderr.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        self_us, cumulative_us, name = line[len('import time:'):].split('|')
+        depth = (len(name) - len(name.lstrip()) - 1) // 2
+        entries.append((name.strip(), int(self_us), int(cumulative_us), depth))
+    return entries
+
+
+def measure_startup(module='app', repeats=3):
+    """Time cold imports of ``module`` (median) and their tracemalloc peak, in fresh interpreters."""
+    timings = [import_profile(module)[-1][2] / 1e6 for _ in range(repeats)]
+    result = subprocess.run(
+        [sys.executable, '-c',
+         f"import tracemalloc; tracemalloc.start(); import {module}; print(tracemalloc.get_traced_memory()[1])"],
+        cwd=os.path.dirname(APP_PATH), capture_output=True, text=True, check=True
+    )
+    return {'seconds': statistics.median(timings), 'peak_bytes': int(result.stdout.split()[-1]), 'repeats': repeats}
+
+
+def startup_report(module='app', top=12):
+    """Print where a cold import of ``module`` spends its time, by package and by local module."""
+    entries = import_profile(module)
+    total = entries[-1][2]
+    local = {os.path.splitext(name)[0] for name in os.listdir(os.path.dirname(APP_PATH)) if name.endswith('.py')}
+
+    packages = {}
+    for name, self_us, _, _ in entries:
+        package = name.split('.')[0]
+        packages[package] = packages.get(package, 0) + self_us
+
+    print(f"Cold import of {module}: {total / 1000:.1f} ms", file=sys.stderr)
+    print(f"{'package':<24} {'self ms':>9} {'share':>7}", file=sys.stderr)
+    for package, self_us in sorted(packages.items(), key=lambda item: -item[1])[:top]:
+        print(f"{package:<24} {self_us / 1000:>9.1f} {self_us / total:>7.1%}", file=sys.stderr)
+
+    print(f"{'local module':<24} {'cumul. ms':>9} {'self ms':>9}", file=sys.stderr)
+    for name, self_us, cumulative_us, _ in sorted(entries, key=lambda entry: -entry[2]):
+        if name in local:
+            print(f"{name:<24} {cumulative_us / 1000:>9.1f} {self_us / 1000:>9.1f}", file=sys.stderr)
+
+
+def run_benchmarks(cases, names):
+    """Run the selected benchmarks on every case; returns ``{name: {case: result}}``."""
+    results = {}
+    for iups, periods in cases:
+        dataset = Dataset(iups, periods)
+        for name in names:
+            setup, accepts = BENCHMARKS[name]
+            if accepts is not None and not accepts(iups, periods):
+                continue
+            func = setup(dataset)
+            try:
+                results.setdefault(name, {})[case_name(iups, periods)] = measure(func)
+            finally:
+                getattr(func, 'close', lambda: None)()
+            result = results[name][case_name(iups, periods)]
+            print(
+                f"{name:<18} {case_name(iups, periods):>10} "
+                f"{result['seconds'] * 1000:>11.3f} ms {result['peak_bytes'] / 1024:>11.1f} KiB",
+                file=sys.stderr
+            )
+    return results
+
+
+def compare(results, baseline, time_tolerance, memory_tolerance, time_slack=0.001, memory_slack=64 * 1024):
+    """List the results that exceed their baseline; the slack absorbs noise on tiny cases."""
+    regressions = []
+    for name, cases in results.items():
+        for case, result in cases.items():
+            reference = baseline.get(name, {}).get(case)
+            if reference is None:
+                continue
+            if result['seconds'] > reference['seconds'] * (1 + time_tolerance) + time_slack:
+                regressions.append(
+                    f"{name} {case}: {result['seconds'] * 1000:.3f} ms "
+                    f"(baseline {reference['seconds'] * 1000:.3f} ms)"
+                )
+            if result['peak_bytes'] > reference['peak_bytes'] * (1 + memory_tolerance) + memory_slack:
+                regressions.append(
+                    f"{name} {case}: peak {result['peak_bytes'] / 1024:.1f} KiB "
+                    f"(baseline {reference['peak_bytes'] / 1024:.1f} KiB)"
+                )
+    return regressions
+
+
+def load_baseline(path):
+    if not os.path.exists(path):
+        return {}
+    with open(path, encoding='utf-8') as handle:
+        return json.load(handle).get('results', {})
+
+
+def save_baseline(path, results):
+    """Merge ``results`` into the baseline file, keeping cases that were not rerun."""
+    merged = load_baseline(path)
+    for name, cases in results.items():
+        merged.setdefault(name, {}).update(cases)
+    with open(path, 'w', encoding='utf-8') as handle:
+        json.dump(
+            {'python': platform.python_version(), 'machine': platform.machine(), 'results': merged},
+            handle, indent=2, sort_keys=True
+        )
+        handle.write('\n')
+
+
+def parse_case(text):
+    iups, _, periods = text.partition('x')
+    return int(iups), int(periods or 1)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark scoring, tables, charts and app reruns.")
+    parser.add_argument('--preset', choices=PRESETS, default='quick', help="Dataset grid (default: quick)")
+    parser.add_argument('--case', action='append', type=parse_case, metavar='IUPSxPERIODS',
+                        help="Run only these dataset sizes, e.g. 1000x24 (repeatable)")
+    parser.add_argument('--only', action='append', choices=BENCHMARKS, help="Run only these benchmarks")
+    parser.add_argument('--baseline', default=BASELINE_PATH, help=f"Baseline JSON (default: {BASELINE_PATH})")
+    parser.add_argument('--update-baseline', action='store_true', help="Store these results as the baseline")
+    parser.add_argument('--time-tolerance', type=float, default=0.5,
+                        help="Allowed slowdown as a fraction of the baseline (default: 0.5)")
+    parser.add_argument('--memory-tolerance', type=float, default=0.2,
+                        help="Allowed memory growth as a fraction of the baseline (default: 0.2)")
+    parser.add_argument('--startup', action='store_true',
+                        help="Also benchmark a cold import of app.py and report its time by module")
+    parser.add_argument('-o', '--output', help="Also write the results to this JSON file")
+    args = parser.parse_args(argv)
+
+    results = run_benchmarks(args.case or PRESETS[args.preset], args.only or list(BENCHMARKS))
+    if args.startup:
+        startup_report()
+        results['startup'] = {'app': measure_startup()}
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as handle:
+            json.dump(results, handle, indent=2, sort_keys=True)
+
+    if args.update_baseline:
+        save_baseline(args.baseline, results)
+        print(f"Baseline written to {args.baseline}", file=sys.stderr)
+        return 0
+
+    regressions = compare(results, load_baseline(args.baseline), args.time_tolerance, args.memory_tolerance)
+    for regression in regressions:
+        print(f"REGRESSION {regression}", file=sys.stderr)
+    return 1 if regressions else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
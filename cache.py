@@ -0,0 +1,103 @@
+"""Content-addressed figure and table cache for the IUP Performance Comparison application."""
+
+import functools
+import hashlib
+import json
+import threading
+from collections import OrderedDict
+
+import numpy as np
+from config import CACHE_CONFIG
+
+
+def _encode(obj):
+    """Encode values json does not know about for hashing."""
+    if isinstance(obj, np.ndarray):
+        return {'__ndarray__': hashlib.blake2b(np.ascontiguousarray(obj).tobytes(), digest_size=16).hexdigest(),
+                'dtype': str(obj.dtype), 'shape': obj.shape}
+    if isinstance(obj, np.generic):
+        return obj.item()
+    if isinstance(obj, (set, frozenset)):
+        return sorted(obj, key=repr)
+    return repr(obj)
+
+
+def stable_hash(*parts):
+    """Get a stable content hash of JSON-like values (dicts, lists, numbers, arrays)."""
+    payload = json.dumps(parts, default=_encode, separators=(',', ':'))
+    return hashlib.blake2b(payload.encode('utf-8'), digest_size=16).hexdigest()
+
+
+class LRUCache:
+    """Thread-safe, bounded LRU cache with hit and miss counters.
+
+    Cached objects are shared between callers (and sessions), so they must be
+    treated as read-only.
+    """
+
+    def __init__(self, max_entries):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get_or_create(self, key, factory):
+        """Get the cached value for ``key``, building it with ``factory`` on a miss."""
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return self._entries[key]
+            self.misses += 1
+
+        value = factory()
+
+        with self._lock:
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+        return value
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.hits = self.misses = self.evictions = 0
+
+    def stats(self):
+        """Get a snapshot of the cache counters."""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'entries': len(self._entries),
+                'max_entries': self.max_entries,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'hit_rate': self.hits / lookups if lookups else 0.0
+            }
+
+
+# Process-wide cache, shared by every session with identical inputs
+FIGURE_CACHE = LRUCache(CACHE_CONFIG['max_entries'])
+
+
+def memoized(cache, *extra_key):
+    """Memoize a figure/table builder in ``cache`` by a hash of its arguments.
+
+    ``extra_key`` holds configuration the output depends on (for example
+    ``CHART_CONFIG``). The undecorated function stays available as
+    ``.uncached``.
+    """
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            key = stable_hash(func.__module__, func.__qualname__, args, kwargs, extra_key)
+            return cache.get_or_create(key, lambda: func(*args, **kwargs))
+
+        wrapper.uncached = func
+        return wrapper
+    return decorator
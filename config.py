@@ -1,13 +1,34 @@
 """Configuration settings and constants for the IUP Performance Comparison application."""
 
-# IUP List
+# IUP List (fallback when IUP_SOURCE does not exist)
 IUP_LIST = ['BPM', 'BSJ', 'JAS', 'KFM']
 
+# Optional CSV listing the IUP portfolio (columns: iup, group)
+IUP_SOURCE = 'iups.csv'
+
+# Large IUP selections are paginated and can be aggregated per group
+IUP_DISPLAY_CONFIG = {
+    'page_size': 12,        # IUPs per page in input grids, metrics and comparison tables
+    'group_threshold': 12   # Aggregate per group by default above this many selected IUPs
+}
+
 # Bahasa Indonesia Labels
 LABELS = {
     'title': 'Perbandingan Kinerja IUP',
     'settings': 'Pengaturan',
     'select_iups': 'Pilih IUP untuk Dibandingkan',
+    'navigation': 'Navigasi',
+    'iups': {
+        'group': 'Grup IUP',
+        'all_groups': 'Semua Grup',
+        'ungrouped': 'Tanpa Grup',
+        'select_all': 'Pilih semua IUP dalam grup',
+        'selected': '{count} IUP dipilih',
+        'page': 'Halaman IUP',
+        'page_caption': 'IUP {start}-{end} dari {total}',
+        'aggregate': 'Agregasi per grup',
+        'aggregate_help': 'Tampilkan rata-rata per grup IUP pada grafik dan tabel'
+    },
     'tabs': {
         'input': 'Input Parameter',
         'analysis': 'Analisis Kinerja',
@@ -25,6 +46,8 @@ LABELS = {
         'Equipment & Infrastructure': 'Peralatan & Infrastruktur',
         'Direct Mining Costs': 'Biaya Penambangan Langsung',
         'Equipment Costs': 'Biaya Peralatan',
+        'Administrative Costs': 'Biaya Administrasi',
+        'Personnel Costs': 'Biaya Personel',
         'Ore Grade Parameters': 'Parameter Kadar Bijih',
         'Revenue Metrics': 'Metrik Pendapatan',
         'Financial Health': 'Kesehatan Keuangan'
@@ -36,10 +59,128 @@ LABELS = {
         'MUDAH': 'Mudah (0.8x)',
         'SANGAT_MUDAH': 'Sangat Mudah (0.6x)'
     },
+    'input_mode': {
+        'title': 'Mode Input',
+        'grid': 'Tabel (massal)',
+        'fields': 'Per parameter',
+        'submit': 'Terapkan Perubahan'
+    },
+    'normalization': {
+        'title': 'Metode Normalisasi',
+        'help': 'Cara nilai parameter diskalakan ke 0-1 sebelum diberi bobot',
+        'minmax': 'Min-Max',
+        'zscore': 'Z-Score',
+        'robust': 'Robust (Median/IQR)',
+        'percentile': 'Peringkat Persentil'
+    },
+    'import': {
+        'title': 'Impor Data',
+        'file': 'File CSV/Excel/JSON',
+        'help': 'Kolom: iup, period, adjustment, lalu satu kolom per parameter (kunci atau nama parameter)',
+        'submit': 'Impor',
+        'loaded': '{rows} baris diimpor, {iups} IUP dimuat (periode terbaru)',
+        'added': '{count} IUP baru ditambahkan ke registri',
+        'error': 'Gagal mengimpor file'
+    },
+    'snapshot': {
+        'title': 'Skenario',
+        'author': 'Penyusun',
+        'prepare': 'Siapkan File Skenario',
+        'save': 'Simpan Skenario',
+        'file': 'File Skenario (.arrow)',
+        'info': 'Dibuat {created} oleh {author} · {rows} baris · normalisasi {method}',
+        'changes': '{cells} nilai berubah, {added} IUP baru, {removed} IUP tidak ada dibanding input saat ini',
+        'weights_differ': 'Bobot dalam skenario berbeda dengan konfigurasi saat ini',
+        'load': 'Muat Skenario',
+        'loaded': 'Skenario dimuat: {iups} IUP, {periods} periode historis',
+        'error': 'Gagal membaca skenario'
+    },
+    'trends': {
+        'empty': 'Belum ada data historis. Impor file dengan kolom period melalui panel Impor Data.',
+        'parameter': 'Parameter',
+        'measure': 'Tampilan',
+        'raw': 'Nilai',
+        'moving_average': 'Rata-rata Bergerak',
+        'yoy': 'Perubahan YoY',
+        'window': 'Jendela (bulan)',
+        'range': 'Rentang Periode'
+    },
+    'debug': {
+        'toggle': 'Tampilkan Panel Debug',
+        'title': 'Debug',
+        'cache': 'Cache Grafik & Tabel',
+        'store_cache': 'Cache Kueri Database',
+        'hit_rate': 'Rasio Hit',
+        'profile': 'Waktu per Tahap',
+        'reruns': 'Rerun Diprofilkan',
+        'last_rerun': 'Rerun Terakhir',
+        'stage': 'Tahap',
+        'calls': 'Panggilan',
+        'last_ms': 'Terakhir (ms)',
+        'p50_ms': 'p50 (ms)',
+        'p95_ms': 'p95 (ms)'
+    },
+    'telemetry': {
+        'title': 'Telemetri Langsung',
+        'status': '{rate:,.0f} peristiwa/detik · {iups} IUP · {errors} ditolak · diperbarui {updated}',
+        'waiting': 'Menunggu data telemetri...',
+        'source_error': 'Sumber telemetri {source} gagal: {error}',
+        'period': 'Periode',
+        'follow': 'Perbarui Seluruh Tampilan',
+        'follow_help': 'Jalankan ulang dasbor setiap kali telemetri mengubah nilai IUP terpilih'
+    },
     'analysis': {
         'final_scores': 'Skor Akhir',
         'comparison': 'Perbandingan',
-        'best_performer': 'Kinerja Terbaik'
+        'best_performer': 'Kinerja Terbaik',
+        'others': 'Lainnya',
+        'view': 'Tampilan Analisis',
+        'overview': 'Ringkasan',
+        'drilldown': 'Rincian Skor',
+        'sensitivity': 'Sensitivitas'
+    },
+    'radar': {
+        'title': 'Perbandingan Kinerja',
+        'level': 'Sumbu Radar',
+        'category': 'Kategori',
+        'subcategory': 'Subkategori'
+    },
+    'drilldown': {
+        'category': 'Kategori',
+        'level': 'Tingkat',
+        'item': 'Komponen',
+        'final': 'Skor Akhir',
+        'levels': {
+            'final': 'Akhir',
+            'category': 'Kategori',
+            'subcategory': 'Subkategori',
+            'parameter': 'Parameter'
+        },
+        'help': 'Skor subkategori dan kategori adalah rata-rata tertimbang skor parameter di bawahnya.'
+    },
+    'leaderboard': {
+        'title': 'Peringkat Skor Akhir',
+        'rank': 'Peringkat',
+        'score': 'Skor Akhir',
+        'percentile': 'Persentil'
+    },
+    'sensitivity': {
+        'description': 'Simulasi Monte Carlo atas bobot parameter, pengali tingkat kesulitan dan bobot kategori.',
+        'samples': 'Jumlah Sampel',
+        'run': 'Jalankan Simulasi',
+        'running': 'Menjalankan simulasi...',
+        'stale': 'Input atau pilihan IUP telah berubah sejak simulasi terakhir. Jalankan ulang untuk memperbarui hasil.',
+        'baseline': 'Skor Dasar',
+        'mean': 'Rata-rata',
+        'ci_low': 'Batas Bawah',
+        'ci_high': 'Batas Atas',
+        'ci_subsample': 'Interval kepercayaan dihitung dari {kept:,} dari {samples:,} sampel untuk membatasi memori.',
+        'baseline_rank': 'Peringkat Dasar',
+        'rank_stability': 'P(Peringkat Tetap)',
+        'top_probability': 'P(Peringkat 1)',
+        'drivers': 'Faktor Pemicu Perubahan Peringkat',
+        'factor': 'Faktor',
+        'influence': 'Korelasi dengan Perubahan Peringkat'
     }
 }
 
@@ -87,6 +228,12 @@ CATEGORY_WEIGHTS = {
     'FINANCIAL': 0.15
 }
 
+# Number of IUPs shown in the final-score leaderboard
+LEADERBOARD_SIZE = 10
+
+# Normalization Strategies (see scoring.normalize_columns)
+NORMALIZATION_METHODS = ('minmax', 'zscore', 'robust', 'percentile')
+
 # Theme Configuration
 THEME = {
     'primary_color': '#1f77b4',
@@ -102,3 +249,60 @@ CHART_CONFIG = {
     'height': 600,
     'width': 1000
 }
+
+# Chart Downsampling Configuration
+DOWNSAMPLING_CONFIG = {
+    'method': 'lttb',          # 'lttb' or 'minmax'
+    'points_per_pixel': 2,     # Max points per series = CHART_CONFIG['width'] x this
+    'webgl_threshold': 5000,   # Switch line charts to WebGL above this many points
+    'max_bars': 30             # Bars beyond this are folded into one "others" bar
+}
+
+# Monte Carlo Sensitivity Configuration
+SENSITIVITY_CONFIG = {
+    'samples': 100_000,
+    'chunk_size': 10_000,
+    'weight_sigma': 0.2,             # Log-normal spread of each parameter weight
+    'adjustment_sigma': 0.1,         # Log-normal spread of each adjustment multiplier
+    'category_concentration': 100,   # Dirichlet concentration around CATEGORY_WEIGHTS
+    'confidence': 0.9,
+    'seed': 42,
+    'max_chunk_cells': 50_000_000,   # Caps chunk_size for large IUP selections
+    'max_score_cells': 10_000_000    # Caps samples x IUPs kept for confidence intervals
+}
+
+# SQLite Persistence Configuration (see storage.Store)
+STORAGE_CONFIG = {
+    'path': 'iup_data.sqlite',
+    'pool_size': 4,          # Idle connections kept open
+    'cache_entries': 1024    # Cached query results
+}
+
+# Figure/Table Cache Configuration
+CACHE_CONFIG = {
+    'max_entries': 256
+}
+
+# Rerun Profiling Configuration (see profiling.Profiler)
+PROFILING_CONFIG = {
+    'enabled': False,                  # Profile every rerun, not only with the diagnostics panel open
+    'log_path': 'iup_profile.jsonl',   # JSON lines, one per profiled rerun (None to disable)
+    'window': 500                      # Reruns kept per stage for the percentiles
+}
+
+# Live Telemetry Configuration (see telemetry.TelemetryService)
+TELEMETRY_CONFIG = {
+    'enabled': False,                          # Start the service and show the live panel
+    'sources': ['tcp://127.0.0.1:8765'],       # tcp://host:port, file:path (tailed) or simulate:rate
+    'publish_interval': 2.0,                   # Seconds between refreshed values on the dashboard
+    'tail_poll': 0.2                           # Seconds between checks of a tailed file
+}
+
+# Local Scoring API Configuration (see api.py)
+API_CONFIG = {
+    'host': '127.0.0.1',                 # Loopback only; other systems on this machine
+    'port': 8770,
+    'workers': 1,                        # Server processes sharing the port (SO_REUSEPORT)
+    'max_body_bytes': 64 << 20,          # Larger request bodies are refused (413)
+    'window': 10_000                     # Requests kept per endpoint for the latency percentiles
+}
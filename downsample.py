@@ -0,0 +1,114 @@
+"""Shape-preserving downsampling for large chart series."""
+
+import numpy as np
+from config import CHART_CONFIG, DOWNSAMPLING_CONFIG
+
+
+def max_points():
+    """Get the largest number of points worth drawing for the configured chart width."""
+    return int(CHART_CONFIG['width'] * DOWNSAMPLING_CONFIG['points_per_pixel'])
+
+
+def numeric_axis(x):
+    """Get a float axis for ``x`` (dates, date strings or numbers), falling back to positions."""
+    try:
+        return np.asarray(x, dtype='datetime64[ns]').astype(np.int64).astype(np.float64)
+    except (TypeError, ValueError):
+        pass
+    try:
+        return np.asarray(x, dtype=np.float64)
+    except (TypeError, ValueError):
+        return np.arange(len(x), dtype=np.float64)
+
+
+def minmax_indices(y, threshold):
+    """Get indices keeping the min and max of each bucket (plus both end points)."""
+    y = np.asarray(y, dtype=np.float64)
+    n = len(y)
+    if threshold >= n or threshold < 4:
+        return np.arange(n)
+
+    buckets = (threshold - 2) // 2
+    edges = np.linspace(1, n - 1, buckets + 1).astype(np.intp)
+    starts, stops = edges[:-1], edges[1:]
+    keep = stops > starts
+    starts, stops = starts[keep], stops[keep]
+
+    # Pad every bucket to the widest one so argmin/argmax run in one pass
+    width = int((stops - starts).max())
+    offsets = starts[:, None] + np.arange(width)
+    valid = offsets < stops[:, None]
+    window = y[np.minimum(offsets, n - 1)]
+    lows = np.where(valid, window, np.inf).argmin(axis=1) + starts
+    highs = np.where(valid, window, -np.inf).argmax(axis=1) + starts
+    return np.unique(np.concatenate([[0, n - 1], lows, highs]))
+
+
+def lttb_indices(x, y, threshold):
+    """Get indices chosen by Largest-Triangle-Three-Buckets downsampling."""
+    x = numeric_axis(x)
+    y = np.asarray(y, dtype=np.float64)
+    n = len(y)
+    if threshold >= n or threshold < 3:
+        return np.arange(n)
+
+    edges = np.linspace(1, n - 1, threshold - 1).astype(np.intp)
+    selected = np.empty(threshold, dtype=np.intp)
+    selected[0], selected[-1] = 0, n - 1
+
+    previous = 0
+    for bucket in range(threshold - 2):
+        start, stop = edges[bucket], max(edges[bucket + 1], edges[bucket] + 1)
+        next_stop = edges[bucket + 2] if bucket + 2 < len(edges) else n
+        next_start = min(stop, n - 1)
+        next_x = x[next_start:max(next_stop, next_start + 1)].mean()
+        next_y = y[next_start:max(next_stop, next_start + 1)].mean()
+
+        # Pick the point forming the largest triangle with the previous pick and the next bucket's mean
+        area = np.abs(
+            (x[previous] - next_x) * (y[start:stop] - y[previous])
+            - (x[previous] - x[start:stop]) * (next_y - y[previous])
+        )
+        previous = start + int(area.argmax())
+        selected[bucket + 1] = previous
+
+    return np.unique(selected)
+
+
+def downsample(x, y, threshold=None, method=None):
+    """Downsample a series to at most about ``threshold`` points.
+
+    Returns ``(x, y)`` as lists; short series are returned unchanged.
+    """
+    threshold = max_points() if threshold is None else threshold
+    if len(y) <= threshold:
+        return list(x), list(y)
+
+    method = DOWNSAMPLING_CONFIG['method'] if method is None else method
+    if method == 'minmax':
+        indices = minmax_indices(y, threshold)
+    else:
+        indices = lttb_indices(x, y, threshold)
+
+    x, y = np.asarray(x, dtype=object), np.asarray(y, dtype=np.float64)
+    return x[indices].tolist(), y[indices].tolist()
+
+
+def top_n(labels, values, n=None, others_label='Others', direction=1.0):
+    """Keep the ``n - 1`` best values and fold the rest into their mean.
+
+    ``direction`` follows ``ParameterSpec.direction``: 1.0 keeps the largest
+    values, -1.0 the smallest. Returns ``(labels, values)``; the last label names how many entries were
+    folded, e.g. ``'Others (42)'``.
+    """
+    n = DOWNSAMPLING_CONFIG['max_bars'] if n is None else n
+    if len(values) <= n:
+        return list(labels), list(values)
+
+    values = np.asarray(values, dtype=np.float64)
+    order = np.argsort(-direction * values, kind='stable')
+    kept, rest = order[:n - 1], order[n - 1:]
+    return (
+        [labels[idx] for idx in kept] + [f"{others_label} ({len(rest)})"],
+        values[kept].tolist() + [float(values[rest].mean())]
+    )
@@ -0,0 +1,117 @@
+"""Columnar historical store for the IUP Performance Comparison application."""
+
+import numpy as np
+from importer import ImportedData
+from registry import REGISTRY
+
+
+class HistoryStore:
+    """Monthly parameter history as dense (parameter x IUP x month) arrays.
+
+    Each parameter owns a contiguous (IUP x month) block and every IUP's
+    series is contiguous along the month axis, so slicing by parameter, IUP
+    or date range copies only the requested blocks, and rolling aggregates
+    run over the whole cube in one vectorized pass. Missing months are NaN.
+    """
+
+    def __init__(self, iups, months, values, adjustments):
+        self.iups = list(iups)
+        self.rows = {iup: row for row, iup in enumerate(self.iups)}
+        self.months = months
+        self.values = values
+        self.adjustments = adjustments
+
+    @classmethod
+    def from_imported(cls, imported):
+        """Build a store from an ``importer.ImportedData``; undated rows are ignored."""
+        dated = ~np.isnat(imported.periods)
+        iup_ids = imported.iup_ids[dated]
+        periods = imported.periods[dated]
+        if not len(periods):
+            months = np.array([], dtype='datetime64[M]')
+        else:
+            months = np.arange(periods.min(), periods.max() + 1)
+
+        shape = (len(REGISTRY), len(imported.iups), len(months))
+        values = np.full(shape, np.nan)
+        adjustments = np.zeros(shape, dtype=np.int8)
+        if len(periods):
+            # Later rows for the same IUP and month win
+            columns = (periods - months[0]).astype(np.intp)
+            values[:, iup_ids, columns] = imported.values[dated].T
+            adjustments[:, iup_ids, columns] = imported.adjustments[dated].T
+
+        return cls(imported.iups, months, values, adjustments)
+
+    def __len__(self):
+        return len(self.months)
+
+    def to_imported(self):
+        """Get the stored months as ``importer.ImportedData`` rows, skipping empty ones."""
+        values = self.values.transpose(1, 2, 0).reshape(-1, len(REGISTRY))
+        adjustments = self.adjustments.transpose(1, 2, 0).reshape(-1, len(REGISTRY))
+        rows = np.flatnonzero(~np.isnan(values).all(axis=1))
+        return ImportedData(
+            self.iups,
+            (rows // len(self.months)).astype(np.int32),
+            self.months[rows % len(self.months)],
+            values[rows],
+            adjustments[rows]
+        )
+
+    def _month_range(self, start=None, end=None):
+        lo = 0 if start is None else int(np.searchsorted(self.months, np.datetime64(start, 'M'), 'left'))
+        hi = len(self.months) if end is None else int(np.searchsorted(self.months, np.datetime64(end, 'M'), 'right'))
+        return slice(lo, hi)
+
+    def slice(self, param_keys=None, iups=None, start=None, end=None, values=None):
+        """Get ``(months, cube)`` for the requested parameters, IUPs and date range.
+
+        ``values`` defaults to the raw value cube; pass the result of
+        ``rolling_mean`` or ``yoy_delta`` to slice a derived cube instead.
+        """
+        values = self.values if values is None else values
+        months = self._month_range(start, end)
+        params = slice(None) if param_keys is None else [REGISTRY.index[key] for key in param_keys]
+        rows = slice(None) if iups is None else [self.rows[iup] for iup in iups]
+        return self.months[months], values[params][:, rows, months]
+
+    def series(self, param_key, iups=None, start=None, end=None, values=None):
+        """Get ``{iup: {month: value}}`` for one parameter, skipping empty months."""
+        iups = self.iups if iups is None else [iup for iup in iups if iup in self.rows]
+        months, cube = self.slice([param_key], iups, start, end, values)
+        labels = months.astype(str).tolist()
+        return {
+            iup: {labels[col]: float(row[col]) for col in np.flatnonzero(~np.isnan(row))}
+            for iup, row in zip(iups, cube[0])
+        }
+
+    def rolling_mean(self, window):
+        """Get the trailing ``window``-month moving average of every series.
+
+        Empty months are skipped; a month with no data in its window is NaN.
+        """
+        present = ~np.isnan(self.values)
+        zero = np.zeros(self.values.shape[:2] + (1,))
+        totals = np.concatenate([zero, np.cumsum(np.where(present, self.values, 0.0), axis=2)], axis=2)
+        counts = np.concatenate([zero, np.cumsum(present, axis=2)], axis=2)
+
+        stop = np.arange(1, len(self.months) + 1)
+        start = np.maximum(stop - window, 0)
+        window_totals = totals[:, :, stop] - totals[:, :, start]
+        window_counts = counts[:, :, stop] - counts[:, :, start]
+        return np.divide(
+            window_totals, window_counts,
+            out=np.full(self.values.shape, np.nan), where=window_counts > 0
+        )
+
+    def yoy_delta(self, relative=False):
+        """Get the change versus the same month one year earlier (NaN for the first year)."""
+        delta = np.full(self.values.shape, np.nan)
+        current, previous = self.values[:, :, 12:], self.values[:, :, :-12]
+        if relative:
+            np.divide(current - previous, np.abs(previous), out=delta[:, :, 12:],
+                      where=previous != 0)
+        else:
+            delta[:, :, 12:] = current - previous
+        return delta
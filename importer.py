@@ -0,0 +1,371 @@
+"""Streaming CSV/Excel import of IUP parameter data.
+
+Each input row holds one IUP and period, an optional adjustment level and a
+value per parameter. Columns are matched to ``PARAMETERS`` keys (or display
+names), and rows are appended block by block into columnar arrays, so memory
+stays bounded by the block size plus the result itself. pandas and openpyxl
+are imported when a file is actually parsed.
+"""
+
+import csv
+import json
+
+import numpy as np
+
+from config import LABELS
+from registry import ADJUSTMENT_CODES, REGISTRY
+
+IUP_COLUMN = 'iup'
+PERIOD_COLUMN = 'period'
+ADJUSTMENT_COLUMN = 'adjustment'
+DEFAULT_ADJUSTMENT = 'NORMAL'
+BLOCK_ROWS = 4096
+
+# Accepted spellings for adjustment cells: keys and their display labels
+_ADJUSTMENT_ALIASES = {
+    **{adjustment.lower(): code for adjustment, code in ADJUSTMENT_CODES.items()},
+    **{LABELS['adjustments'][adjustment].lower(): code for adjustment, code in ADJUSTMENT_CODES.items()},
+    '': ADJUSTMENT_CODES[DEFAULT_ADJUSTMENT]
+}
+_PARAMETER_ALIASES = {
+    **{spec.name.lower(): spec.index for spec in REGISTRY.specs},
+    **{spec.key: spec.index for spec in REGISTRY.specs}
+}
+
+
+class ImportedData:
+    """Columnar import result: one row per (IUP, period).
+
+    ``values`` is a (rows x parameters) float64 matrix in ``REGISTRY`` order
+    with NaN for missing cells, and ``adjustments`` the matching int8
+    adjustment codes.
+    """
+
+    def __init__(self, iups, iup_ids, periods, values, adjustments):
+        self.iups = iups
+        self.iup_ids = iup_ids
+        self.periods = periods
+        self.values = values
+        self.adjustments = adjustments
+
+    @classmethod
+    def from_rows(cls, iups, values, adjustments, periods=None):
+        """Build a result with one row per IUP (undated unless ``periods`` is given)."""
+        if periods is None:
+            periods = np.full(len(iups), np.datetime64('NaT'), dtype='datetime64[M]')
+        return cls(list(iups), np.arange(len(iups), dtype=np.int32), periods, values, adjustments)
+
+    @classmethod
+    def concat(cls, parts):
+        """Stack several results into one, merging their IUP lists."""
+        iups = list(dict.fromkeys(iup for part in parts for iup in part.iups))
+        index = {iup: idx for idx, iup in enumerate(iups)}
+        return cls(
+            iups,
+            np.concatenate([
+                np.array([index[iup] for iup in part.iups], dtype=np.int32)[part.iup_ids]
+                if len(part) else np.empty(0, dtype=np.int32)
+                for part in parts
+            ]),
+            np.concatenate([part.periods for part in parts]),
+            np.concatenate([part.values for part in parts]),
+            np.concatenate([part.adjustments for part in parts])
+        )
+
+    def __len__(self):
+        return len(self.iup_ids)
+
+    def latest(self, prefer_undated=False):
+        """Get ``{iup: row}`` pointing at each IUP's most recent period.
+
+        Undated rows count as the oldest period, or as the newest one with
+        ``prefer_undated`` (e.g. the current inputs saved in a snapshot).
+        """
+        undated = np.datetime64('9999-12' if prefer_undated else '0001-01', 'M')
+        order = np.lexsort((np.where(np.isnat(self.periods), undated, self.periods), self.iup_ids))
+        last = np.flatnonzero(np.diff(self.iup_ids[order], append=-1))
+        return {self.iups[self.iup_ids[order[row]]]: int(order[row]) for row in last}
+
+
+class _ColumnarBuilder:
+    """Append row blocks into growable contiguous arrays."""
+
+    def __init__(self):
+        self.iups = []
+        self._iup_index = {}
+        self._size = 0
+        self._capacity = BLOCK_ROWS
+        self._iup_ids = np.empty(self._capacity, dtype=np.int32)
+        self._periods = np.empty(self._capacity, dtype='datetime64[M]')
+        self._values = np.empty((self._capacity, len(REGISTRY)))
+        self._adjustments = np.empty((self._capacity, len(REGISTRY)), dtype=np.int8)
+
+    def _reserve(self, rows):
+        if self._size + rows <= self._capacity:
+            return
+        while self._capacity < self._size + rows:
+            self._capacity *= 2
+        self._iup_ids = np.resize(self._iup_ids, self._capacity)
+        self._periods = np.resize(self._periods, self._capacity)
+        self._values = np.resize(self._values, (self._capacity, len(REGISTRY)))
+        self._adjustments = np.resize(self._adjustments, (self._capacity, len(REGISTRY)))
+
+    def append(self, iups, periods, values, adjustments):
+        """Append a block of rows; ``values``/``adjustments`` are already in registry order."""
+        rows = len(iups)
+        self._reserve(rows)
+        stop = self._size + rows
+        self._iup_ids[self._size:stop] = [
+            self._iup_index.setdefault(iup, len(self._iup_index)) for iup in iups
+        ]
+        self.iups.extend(list(self._iup_index)[len(self.iups):])
+        self._periods[self._size:stop] = periods
+        self._values[self._size:stop] = values
+        self._adjustments[self._size:stop] = adjustments
+        self._size = stop
+
+    def build(self):
+        size = self._size
+        return ImportedData(
+            self.iups,
+            self._iup_ids[:size].copy(),
+            self._periods[:size].copy(),
+            self._values[:size].copy(),
+            self._adjustments[:size].copy()
+        )
+
+
+def _map_header(header):
+    """Map header cells to (iup, period, adjustment, [(column, param_index)])."""
+    names = [str(cell).strip() if cell is not None else '' for cell in header]
+    lowered = [name.lower() for name in names]
+    if IUP_COLUMN not in lowered:
+        raise ValueError(f"Missing required '{IUP_COLUMN}' column")
+
+    param_columns = [
+        (column, _PARAMETER_ALIASES[name])
+        for column, name in enumerate(lowered)
+        if name in _PARAMETER_ALIASES
+    ]
+    if not param_columns:
+        raise ValueError("No columns match any parameter in PARAMETERS")
+
+    return (
+        lowered.index(IUP_COLUMN),
+        lowered.index(PERIOD_COLUMN) if PERIOD_COLUMN in lowered else None,
+        lowered.index(ADJUSTMENT_COLUMN) if ADJUSTMENT_COLUMN in lowered else None,
+        param_columns
+    )
+
+
+def _to_periods(cells):
+    """Convert period cells (dates, datetimes or 'YYYY-MM[-DD]' strings) to months."""
+    import pandas as pd
+
+    return pd.to_datetime(pd.Series(cells, dtype=object), errors='raise').to_numpy().astype('datetime64[M]')
+
+
+def _to_adjustment_codes(cells):
+    import pandas as pd
+
+    labels = pd.Series(cells, dtype=object).fillna('').astype(str).str.strip().str.lower()
+    codes = labels.map(_ADJUSTMENT_ALIASES)
+    if codes.isna().any():
+        raise ValueError(f"Unknown adjustment level: {cells[int(codes.isna().to_numpy().argmax())]!r}")
+    return codes.to_numpy(dtype=np.int8)
+
+
+def _append_block(builder, columns, mapping):
+    """Convert one block of column arrays and append it to the builder.
+
+    Rows with a blank (empty, None or NaN) IUP cell are skipped.
+    """
+    iup_column, period_column, adjustment_column, param_columns = mapping
+    iups = [str(iup).strip() if iup is not None and iup == iup else '' for iup in columns[iup_column]]
+    keep = [row for row, iup in enumerate(iups) if iup]
+    if len(keep) < len(iups):
+        columns = [[column[row] for row in keep] for column in columns]
+        iups = [iups[row] for row in keep]
+    rows = len(iups)
+    if not rows:
+        return
+
+    values = np.full((rows, len(REGISTRY)), np.nan)
+    param_indices = [param_index for _, param_index in param_columns]
+    try:
+        # Numeric columns (and None for empty cells) convert in one shot
+        values[:, param_indices] = np.array([columns[column] for column, _ in param_columns], dtype=np.float64).T
+    except (TypeError, ValueError):
+        import pandas as pd
+
+        for column, param_index in param_columns:
+            values[:, param_index] = pd.to_numeric(pd.Series(columns[column]), errors='raise')
+
+    if period_column is None:
+        periods = np.full(rows, np.datetime64('NaT'), dtype='datetime64[M]')
+    else:
+        periods = _to_periods(columns[period_column])
+
+    if adjustment_column is None:
+        codes = np.full(rows, ADJUSTMENT_CODES[DEFAULT_ADJUSTMENT], dtype=np.int8)
+    else:
+        codes = _to_adjustment_codes(columns[adjustment_column])
+
+    builder.append(
+        iups,
+        periods,
+        values,
+        np.repeat(codes[:, None], len(REGISTRY), axis=1)
+    )
+
+
+def _read_csv_header(source):
+    """Read the header row of a CSV path or seekable file-like object."""
+    if hasattr(source, 'readline'):
+        line = source.readline()
+        source.seek(0)
+        if isinstance(line, bytes):
+            line = line.decode('utf-8-sig')
+    else:
+        with open(source, encoding='utf-8-sig', newline='') as handle:
+            line = handle.readline()
+    return next(csv.reader([line]), [])
+
+
+def read_csv(source, block_rows=BLOCK_ROWS):
+    """Stream a CSV file (path or file-like) into an ``ImportedData``."""
+    import pandas as pd
+
+    header = _read_csv_header(source)
+    mapping = _map_header(header)
+    param_names = {header[column] for column, _ in mapping[3]}
+    dtypes = {name: np.float64 if name in param_names else str for name in header}
+
+    builder = _ColumnarBuilder()
+    for chunk in pd.read_csv(source, chunksize=block_rows, dtype=dtypes, keep_default_na=False,
+                             na_values={name: [''] for name in param_names}):
+        _append_block(builder, [chunk[name].to_numpy() for name in header], mapping)
+    return builder.build()
+
+
+def read_excel(source, sheet_name=None, block_rows=BLOCK_ROWS):
+    """Stream an Excel workbook (path or file-like) into an ``ImportedData``.
+
+    The workbook is opened read-only and rows are iterated as plain values,
+    ``block_rows`` at a time.
+    """
+    from openpyxl import load_workbook
+
+    workbook = load_workbook(source, read_only=True, data_only=True)
+    try:
+        sheet = workbook[sheet_name] if sheet_name else workbook.active
+        rows = sheet.iter_rows(values_only=True)
+        mapping = _map_header(next(rows, ()))
+        builder = _ColumnarBuilder()
+
+        block = []
+        for row in rows:
+            if row[mapping[0]] is None:
+                continue
+            block.append(row)
+            if len(block) == block_rows:
+                _append_block(builder, list(zip(*block)), mapping)
+                block = []
+        if block:
+            _append_block(builder, list(zip(*block)), mapping)
+        return builder.build()
+    finally:
+        workbook.close()
+
+
+def _scalar(value, where):
+    """Check that a JSON cell holds a single value, not an object or array."""
+    if isinstance(value, (dict, list)):
+        raise ValueError(f"{where} must be a single value, not a JSON {'object' if isinstance(value, dict) else 'array'}")
+    return value
+
+
+def _flatten_json_iup(entries, iup):
+    """Yield ``(param_key, value, adjustment)`` from flat or category-nested IUP data."""
+    for key, entry in entries.items():
+        if key in REGISTRY.index:
+            where = f"IUP {iup!r}, parameter {key!r}"
+            if isinstance(entry, dict):
+                yield key, _scalar(entry.get('value'), where), _scalar(entry.get('adjustment'), where)
+            else:
+                yield key, _scalar(entry, where), None
+        elif isinstance(entry, dict):
+            yield from _flatten_json_iup(entry, iup)
+
+
+def read_json(source):
+    """Import a JSON scenario file (path or file-like) into an ``ImportedData``."""
+    if hasattr(source, 'read'):
+        return parse_json(json.load(source))
+    with open(source, encoding='utf-8') as handle:
+        return parse_json(json.load(handle))
+
+
+def parse_json(payload):
+    """Import a decoded JSON scenario into an ``ImportedData``.
+
+    Accepts a list of row records (same columns as the CSV layout), or an
+    ``{iup: ...}`` mapping whose entries are either the app's session layout
+    ``{category: {param_key: {'value', 'adjustment'}}}`` or a flat
+    ``{param_key: value | {'value', 'adjustment'}}``.
+    """
+    builder = _ColumnarBuilder()
+    if isinstance(payload, list):
+        for number, record in enumerate(payload, 1):
+            if not isinstance(record, dict):
+                raise ValueError(f"Record {number} must be a JSON object, not {type(record).__name__}")
+            for name, cell in record.items():
+                _scalar(cell, f"Record {number}, column {name!r}")
+        if payload:
+            header = list(dict.fromkeys(key for record in payload for key in record))
+            columns = [[record.get(name) for record in payload] for name in header]
+            _append_block(builder, columns, _map_header(header))
+        return builder.build()
+
+    if not isinstance(payload, dict):
+        raise ValueError(f"Expected a JSON object of IUPs or a list of records, not {type(payload).__name__}")
+    values = np.full((len(payload), len(REGISTRY)), np.nan)
+    adjustments = np.full(values.shape, ADJUSTMENT_CODES[DEFAULT_ADJUSTMENT], dtype=np.int8)
+    # Cells are gathered first and written with one assignment (None converts to NaN)
+    rows, cols, cells = [], [], []
+    for row, (iup, entries) in enumerate(payload.items()):
+        if not isinstance(entries, dict):
+            raise ValueError(f"IUP {iup!r} must map to a JSON object of parameters, not {type(entries).__name__}")
+        for param_key, value, adjustment in _flatten_json_iup(entries, iup):
+            col = REGISTRY.index[param_key]
+            rows.append(row)
+            cols.append(col)
+            cells.append(value)
+            if adjustment is not None:
+                code = _ADJUSTMENT_ALIASES.get(str(adjustment).strip().lower())
+                if code is None:
+                    raise ValueError(f"Unknown adjustment level: {adjustment!r}")
+                adjustments[row, col] = code
+    if payload and not cells:
+        raise ValueError("No keys match any parameter in PARAMETERS")
+    values[rows, cols] = np.array(cells, dtype=np.float64)
+
+    builder.append(
+        [str(iup) for iup in payload],
+        np.full(len(payload), np.datetime64('NaT'), dtype='datetime64[M]'),
+        values,
+        adjustments
+    )
+    return builder.build()
+
+
+def read_table(source, filename=None):
+    """Import a CSV, Excel or JSON source, choosing the reader from its file name."""
+    filename = (filename or getattr(source, 'name', None) or str(source)).lower()
+    if filename.endswith(('.xlsx', '.xlsm')):
+        return read_excel(source)
+    if filename.endswith('.csv'):
+        return read_csv(source)
+    if filename.endswith('.json'):
+        return read_json(source)
+    raise ValueError(f"Unsupported file type: {filename}")
@@ -0,0 +1,90 @@
+"""Indexed IUP registry for the IUP Performance Comparison application."""
+
+import csv
+import os
+import threading
+
+import numpy as np
+from config import IUP_LIST, IUP_SOURCE
+
+
+class IUPRegistry:
+    """Append-only, indexed list of IUPs with an optional group per IUP.
+
+    Row indices never change once assigned, so per-session arrays indexed by
+    IUP can simply grow when new IUPs are registered.
+    """
+
+    def __init__(self, names=(), groups=()):
+        self.names = []
+        self.groups = []
+        self.index = {}
+        self._lock = threading.Lock()
+        self.add(names, groups)
+
+    @classmethod
+    def from_csv(cls, path):
+        """Load IUPs from a CSV with an ``iup`` column and an optional ``group`` column."""
+        with open(path, newline='', encoding='utf-8-sig') as handle:
+            rows = [
+                {key.strip().lower(): (value or '').strip() for key, value in row.items() if key}
+                for row in csv.DictReader(handle)
+            ]
+        rows = [row for row in rows if row.get('iup')]
+        return cls([row['iup'] for row in rows], [row.get('group', '') for row in rows])
+
+    def __len__(self):
+        return len(self.names)
+
+    def __contains__(self, iup):
+        return iup in self.index
+
+    def add(self, names, groups=()):
+        """Register IUPs that are not known yet; returns the newly added names."""
+        groups = list(groups) + [''] * (len(names) - len(groups))
+        added = []
+        with self._lock:
+            for name, group in zip(names, groups):
+                if name not in self.index:
+                    self.index[name] = len(self.names)
+                    self.names.append(name)
+                    self.groups.append(group)
+                    added.append(name)
+        return added
+
+    def group_names(self):
+        """Get the distinct groups in registration order."""
+        return list(dict.fromkeys(self.groups))
+
+    def in_group(self, group):
+        """Get the IUPs of one group (``None`` for all IUPs)."""
+        if group is None:
+            return list(self.names)
+        return [name for name, owner in zip(self.names, self.groups) if owner == group]
+
+    def aggregate(self, iups, matrix):
+        """Average the rows of ``matrix`` (one per IUP in ``iups``) per group.
+
+        Returns ``(groups, means)`` with one row per group, ignoring NaN.
+        """
+        labels = [self.groups[self.index[iup]] for iup in iups]
+        groups = list(dict.fromkeys(labels))
+        group_ids = np.array([groups.index(label) for label in labels], dtype=np.intp)
+
+        matrix = np.asarray(matrix, dtype=np.float64).reshape(len(iups), -1)
+        present = ~np.isnan(matrix)
+        totals = np.zeros((len(groups), matrix.shape[1]))
+        counts = np.zeros_like(totals)
+        np.add.at(totals, group_ids, np.where(present, matrix, 0.0))
+        np.add.at(counts, group_ids, present)
+        means = np.divide(totals, counts, out=np.full(totals.shape, np.nan), where=counts > 0)
+        return groups, means
+
+
+def load_iup_registry(path=IUP_SOURCE):
+    """Load the IUP registry from ``path`` if it exists, else from ``IUP_LIST``."""
+    if path and os.path.exists(path):
+        registry = IUPRegistry.from_csv(path)
+        if len(registry):
+            return registry
+    return IUPRegistry(IUP_LIST)
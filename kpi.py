@@ -0,0 +1,342 @@
+"""Derived KPI pipeline: raw fleet and production logs to ``PARAMETERS`` values.
+
+Logs are read in record batches from CSV files (pyarrow's streaming,
+multi-threaded reader) or memory-mapped Arrow IPC files, and every batch is
+reduced to running sums per (IUP, month) with ``np.bincount``, so memory
+stays bounded by the batch size plus one row of sums per IUP and month.
+
+Log kinds and their columns (other columns are ignored):
+
+- ``trips``: ``iup``, ``date``, ``distance_km``, ``tonnes`` (one row per haul trip)
+- ``equipment``: ``iup``, ``date``, ``status``, ``hours`` (status durations)
+- ``fuel``: ``iup``, ``date``, ``cost`` (fuel tickets, USD)
+- ``targets``: ``iup``, ``date``, ``target_tonnes`` (planned production)
+
+Derived parameters per IUP and month:
+
+- ``hauling_distance``: mean trip distance (km)
+- ``production_target_achievement``: hauled / planned tonnes (%)
+- ``equipment_availability``: operating + standby / all status hours (%)
+- ``equipment_utilization``: operating / operating + standby hours (%)
+- ``fuel_cost``: fuel cost / hauled tonnes (USD/WMT)
+
+Usage:
+    python kpi.py --trips trips.csv --equipment status.arrow --fuel fuel.csv \\
+        --targets plan.csv -o kpis.csv [--store] [--apply-latest] [--score]
+"""
+
+import argparse
+import csv
+import sys
+import time
+
+import numpy as np
+
+from importer import DEFAULT_ADJUSTMENT, IUP_COLUMN, PERIOD_COLUMN, ImportedData
+from registry import ADJUSTMENT_CODES, REGISTRY
+
+DATE_COLUMN = 'date'
+BLOCK_BYTES = 4 << 20
+
+LOG_COLUMNS = {
+    'trips': ('distance_km', 'tonnes'),
+    'equipment': ('status', 'hours'),
+    'fuel': ('cost',),
+    'targets': ('target_tonnes',)
+}
+
+# Running sums kept per (IUP, month)
+SUMS = (
+    'trips', 'distance_km', 'tonnes', 'operating_hours', 'standby_hours', 'down_hours',
+    'fuel_tickets', 'fuel_cost', 'target_tonnes'
+)
+_SUM_INDEX = {name: col for col, name in enumerate(SUMS)}
+
+# Equipment status spellings -> index into the operating/standby/down hour sums
+STATUS_ALIASES = {
+    'operating': 0, 'operate': 0, 'running': 0, 'working': 0,
+    'standby': 1, 'idle': 1, 'delay': 1,
+    'down': 2, 'breakdown': 2, 'maintenance': 2, 'repair': 2
+}
+_STATUS_SUMS = ('operating_hours', 'standby_hours', 'down_hours')
+
+KPI_KEYS = (
+    'hauling_distance', 'production_target_achievement', 'equipment_availability',
+    'equipment_utilization', 'fuel_cost'
+)
+
+# Month keys are offset so pre-1970 months stay positive
+_MONTH_OFFSET = 1 << 15
+
+
+def kpi_values(sums):
+    """Get the ``KPI_KEYS`` columns (NaN where undefined) of a rows x ``SUMS`` matrix."""
+    if not len(sums):
+        return np.empty((0, len(KPI_KEYS)))
+    totals = {name: sums[:, col] for col, name in enumerate(SUMS)}
+    available = totals['operating_hours'] + totals['standby_hours']
+    status_hours = available + totals['down_hours']
+
+    def ratio(numerator, denominator, scale=1.0):
+        return np.divide(
+            numerator * scale, denominator,
+            out=np.full(len(numerator), np.nan), where=denominator > 0
+        )
+
+    return np.column_stack([
+        ratio(totals['distance_km'], totals['trips']),
+        ratio(totals['tonnes'], totals['target_tonnes'], 100.0),
+        ratio(available, status_hours, 100.0),
+        ratio(totals['operating_hours'], available, 100.0),
+        # Months without fuel tickets have no fuel cost rather than zero
+        np.where(totals['fuel_tickets'] > 0, ratio(totals['fuel_cost'], totals['tonnes']), np.nan)
+    ])
+
+
+class KPIAccumulator:
+    """Running sums per (IUP, month), merged batch by batch.
+
+    Each batch is grouped densely over its own IUPs x month span with
+    ``np.bincount``; only the few resulting groups are merged into the
+    growable ``sums`` matrix (one row per IUP and month seen so far).
+    """
+
+    def __init__(self):
+        self.iups = []
+        self._iup_index = {}
+        self._rows = {}
+        self.keys = np.empty(0, dtype=np.int64)
+        self.sums = np.zeros((0, len(SUMS)))
+
+    def __len__(self):
+        return len(self._rows)
+
+    def _iup_ids(self, names):
+        return np.array([self._iup_index.setdefault(name, len(self._iup_index)) for name in names], dtype=np.int64)
+
+    def _group_rows(self, keys):
+        """Get accumulator rows for ``keys``, appending rows for new ones."""
+        rows = np.empty(len(keys), dtype=np.intp)
+        new = []
+        for idx, key in enumerate(keys.tolist()):
+            row = self._rows.get(key)
+            if row is None:
+                row = self._rows[key] = len(self._rows)
+                new.append(key)
+            rows[idx] = row
+        if new:
+            self.keys = np.concatenate([self.keys, np.array(new, dtype=np.int64)])
+            self.sums = np.vstack([self.sums, np.zeros((len(new), len(SUMS)))])
+        return rows
+
+    def add(self, iup_names, iup_codes, months, sums):
+        """Add one batch.
+
+        ``iup_codes`` index ``iup_names`` (the batch dictionary), ``months``
+        are months since 1970-01 and ``sums`` maps ``SUMS`` names to per-row
+        amounts (``None`` adds one per row, i.e. counts rows).
+        """
+        if not len(months):
+            return
+        iup_ids = self._iup_ids(iup_names)
+        self.iups.extend(list(self._iup_index)[len(self.iups):])
+
+        # Dense group index over this batch's IUP dictionary and month span
+        first, span = int(months.min()), int(months.max() - months.min()) + 1
+        groups = iup_codes.astype(np.intp) * span + (months - first)
+        size = len(iup_names) * span
+
+        counts = np.bincount(groups, minlength=size)
+        present = np.flatnonzero(counts)
+        keys = iup_ids[present // span] * (1 << 16) + (present % span + first + _MONTH_OFFSET)
+        rows = self._group_rows(keys)
+
+        for name, weights in sums.items():
+            totals = counts if weights is None else np.bincount(groups, weights=weights, minlength=size)
+            self.sums[rows, _SUM_INDEX[name]] += totals[present]
+
+    def kpis(self):
+        """Get ``(iups, months, values)``: one (IUP, month) row per group, KPIs in ``KPI_KEYS`` order."""
+        iup_ids = self.keys >> 16
+        months = ((self.keys & 0xFFFF) - _MONTH_OFFSET).astype('datetime64[M]')
+        return [self.iups[iup_id] for iup_id in iup_ids], months, kpi_values(self.sums)
+
+    def to_imported(self):
+        """Get the KPIs as ``importer.ImportedData`` rows sorted by IUP and month.
+
+        Every other parameter is NaN, so writing the result with
+        ``clear_missing=False`` leaves manual inputs alone.
+        """
+        _, months, kpis = self.kpis()
+        order = np.lexsort((months, self.keys >> 16))
+        values = np.full((len(order), len(REGISTRY)), np.nan)
+        values[:, [REGISTRY.index[key] for key in KPI_KEYS]] = kpis[order]
+        adjustments = np.full(values.shape, ADJUSTMENT_CODES[DEFAULT_ADJUSTMENT], dtype=np.int8)
+        return ImportedData(
+            list(self.iups),
+            (self.keys[order] >> 16).astype(np.int32),
+            months[order],
+            values,
+            adjustments
+        )
+
+
+def _read_batches(path, kind):
+    """Yield record batches of the columns a log kind needs (CSV streamed, Arrow memory-mapped)."""
+    import pyarrow as pa
+    import pyarrow.csv as pa_csv
+
+    columns = [IUP_COLUMN, DATE_COLUMN, *LOG_COLUMNS[kind]]
+    if str(path).lower().endswith(('.arrow', '.feather', '.ipc')):
+        with pa.memory_map(str(path), 'r') as source:
+            reader = pa.ipc.open_file(source)
+            for index in range(reader.num_record_batches):
+                yield reader.get_batch(index).select(columns)
+        return
+
+    types = {IUP_COLUMN: pa.dictionary(pa.int32(), pa.string()), DATE_COLUMN: pa.timestamp('s')}
+    types.update({
+        column: pa.dictionary(pa.int32(), pa.string()) if column == 'status' else pa.float64()
+        for column in LOG_COLUMNS[kind]
+    })
+    reader = pa_csv.open_csv(
+        str(path),
+        read_options=pa_csv.ReadOptions(block_size=BLOCK_BYTES),
+        convert_options=pa_csv.ConvertOptions(column_types=types, include_columns=columns)
+    )
+    yield from reader
+
+
+def _dictionary(array):
+    """Get ``(names, codes)`` of a string or dictionary column."""
+    import pyarrow as pa
+
+    if not pa.types.is_dictionary(array.type):
+        array = array.dictionary_encode()
+    if array.null_count:
+        raise ValueError("Log rows must name an IUP and status")
+    return array.dictionary.to_pylist(), array.indices.to_numpy(zero_copy_only=False)
+
+
+def _months(array):
+    """Convert a date or timestamp column to months since 1970-01."""
+    import pyarrow as pa
+
+    if array.null_count:
+        raise ValueError("Log rows must have a date")
+    if not pa.types.is_timestamp(array.type):
+        array = array.cast(pa.timestamp('s'))
+    return array.to_numpy(zero_copy_only=False).astype('datetime64[M]').astype(np.int64)
+
+
+def _numbers(array):
+    """Get a numeric column as float64, with missing amounts as 0."""
+    import pyarrow as pa
+
+    return array.cast(pa.float64()).fill_null(0.0).to_numpy(zero_copy_only=False)
+
+
+def add_batch(accumulator, kind, batch):
+    """Reduce one record batch of a log kind into the accumulator."""
+    names, codes = _dictionary(batch.column(IUP_COLUMN))
+    months = _months(batch.column(DATE_COLUMN))
+
+    if kind == 'trips':
+        sums = {'trips': None, 'distance_km': _numbers(batch.column('distance_km')),
+                'tonnes': _numbers(batch.column('tonnes'))}
+    elif kind == 'fuel':
+        sums = {'fuel_tickets': None, 'fuel_cost': _numbers(batch.column('cost'))}
+    elif kind == 'targets':
+        sums = {'target_tonnes': _numbers(batch.column('target_tonnes'))}
+    else:
+        statuses, status_codes = _dictionary(batch.column('status'))
+        lookup = [STATUS_ALIASES.get(str(status).strip().lower()) for status in statuses]
+        if None in lookup:
+            raise ValueError(f"Unknown equipment status: {statuses[lookup.index(None)]!r}")
+        hours = _numbers(batch.column('hours'))
+        status_ids = np.array(lookup, dtype=np.intp)[status_codes]
+        sums = {
+            name: np.where(status_ids == status, hours, 0.0)
+            for status, name in enumerate(_STATUS_SUMS)
+        }
+
+    accumulator.add(names, codes, months, sums)
+    return batch.num_rows
+
+
+def ingest(logs, accumulator=None):
+    """Stream ``{kind: [paths]}`` logs into a ``KPIAccumulator``; returns it and the row count."""
+    accumulator = KPIAccumulator() if accumulator is None else accumulator
+    rows = 0
+    for kind, paths in logs.items():
+        if kind not in LOG_COLUMNS:
+            raise ValueError(f"Unknown log kind: {kind!r} (expected one of {tuple(LOG_COLUMNS)})")
+        for path in paths:
+            for batch in _read_batches(path, kind):
+                rows += add_batch(accumulator, kind, batch)
+    return accumulator, rows
+
+
+def write_csv(imported, path):
+    """Write KPI rows in the ``importer`` layout (iup, period, parameter keys)."""
+    columns = [REGISTRY.index[key] for key in KPI_KEYS]
+    with open(path, 'w', newline='', encoding='utf-8') as handle:
+        writer = csv.writer(handle)
+        writer.writerow([IUP_COLUMN, PERIOD_COLUMN, *KPI_KEYS])
+        for iup_id, period, values in zip(imported.iup_ids, imported.periods, imported.values[:, columns]):
+            writer.writerow([imported.iups[iup_id], str(period)] + ['' if np.isnan(v) else f"{v:.6g}" for v in values])
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Derive IUP parameters from raw fleet and production logs.")
+    for kind in LOG_COLUMNS:
+        parser.add_argument(f"--{kind}", action='append', default=[], metavar='PATH',
+                            help=f"{kind} log (CSV or Arrow IPC; repeatable)")
+    parser.add_argument('-o', '--output', help="Write the KPIs as an importable CSV")
+    parser.add_argument('--store', action='store_true', help="Write the KPIs into the SQLite store as history")
+    parser.add_argument('--apply-latest', action='store_true',
+                        help="Also store each IUP's latest month as its current input values")
+    parser.add_argument('--score', action='store_true', help="Print final scores and ranks per month")
+    args = parser.parse_args(argv)
+
+    logs = {kind: getattr(args, kind) for kind in LOG_COLUMNS if getattr(args, kind)}
+    if not logs:
+        parser.error("no log files given")
+
+    start = time.perf_counter()
+    accumulator, rows = ingest(logs)
+    imported = accumulator.to_imported()
+    elapsed = max(time.perf_counter() - start, 1e-9)
+    print(
+        f"Aggregated {rows} log rows into {len(imported)} IUP-months in {elapsed:.2f}s "
+        f"({rows / elapsed:,.0f} rows/s)",
+        file=sys.stderr
+    )
+
+    if args.output:
+        write_csv(imported, args.output)
+    if args.store or args.apply_latest:
+        from storage import Store
+
+        store = Store()
+        with store.batch():
+            store.write_imported(imported)
+            if args.apply_latest:
+                latest = imported.latest()
+                rows = list(latest.values())
+                columns = [REGISTRY.index[key] for key in KPI_KEYS]
+                # Values only: adjustments set by hand on the live inputs stay
+                store.write_values(list(latest), KPI_KEYS, imported.values[np.ix_(rows, columns)])
+        store.close()
+    if args.score:
+        from batch_score import score_imported
+
+        columns = score_imported(imported, 'kpi')
+        writer = csv.writer(sys.stdout)
+        writer.writerow(['period', 'iup', 'final_score', 'rank'])
+        writer.writerows(zip(columns['period'], columns['iup'], columns['final_score'], columns['rank']))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
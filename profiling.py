@@ -0,0 +1,167 @@
+"""Per-rerun timing spans for the IUP Performance Comparison application.
+
+Spans are recorded only while a rerun is being profiled on the current
+thread (Streamlit runs each session's script on its own thread). Otherwise
+``span`` returns a shared no-op context manager and ``timed`` functions call
+straight through, so disabled instrumentation costs one thread-local lookup.
+"""
+
+import contextlib
+import functools
+import json
+import threading
+import time
+from collections import deque
+
+import numpy as np
+from config import PROFILING_CONFIG
+
+_NO_SPAN = contextlib.nullcontext()
+
+
+class _ThreadState(threading.local):
+    # A class default avoids the AttributeError of a missing thread-local attribute
+    rerun = None
+
+
+class Rerun:
+    """The stages timed during one rerun, as ``{stage: [seconds, calls]}``.
+
+    Stages may nest (a section span contains its chart spans), so their
+    times are not additive.
+    """
+
+    __slots__ = ('session', 'number', 'started', 'stages')
+
+    def __init__(self, session, number):
+        self.session = session
+        self.number = number
+        self.started = time.perf_counter()
+        self.stages = {}
+
+    def add(self, stage, seconds):
+        entry = self.stages.get(stage)
+        if entry is None:
+            self.stages[stage] = [seconds, 1]
+        else:
+            entry[0] += seconds
+            entry[1] += 1
+
+
+class _Span:
+    __slots__ = ('rerun', 'stage', 'start')
+
+    def __init__(self, rerun, stage):
+        self.rerun = rerun
+        self.stage = stage
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.rerun.add(self.stage, time.perf_counter() - self.start)
+        return False
+
+
+class Profiler:
+    """Collects rerun spans, keeps per-stage percentiles and writes JSON lines.
+
+    Each profiled rerun adds its total time per stage to a bounded window
+    (``window`` reruns), from which ``stats`` reports p50/p95. With a
+    ``log_path`` every finished rerun is appended there as one JSON object.
+    """
+
+    def __init__(self, window=500, log_path=None):
+        self.window = window
+        self.log_path = log_path
+        self.reruns = 0
+        self._samples = {}
+        self._local = _ThreadState()
+        self._lock = threading.Lock()
+
+    def span(self, stage):
+        """Time a ``with`` block as ``stage`` of the current rerun, if it is profiled."""
+        rerun = self._local.rerun
+        return _NO_SPAN if rerun is None else _Span(rerun, stage)
+
+    def timed(self, stage=None):
+        """Decorate a function so each call is a span (named after it by default)."""
+        def decorator(func):
+            name = stage or func.__name__
+            local = self._local
+
+            @functools.wraps(func)
+            def wrapper(*args, **kwargs):
+                rerun = local.rerun
+                if rerun is None:
+                    return func(*args, **kwargs)
+                start = time.perf_counter()
+                try:
+                    return func(*args, **kwargs)
+                finally:
+                    rerun.add(name, time.perf_counter() - start)
+            return wrapper
+        return decorator
+
+    def start_rerun(self, session, number):
+        """Start profiling a rerun on the current thread."""
+        self._local.rerun = Rerun(session, number)
+
+    def finish_rerun(self, **extra):
+        """Stop profiling the current rerun and return its record (``None`` if none).
+
+        ``extra`` (e.g. cache counters) is added to the record and log line.
+        """
+        rerun = self._local.rerun
+        if rerun is None:
+            return None
+        self._local.rerun = None
+        rerun.add('rerun', time.perf_counter() - rerun.started)
+
+        with self._lock:
+            self.reruns += 1
+            for stage, (seconds, _) in rerun.stages.items():
+                samples = self._samples.get(stage)
+                if samples is None:
+                    samples = self._samples[stage] = deque(maxlen=self.window)
+                samples.append(seconds)
+
+        record = {
+            'time': time.time(),
+            'session': rerun.session,
+            'rerun': rerun.number,
+            'stages': {
+                stage: {'ms': seconds * 1000, 'calls': calls}
+                for stage, (seconds, calls) in rerun.stages.items()
+            },
+            **extra
+        }
+        if self.log_path:
+            with self._lock, open(self.log_path, 'a', encoding='utf-8') as handle:
+                handle.write(json.dumps(record, separators=(',', ':')) + '\n')
+        return record
+
+    def stats(self):
+        """Get ``{stage: {'count', 'p50_ms', 'p95_ms', 'p99_ms', 'mean_ms'}}`` over the window."""
+        with self._lock:
+            samples = {stage: np.array(values) * 1000 for stage, values in self._samples.items()}
+        return {
+            stage: {
+                'count': len(values),
+                'p50_ms': float(np.percentile(values, 50)),
+                'p95_ms': float(np.percentile(values, 95)),
+                'p99_ms': float(np.percentile(values, 99)),
+                'mean_ms': float(values.mean())
+            }
+            for stage, values in samples.items()
+        }
+
+    def reset(self):
+        with self._lock:
+            self._samples.clear()
+            self.reruns = 0
+
+
+# Process-wide profiler shared by every session
+PROFILER = Profiler(PROFILING_CONFIG['window'], PROFILING_CONFIG['log_path'])
@@ -0,0 +1,95 @@
+"""Direction-aware ranking index for the IUP Performance Comparison application."""
+
+import numpy as np
+from registry import REGISTRY
+
+FINAL = 'final'
+
+
+def _best_first(keys):
+    """Get (order, ranks, count) per column of ``keys``; higher is better, NaN last."""
+    order = np.argsort(-keys, axis=0, kind='stable')
+    ranks = np.empty_like(order)
+    np.put_along_axis(ranks, order, np.arange(keys.shape[0]).reshape((-1,) + (1,) * (keys.ndim - 1)), axis=0)
+    return order, ranks, (~np.isnan(keys)).sum(axis=0)
+
+
+class RankingIndex:
+    """Sorted orders of IUPs per parameter, category and final score.
+
+    Built once per data change with one argsort per column; parameter orders
+    honour each parameter's ``optimal_direction``. Targets are parameter keys,
+    category names or ``FINAL``. Best performer, rank and percentile lookups
+    are O(1); top-k and bottom-k are O(k). IUPs without a value rank last and
+    are never returned as best, top or bottom performers.
+    """
+
+    def __init__(self, iups, values, category_scores, final_scores):
+        self.iups = list(iups)
+        self.rows = {iup: row for row, iup in enumerate(self.iups)}
+        self._values = values
+        self._category_scores = category_scores
+        self._final_scores = final_scores
+
+        self._params = _best_first(values * REGISTRY.directions)
+        self._categories = _best_first(category_scores)
+        self._final = _best_first(final_scores)
+
+    @classmethod
+    def from_scoring(cls, scoring, iups):
+        """Build an index over ``iups`` from a ``ScoringEngine``/``ScoringState``."""
+        rows = [scoring.rows[iup] for iup in iups] if hasattr(scoring, 'rows') else [
+            scoring.iups.index(iup) for iup in iups
+        ]
+        return cls(
+            iups,
+            scoring.values[rows],
+            scoring.category_scores()[rows],
+            scoring.final_scores()[rows]
+        )
+
+    def _lookup(self, target):
+        """Get (order, ranks, count, values) for a target."""
+        if target == FINAL:
+            order, ranks, count = self._final
+            return order, ranks, int(count), self._final_scores
+        if target in REGISTRY:
+            col = REGISTRY.index[target]
+            order, ranks, count = self._params
+            return order[:, col], ranks[:, col], int(count[col]), self._values[:, col]
+        col = REGISTRY.categories.index(target)
+        order, ranks, count = self._categories
+        return order[:, col], ranks[:, col], int(count[col]), self._category_scores[:, col]
+
+    def best(self, target):
+        """Get the best-performing IUP for a target, or ``None`` without data."""
+        order, _, count, _ = self._lookup(target)
+        return self.iups[order[0]] if count else None
+
+    def top_k(self, target, k):
+        """Get ``[(iup, value), ...]`` for the ``k`` best IUPs, best first."""
+        order, _, count, values = self._lookup(target)
+        return [(self.iups[row], float(values[row])) for row in order[:min(k, count)]]
+
+    def bottom_k(self, target, k):
+        """Get ``[(iup, value), ...]`` for the ``k`` worst IUPs with data, worst first."""
+        order, _, count, values = self._lookup(target)
+        return [(self.iups[row], float(values[row])) for row in order[max(count - k, 0):count][::-1]]
+
+    def rank(self, iup, target):
+        """Get the 1-based rank of an IUP, or ``None`` if it has no value."""
+        _, ranks, count, _ = self._lookup(target)
+        rank = int(ranks[self.rows[iup]])
+        return rank + 1 if rank < count else None
+
+    def percentile(self, iup, target):
+        """Get the share of other ranked IUPs an IUP beats (0 to 1), or ``None``."""
+        _, ranks, count, _ = self._lookup(target)
+        rank = int(ranks[self.rows[iup]])
+        if rank >= count:
+            return None
+        return 1.0 if count == 1 else (count - 1 - rank) / (count - 1)
+
+    def best_performers(self, param_keys):
+        """Get ``{param_key: best iup or None}`` for several parameters."""
+        return {param_key: self.best(param_key) for param_key in param_keys}
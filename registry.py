@@ -0,0 +1,130 @@
+"""Precompiled parameter registry for the IUP Performance Comparison application."""
+
+import numpy as np
+from config import ADJUSTMENT_LEVELS, CATEGORY_WEIGHTS
+from parameters import PARAMETERS
+
+
+class ParameterSpec:
+    """Compact, read-only description of a single parameter."""
+
+    __slots__ = (
+        'key', 'index', 'name', 'unit', 'weight', 'tooltip',
+        'optimal_direction', 'direction', 'category', 'subcategory'
+    )
+
+    def __init__(self, key, index, category, subcategory, param_config):
+        self.key = key
+        self.index = index
+        self.category = category
+        self.subcategory = subcategory
+        self.name = param_config['name']
+        self.unit = param_config['unit']
+        self.weight = float(param_config['weight'])
+        self.tooltip = param_config['tooltip']
+        self.optimal_direction = param_config['optimal_direction']
+        self.direction = 1.0 if self.optimal_direction == 'higher' else -1.0
+
+    def __getitem__(self, field):
+        """Allow a spec to stand in for its ``PARAMETERS`` config dict."""
+        return getattr(self, field)
+
+    def __repr__(self):
+        return f"ParameterSpec({self.key!r}, index={self.index})"
+
+
+class ParameterRegistry:
+    """Flat, ordered view of ``PARAMETERS`` with contiguous lookup arrays.
+
+    Parameters keep their ``PARAMETERS`` order, so every category and
+    subcategory occupies a contiguous slice of the flat index.
+    """
+
+    def __init__(self, parameters, category_weights):
+        self.categories = list(parameters.keys())
+        self.subcategories = []
+        specs = []
+        category_ids = []
+        subcategory_ids = []
+
+        for category_id, (category, subcategories) in enumerate(parameters.items()):
+            for subcategory, params in subcategories.items():
+                subcategory_id = len(self.subcategories)
+                self.subcategories.append((category, subcategory))
+                for param_key, param_config in params.items():
+                    specs.append(ParameterSpec(param_key, len(specs), category, subcategory, param_config))
+                    category_ids.append(category_id)
+                    subcategory_ids.append(subcategory_id)
+
+        self.specs = tuple(specs)
+        self.keys = tuple(spec.key for spec in specs)
+        self.index = {spec.key: spec.index for spec in specs}
+
+        self.weights = np.array([spec.weight for spec in specs], dtype=np.float64)
+        self.directions = np.array([spec.direction for spec in specs], dtype=np.float64)
+        self.category_ids = np.array(category_ids, dtype=np.intp)
+        self.subcategory_ids = np.array(subcategory_ids, dtype=np.intp)
+
+        self.category_weights = np.array(
+            [category_weights[category] for category in self.categories], dtype=np.float64
+        )
+        self.category_weight_totals = np.bincount(
+            self.category_ids, weights=self.weights, minlength=len(self.categories)
+        )
+        # One-hot (parameter x category) membership used to sum per category
+        self.category_membership = np.zeros((len(specs), len(self.categories)))
+        self.category_membership[np.arange(len(specs)), self.category_ids] = 1.0
+        # The same for subcategories, and (subcategory x category) to roll them up
+        self.subcategory_membership = np.zeros((len(specs), len(self.subcategories)))
+        self.subcategory_membership[np.arange(len(specs)), self.subcategory_ids] = 1.0
+        self.subcategory_category_ids = np.array(
+            [self.categories.index(category) for category, _ in self.subcategories], dtype=np.intp
+        )
+        self.subcategory_category_membership = np.zeros((len(self.subcategories), len(self.categories)))
+        self.subcategory_category_membership[np.arange(len(self.subcategories)), self.subcategory_category_ids] = 1.0
+
+        self.category_slices = self._slices(self.category_ids, len(self.categories))
+        self.subcategory_slices = self._slices(self.subcategory_ids, len(self.subcategories))
+
+        for array in (self.weights, self.directions,
+                      self.category_ids, self.subcategory_ids,
+                      self.category_weights, self.category_weight_totals, self.category_membership,
+                      self.subcategory_membership, self.subcategory_category_ids,
+                      self.subcategory_category_membership):
+            array.flags.writeable = False
+
+    @staticmethod
+    def _slices(ids, count):
+        starts = np.searchsorted(ids, np.arange(count), side='left')
+        stops = np.searchsorted(ids, np.arange(count), side='right')
+        return tuple(slice(int(start), int(stop)) for start, stop in zip(starts, stops))
+
+    def __len__(self):
+        return len(self.specs)
+
+    def __getitem__(self, param_key):
+        return self.specs[self.index[param_key]]
+
+    def __contains__(self, param_key):
+        return param_key in self.index
+
+    def category_params(self, category):
+        """Get the specs of every parameter in a category, in registry order."""
+        return self.specs[self.category_slices[self.categories.index(category)]]
+
+    def subcategory_groups(self, category):
+        """Get ``(subcategory, specs)`` pairs for a category, in registry order."""
+        return [
+            (subcategory, self.specs[self.subcategory_slices[subcategory_id]])
+            for subcategory_id, (owner, subcategory) in enumerate(self.subcategories)
+            if owner == category
+        ]
+
+
+REGISTRY = ParameterRegistry(PARAMETERS, CATEGORY_WEIGHTS)
+
+# Adjustment levels as compact integer codes (index into ADJUSTMENT_KEYS)
+ADJUSTMENT_KEYS = tuple(ADJUSTMENT_LEVELS.keys())
+ADJUSTMENT_CODES = {adjustment: code for code, adjustment in enumerate(ADJUSTMENT_KEYS)}
+ADJUSTMENT_MULTIPLIERS = np.array([ADJUSTMENT_LEVELS[adjustment] for adjustment in ADJUSTMENT_KEYS])
+ADJUSTMENT_MULTIPLIERS.flags.writeable = False
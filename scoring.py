@@ -0,0 +1,411 @@
+"""Vectorized scoring engine for the IUP Performance Comparison application."""
+
+import warnings
+
+import numpy as np
+from config import ADJUSTMENT_LEVELS, NORMALIZATION_METHODS
+from profiling import PROFILER
+from registry import ADJUSTMENT_CODES, ADJUSTMENT_MULTIPLIERS, REGISTRY
+
+
+def column_min_max(values):
+    """Get per-parameter minimum and maximum values across all IUPs.
+
+    Mirrors ``utils.get_min_max_values``: columns without data fall back to
+    (0, 1) and degenerate columns get the same buffer.
+    """
+    present = ~np.isnan(values)
+    has_data = present.any(axis=0)
+    min_vals = np.where(present, values, np.inf).min(axis=0, initial=np.inf)
+    max_vals = np.where(present, values, -np.inf).max(axis=0, initial=-np.inf)
+    min_vals = np.where(has_data, min_vals, 0.0)
+    max_vals = np.where(has_data, max_vals, 1.0)
+
+    # If min equals max, add a small buffer
+    equal = min_vals == max_vals
+    zero = equal & (min_vals == 0)
+    other = equal & ~zero
+    max_vals = np.where(zero, 1.0, max_vals)
+    min_vals, max_vals = (
+        np.where(other, np.maximum(0, min_vals * 0.9), min_vals),
+        np.where(other, max_vals * 1.1, max_vals),
+    )
+    return min_vals, max_vals
+
+
+def normalize_matrix(values, min_vals, max_vals, directions=REGISTRY.directions):
+    """Normalize every column between 0 and 1 according to its optimal direction."""
+    span = max_vals - min_vals
+    degenerate = span == 0
+    safe_span = np.where(degenerate, 1.0, span)
+    higher = (values - min_vals) / safe_span
+    normalized = np.where(directions > 0, higher, (max_vals - values) / safe_span)
+    return np.where(degenerate, 1.0, normalized)
+
+
+def _column_stats(values):
+    """Get per-column (count, mean, std) ignoring NaN, without all-NaN warnings."""
+    present = ~np.isnan(values)
+    count = present.sum(axis=0)
+    safe_count = np.maximum(count, 1)
+    mean = np.where(present, values, 0.0).sum(axis=0) / safe_count
+    variance = np.where(present, (values - mean) ** 2, 0.0).sum(axis=0) / safe_count
+    return count, mean, np.sqrt(variance)
+
+
+def _sigmoid(z):
+    """Logistic approximation of the standard normal CDF."""
+    return 1.0 / (1.0 + np.exp(-1.702 * z))
+
+
+def percentile_ranks(values):
+    """Get the percentile rank (0 to 1) of every value within its column.
+
+    Uses one sort per column; ties share their average rank and NaN stays NaN.
+    """
+    rows = values.shape[0]
+    order = np.argsort(values, axis=0, kind='stable')  # NaN sorts last
+    ordered = np.take_along_axis(values, order, axis=0)
+    count = (~np.isnan(values)).sum(axis=0)
+
+    positions = np.broadcast_to(np.arange(rows)[:, None], values.shape)
+    differs = ordered[1:] != ordered[:-1]
+    starts = np.concatenate([np.ones((1,) + values.shape[1:], dtype=bool), differs])
+    ends = np.concatenate([differs, np.ones((1,) + values.shape[1:], dtype=bool)])
+    first = np.maximum.accumulate(np.where(starts, positions, 0), axis=0)
+    last = np.minimum.accumulate(np.where(ends, positions, rows)[::-1], axis=0)[::-1]
+
+    ranks = np.divide((first + last) / 2.0, count - 1,
+                      out=np.ones(values.shape), where=count > 1)
+    result = np.empty(values.shape)
+    np.put_along_axis(result, order, ranks, axis=0)
+    return np.where(np.isnan(values), np.nan, result)
+
+
+def normalize_columns(values, method='minmax', columns=slice(None)):
+    """Normalize parameter columns to 0..1 (1 = best) with the chosen strategy.
+
+    ``values`` is an (IUP x k) matrix holding the registry columns selected by
+    ``columns``. Methods (see ``config.NORMALIZATION_METHODS``):
+
+    - ``minmax``: scale between the column min and max (current behaviour)
+    - ``zscore``: standardize by column mean and standard deviation
+    - ``robust``: standardize by column median and IQR
+    - ``percentile``: percentile rank within the column
+    """
+    directions = REGISTRY.directions[columns]
+    if method == 'minmax':
+        min_vals, max_vals = column_min_max(values)
+        return normalize_matrix(values, min_vals, max_vals, directions)
+
+    if method == 'zscore':
+        count, center, scale = _column_stats(values)
+    elif method == 'robust':
+        with warnings.catch_warnings():
+            warnings.simplefilter('ignore', RuntimeWarning)
+            low, center, high = np.nanpercentile(values, [25, 50, 75], axis=0)
+        # IQR / 1.349 estimates the standard deviation of normal data
+        scale = (high - low) / 1.349
+    elif method == 'percentile':
+        ranks = percentile_ranks(values)
+        # A lone value has nothing to be ranked against, whatever its direction
+        single = (~np.isnan(values)).sum(axis=0) <= 1
+        return np.where(single, ranks, np.where(directions > 0, ranks, 1.0 - ranks))
+    else:
+        raise ValueError(f"Unknown normalization method: {method!r} (expected one of {NORMALIZATION_METHODS})")
+
+    degenerate = ~(scale > 0)
+    z = (values - center) / np.where(degenerate, 1.0, scale)
+    return np.where(degenerate, 1.0, _sigmoid(directions * z))
+
+
+def segment_scores(contributions, present_weights):
+    """Score every subcategory and category from per-parameter contributions.
+
+    ``contributions`` holds weighted parameter scores (0 where missing) and
+    ``present_weights`` the weights of present parameters, both
+    (IUP x parameter) in ``REGISTRY`` order. Parameters are summed per
+    subcategory and those sums per category, each as one product with a
+    one-hot membership matrix. Returns ``(subcategory_scores,
+    category_scores)``; subcategories without input are NaN, categories 0.
+    """
+    score_totals = contributions @ REGISTRY.subcategory_membership
+    weight_totals = present_weights @ REGISTRY.subcategory_membership
+    subcategory_scores = np.divide(
+        score_totals, weight_totals, out=np.full_like(score_totals, np.nan), where=weight_totals > 0
+    )
+
+    score_totals = score_totals @ REGISTRY.subcategory_category_membership
+    weight_totals = weight_totals @ REGISTRY.subcategory_category_membership
+    category_scores = np.divide(
+        score_totals, weight_totals, out=np.zeros_like(score_totals), where=weight_totals > 0
+    )
+    return subcategory_scores, category_scores
+
+
+class ScoreHierarchy:
+    """Parameter-, subcategory-, category- and final-level scores of the same IUPs.
+
+    ``parameters`` holds each input's adjusted normalized score (NaN where
+    missing), ``subcategories`` one column per ``REGISTRY.subcategories``
+    entry (NaN without input), ``categories`` the weighted category scores
+    and ``final`` the final score of every IUP.
+    """
+
+    __slots__ = ('iups', 'parameters', 'subcategories', 'categories', 'final')
+
+    def __init__(self, iups, parameters, subcategories, categories, final):
+        self.iups = iups
+        self.parameters = parameters
+        self.subcategories = subcategories
+        self.categories = categories
+        self.final = final
+
+
+class ScoringEngine:
+    """Score a dense IUP x parameter value matrix in batched array operations.
+
+    ``values`` holds one row per IUP in ``REGISTRY`` order, with NaN
+    marking parameters that have no input. ``multipliers`` holds the matching
+    ``ADJUSTMENT_LEVELS`` multiplier for every cell. ``method`` picks the
+    ``normalize_columns`` strategy.
+    """
+
+    def __init__(self, iups, values, multipliers, method='minmax'):
+        self.iups = list(iups)
+        self.values = np.asarray(values, dtype=np.float64)
+        self.multipliers = np.asarray(multipliers, dtype=np.float64)
+        self.method = method
+
+    @classmethod
+    def from_data(cls, data, iups=None, method='minmax'):
+        """Build an engine from ``{iup: {category: {param_key: {'value', 'adjustment'}}}}``."""
+        iups = list(data.keys()) if iups is None else list(iups)
+        values = np.full((len(iups), len(REGISTRY)), np.nan)
+        multipliers = np.ones_like(values)
+
+        for row, iup in enumerate(iups):
+            for category_data in data.get(iup, {}).values():
+                for param_key, entry in category_data.items():
+                    col = REGISTRY.index[param_key]
+                    values[row, col] = entry['value']
+                    multipliers[row, col] = ADJUSTMENT_LEVELS[entry['adjustment']]
+
+        return cls(iups, values, multipliers, method)
+
+    def min_max(self):
+        """Get per-parameter (min, max) arrays."""
+        return column_min_max(self.values)
+
+    def normalized(self):
+        """Get the direction-aware normalized value matrix."""
+        return normalize_columns(self.values, self.method)
+
+    def category_scores(self):
+        """Get an (IUP x category) matrix of weighted category scores."""
+        present = ~np.isnan(self.values)
+        contributions = np.where(present, self.normalized() * self.multipliers * REGISTRY.weights, 0.0)
+        total_score = contributions @ REGISTRY.category_membership
+        total_weight = (present * REGISTRY.weights) @ REGISTRY.category_membership
+        return np.divide(
+            total_score, total_weight,
+            out=np.zeros_like(total_score), where=total_weight > 0
+        )
+
+    def final_scores(self, category_scores=None):
+        """Get the final weighted score of every IUP."""
+        if category_scores is None:
+            category_scores = self.category_scores()
+        return category_scores @ REGISTRY.category_weights
+
+    def hierarchy(self):
+        """Get the parameter, subcategory, category and final scores in one pass."""
+        present = ~np.isnan(self.values)
+        parameters = np.where(present, self.normalized() * self.multipliers, np.nan)
+        subcategories, categories = segment_scores(
+            np.where(present, parameters * REGISTRY.weights, 0.0), present * REGISTRY.weights
+        )
+        return ScoreHierarchy(self.iups, parameters, subcategories, categories, self.final_scores(categories))
+
+    def score_dict(self, iups=None):
+        """Get ``{iup: {category: score}}`` for IUPs that have input data."""
+        category_scores = self.category_scores()
+        has_category = ~np.isnan(self.values) @ REGISTRY.category_membership > 0
+        rows = {iup: row for row, iup in enumerate(self.iups)}
+        return {
+            iup: {
+                category: float(category_scores[rows[iup], col])
+                for col, category in enumerate(REGISTRY.categories)
+                if has_category[rows[iup], col]
+            }
+            for iup in (self.iups if iups is None else iups)
+        }
+
+
+class ScoringState(ScoringEngine):
+    """Scores that are kept up to date one input change at a time.
+
+    A value change refreshes only its parameter column and the category that
+    contains it; an adjustment change touches only one IUP row. Both cost
+    O(IUPs) instead of rescoring the whole matrix. Adjustments are held as
+    int8 codes (``registry.ADJUSTMENT_KEYS`` order) next to the multiplier
+    matrix derived from them.
+
+    ``rows`` optionally supplies a shared, append-only ``{iup: row}`` index
+    (e.g. ``IUPRegistry.index``) whose first ``len(iups)`` rows are ``iups``;
+    entries at or beyond the current row count are not scored yet.
+    """
+
+    def __init__(self, iups, values=None, adjustments=None, method='minmax', rows=None):
+        shape = (len(iups), len(REGISTRY))
+        if adjustments is None:
+            adjustments = np.full(shape, ADJUSTMENT_CODES['NORMAL'], dtype=np.int8)
+        self.adjustments = np.asarray(adjustments, dtype=np.int8)
+        super().__init__(
+            iups,
+            np.full(shape, np.nan) if values is None else values,
+            ADJUSTMENT_MULTIPLIERS[self.adjustments],
+            method
+        )
+        self.rows = {iup: row for row, iup in enumerate(self.iups)} if rows is None else rows
+        self.version = 0
+        self._hierarchy = (None, None)
+        self.refresh()
+
+    @PROFILER.timed('score_refresh')
+    def refresh(self):
+        """Recompute every cached array from the value and multiplier matrices."""
+        present = ~np.isnan(self.values)
+        self.min_vals, self.max_vals = column_min_max(self.values)
+        self._normalized = normalize_columns(self.values, self.method)
+        self._contributions = np.where(
+            present, self._normalized * self.multipliers * REGISTRY.weights, 0.0
+        )
+        self._score_totals = self._contributions @ REGISTRY.category_membership
+        self._weight_totals = (present * REGISTRY.weights) @ REGISTRY.category_membership
+        self._category_scores = np.divide(
+            self._score_totals, self._weight_totals,
+            out=np.zeros_like(self._score_totals), where=self._weight_totals > 0
+        )
+        self._final_scores = self._category_scores @ REGISTRY.category_weights
+        self.version += 1
+
+    def min_max(self):
+        return self.min_vals, self.max_vals
+
+    def normalized(self):
+        return self._normalized
+
+    def set_method(self, method):
+        """Switch the normalization strategy and rescore everything."""
+        if method != self.method:
+            self.method = method
+            self.refresh()
+
+    def category_scores(self):
+        return self._category_scores
+
+    def final_scores(self, category_scores=None):
+        if category_scores is None:
+            return self._final_scores
+        return super().final_scores(category_scores)
+
+    def hierarchy(self):
+        """Get the score hierarchy, computed once per data version.
+
+        Category and final scores are the incrementally maintained ones; the
+        subcategory level is one more sum over the cached contributions.
+        """
+        version, hierarchy = self._hierarchy
+        if version == self.version:
+            return hierarchy
+
+        present = ~np.isnan(self.values)
+        subcategories, _ = segment_scores(self._contributions, present * REGISTRY.weights)
+        hierarchy = ScoreHierarchy(
+            list(self.iups),
+            np.where(present, self._normalized * self.multipliers, np.nan),
+            subcategories,
+            self._category_scores.copy(),
+            self._final_scores.copy()
+        )
+        self._hierarchy = (self.version, hierarchy)
+        return hierarchy
+
+    def add_iups(self, iups):
+        """Append empty rows for IUPs that are not scored yet and rescore."""
+        iups = [iup for iup in dict.fromkeys(iups) if self.rows.get(iup, len(self.iups)) >= len(self.iups)]
+        if not iups:
+            return
+        shape = (len(iups), len(REGISTRY))
+        adjustments = np.full(shape, ADJUSTMENT_CODES['NORMAL'], dtype=np.int8)
+        for row, iup in enumerate(iups, len(self.iups)):
+            self.rows.setdefault(iup, row)
+        self.iups.extend(iups)
+        self.values = np.vstack([self.values, np.full(shape, np.nan)])
+        self.adjustments = np.vstack([self.adjustments, adjustments])
+        self.multipliers = np.vstack([self.multipliers, ADJUSTMENT_MULTIPLIERS[adjustments]])
+        self.refresh()
+
+    def set_rows(self, iups, values, adjustments):
+        """Replace whole IUP rows (values and adjustment codes) and rescore in one pass."""
+        rows = [self.rows[iup] for iup in iups]
+        self.values[rows] = values
+        self.adjustments[rows] = adjustments
+        self.multipliers[rows] = ADJUSTMENT_MULTIPLIERS[adjustments]
+        self.refresh()
+
+    def set_value(self, iup, param_key, value):
+        """Set (or clear, with ``None``) one input value and rescore its column."""
+        self.set_values([iup], param_key, [np.nan if value is None else value])
+
+    @PROFILER.timed('score_update')
+    def set_values(self, iups, param_key, values):
+        """Set one parameter of several distinct IUPs (NaN clears) and rescore its column once."""
+        rows, col = [self.rows[iup] for iup in iups], REGISTRY.index[param_key]
+        values = np.asarray(values, dtype=np.float64)
+        was_present = ~np.isnan(self.values[rows, col])
+        self.values[rows, col] = values
+        is_present = ~np.isnan(values)
+
+        column = self.values[:, col:col + 1]
+        min_vals, max_vals = column_min_max(column)
+        self.min_vals[col], self.max_vals[col] = min_vals[0], max_vals[0]
+
+        normalized = normalize_columns(column, self.method, slice(col, col + 1))[:, 0]
+        self._normalized[:, col] = normalized
+        contributions = np.where(
+            np.isnan(column[:, 0]), 0.0,
+            normalized * self.multipliers[:, col] * REGISTRY.weights[col]
+        )
+        category = REGISTRY.category_ids[col]
+        self._score_totals[:, category] += contributions - self._contributions[:, col]
+        self._contributions[:, col] = contributions
+        self._weight_totals[rows, category] += (is_present.astype(np.float64) - was_present) * REGISTRY.weights[col]
+
+        self._update_category(slice(None), category)
+
+    @PROFILER.timed('score_update')
+    def set_adjustment(self, iup, param_key, adjustment):
+        """Set one adjustment level and rescore that IUP's row only."""
+        row, col = self.rows[iup], REGISTRY.index[param_key]
+        self.adjustments[row, col] = ADJUSTMENT_CODES[adjustment]
+        self.multipliers[row, col] = ADJUSTMENT_LEVELS[adjustment]
+        if np.isnan(self.values[row, col]):
+            self.version += 1
+            return
+
+        contribution = self._normalized[row, col] * self.multipliers[row, col] * REGISTRY.weights[col]
+        category = REGISTRY.category_ids[col]
+        self._score_totals[row, category] += contribution - self._contributions[row, col]
+        self._contributions[row, col] = contribution
+        self._update_category(row, category)
+
+    def _update_category(self, rows, category):
+        totals = self._score_totals[rows, category]
+        weights = self._weight_totals[rows, category]
+        old = self._category_scores[rows, category]
+        new = np.divide(totals, weights, out=np.zeros_like(totals, dtype=np.float64), where=weights > 0)
+        self._final_scores[rows] += (new - old) * REGISTRY.category_weights[category]
+        self._category_scores[rows, category] = new
+        self.version += 1
@@ -0,0 +1,212 @@
+"""Monte Carlo sensitivity analysis of the IUP ranking.
+
+Perturbs parameter weights, adjustment multipliers and category weights and
+rescores every sample as batched array operations. Normalized values do not
+depend on any weight, so they are computed once and every sample only costs a
+few tensor contractions.
+"""
+
+import numpy as np
+from config import SENSITIVITY_CONFIG
+from registry import ADJUSTMENT_KEYS, ADJUSTMENT_MULTIPLIERS, REGISTRY
+from scoring import normalize_columns
+
+
+class SensitivityResult:
+    """Summary statistics of a sensitivity run over a set of IUPs.
+
+    ``rank_probabilities[i, r]`` is the share of samples in which IUP ``i``
+    ends up at rank ``r`` (0 = best). ``drivers`` lists ``(factor, score)``
+    pairs, highest first, where the score is the correlation between the size
+    of a factor's perturbation and the number of pairwise rank flips.
+    ``mean`` covers every sample; the confidence interval is taken over the
+    ``ci_samples`` rows of ``final_scores``.
+    """
+
+    def __init__(self, iups, samples, baseline, mean, final_scores, rank_counts, drivers, confidence):
+        self.iups = iups
+        self.samples = samples
+        self.baseline = baseline
+        self.baseline_ranks = _ranks(baseline[None, :])[0]
+        self.mean = mean
+        self.ci_samples = len(final_scores)
+        tail = (1 - confidence) / 2 * 100
+        self.ci_low, self.ci_high = np.percentile(final_scores, [tail, 100 - tail], axis=0)
+        self.confidence = confidence
+        self.rank_probabilities = rank_counts / samples
+        self.rank_stability = self.rank_probabilities[np.arange(len(iups)), self.baseline_ranks]
+        self.drivers = drivers
+
+
+def _ranks(final_scores):
+    """Get 0-based ranks (0 = highest score) for every row of ``final_scores``."""
+    order = np.argsort(-final_scores, axis=1, kind='stable')
+    ranks = np.empty_like(order)
+    np.put_along_axis(ranks, order, np.arange(final_scores.shape[1]), axis=1)
+    return ranks
+
+
+def _rank_flips(ranks, baseline_ranks):
+    """Count the IUP pairs each sample ranks in the opposite order to the baseline.
+
+    Counts inversions of every row of ``ranks`` taken in baseline order with a
+    Fenwick tree per sample, i.e. O(sample x IUP log IUP) instead of comparing
+    all pairs.
+    """
+    samples, count = ranks.shape
+    sequence = ranks[:, np.argsort(baseline_ranks)] + 1
+    tree = np.zeros((samples, count + 1), dtype=np.int64)
+    rows = np.arange(samples)
+    flips = np.zeros(samples, dtype=np.int64)
+
+    for position in range(count):
+        # IUPs placed so far that this sample ranks ahead of the current one
+        index = sequence[:, position].copy()
+        ahead = np.zeros(samples, dtype=np.int64)
+        while index.any():
+            ahead += tree[rows, index]
+            index -= index & -index
+        flips += position - ahead
+
+        index = sequence[:, position].copy()
+        active = rows
+        while len(active):
+            tree[active, index] += 1
+            index += index & -index
+            keep = index <= count
+            active, index = active[keep], index[keep]
+
+    return flips
+
+
+class _StreamingCorrelation:
+    """Pearson correlation of many factor columns with one target, chunk by chunk."""
+
+    def __init__(self, factors):
+        self.count = 0
+        self.sum_x = np.zeros(factors)
+        self.sum_xx = np.zeros(factors)
+        self.sum_xy = np.zeros(factors)
+        self.sum_y = 0.0
+        self.sum_yy = 0.0
+
+    def update(self, x, y):
+        self.count += len(y)
+        self.sum_x += x.sum(axis=0)
+        self.sum_xx += (x ** 2).sum(axis=0)
+        self.sum_xy += x.T @ y
+        self.sum_y += y.sum()
+        self.sum_yy += (y ** 2).sum()
+
+    def result(self):
+        n = self.count
+        covariance = n * self.sum_xy - self.sum_x * self.sum_y
+        denominator = np.sqrt(
+            np.maximum(n * self.sum_xx - self.sum_x ** 2, 0) * max(n * self.sum_yy - self.sum_y ** 2, 0)
+        )
+        return np.divide(covariance, denominator, out=np.zeros_like(covariance), where=denominator > 0)
+
+
+def draw_perturbations(rng, samples, config=SENSITIVITY_CONFIG):
+    """Draw ``(parameter_weights, multipliers, category_weights)`` sample matrices."""
+    parameter_weights = REGISTRY.weights * rng.lognormal(0.0, config['weight_sigma'], (samples, len(REGISTRY)))
+    multipliers = ADJUSTMENT_MULTIPLIERS * rng.lognormal(
+        0.0, config['adjustment_sigma'], (samples, len(ADJUSTMENT_MULTIPLIERS))
+    )
+    category_weights = rng.dirichlet(REGISTRY.category_weights * config['category_concentration'], samples)
+    return parameter_weights, multipliers, category_weights
+
+
+def score_samples(normalized, present, adjustments, parameter_weights, multipliers, category_weights):
+    """Score every IUP under every perturbation sample.
+
+    ``normalized``/``present``/``adjustments`` are (IUP x parameter) arrays;
+    the perturbation arrays have one row per sample. Returns an
+    (sample x IUP) float matrix of final scores.
+    """
+    samples, iups = len(parameter_weights), len(normalized)
+    membership = REGISTRY.category_membership
+    # Split the normalized values by adjustment level and spread them over the
+    # categories: (level x parameter) x (IUP x category)
+    by_level = np.stack([
+        np.where(present & (adjustments == code), normalized, 0.0)
+        for code in range(len(ADJUSTMENT_KEYS))
+    ])
+    by_level = np.einsum('kip,pc->kpic', by_level, membership).reshape(-1, iups * membership.shape[1])
+    presence = np.einsum('ip,pc->pic', present.astype(np.float64), membership).reshape(len(membership), -1)
+
+    # Both sums are then one matrix product over the samples
+    sample_weights = (multipliers[:, :, None] * parameter_weights[:, None, :]).reshape(samples, -1)
+    total_score = (sample_weights @ by_level).reshape(samples, iups, -1)
+    total_weight = (parameter_weights @ presence).reshape(samples, iups, -1)
+    category_scores = np.divide(total_score, total_weight,
+                                out=np.zeros_like(total_score), where=total_weight > 0)
+    return np.einsum('sic,sc->si', category_scores, category_weights)
+
+
+def run_sensitivity(iups, values, adjustments, samples=None, normalized=None,
+                    config=SENSITIVITY_CONFIG, seed=None):
+    """Run a Monte Carlo sensitivity analysis.
+
+    ``values`` (float, NaN for missing) and ``adjustments`` (int adjustment
+    codes) are (IUP x parameter) matrices in registry order. ``normalized``
+    optionally supplies the matching normalized matrix (e.g. the dashboard's)
+    and defaults to min-max normalization of ``values``. Samples are processed in chunks of
+    ``config['chunk_size']``, shrunk for large IUP selections so that no chunk
+    holds more than ``config['max_chunk_cells']`` per-category cells. Only the
+    first ``config['max_score_cells'] // len(iups)`` samples' scores are kept
+    for the confidence intervals; the samples are independent, so these form
+    a uniform subsample. Means and rank statistics use every sample.
+    """
+    samples = config['samples'] if samples is None else samples
+    rng = np.random.default_rng(config['seed'] if seed is None else seed)
+    present = ~np.isnan(values)
+    if normalized is None:
+        normalized = normalize_columns(values)
+    normalized = np.where(present, normalized, 0.0)
+
+    baseline = score_samples(
+        normalized, present, adjustments,
+        REGISTRY.weights[None, :], ADJUSTMENT_MULTIPLIERS[None, :], REGISTRY.category_weights[None, :]
+    )[0]
+    baseline_ranks = _ranks(baseline[None, :])[0]
+
+    kept = min(samples, max(1, config['max_score_cells'] // max(1, len(iups))))
+    final_scores = np.empty((kept, len(iups)), dtype=np.float32)
+    score_sums = np.zeros(len(iups))
+    rank_counts = np.zeros((len(iups), len(iups)))
+    factors = (
+        [spec.name for spec in REGISTRY.specs]
+        + [f"{adjustment} multiplier" for adjustment in ADJUSTMENT_KEYS]
+        + [f"{category} weight" for category in REGISTRY.categories]
+    )
+    influence = _StreamingCorrelation(len(factors))
+    cells_per_sample = (len(iups) + len(REGISTRY)) * len(REGISTRY.categories)
+    chunk_size = max(1, min(config['chunk_size'], config['max_chunk_cells'] // cells_per_sample))
+
+    for start in range(0, samples, chunk_size):
+        size = min(chunk_size, samples - start)
+        parameter_weights, multipliers, category_weights = draw_perturbations(rng, size, config)
+        scores = score_samples(normalized, present, adjustments,
+                               parameter_weights, multipliers, category_weights)
+        score_sums += scores.sum(axis=0)
+        if start < kept:
+            final_scores[start:start + size] = scores[:kept - start]
+
+        ranks = _ranks(scores)
+        rank_counts += np.bincount(
+            (np.arange(len(iups)) * len(iups) + ranks).ravel(), minlength=len(iups) ** 2
+        ).reshape(len(iups), len(iups))
+
+        flips = _rank_flips(ranks, baseline_ranks).astype(np.float64)
+        deviations = np.abs(np.log(np.concatenate([
+            parameter_weights / REGISTRY.weights,
+            multipliers / ADJUSTMENT_MULTIPLIERS,
+            category_weights / REGISTRY.category_weights
+        ], axis=1)))
+        influence.update(deviations, flips)
+
+    drivers = sorted(zip(factors, influence.result().tolist()), key=lambda item: -item[1])
+
+    return SensitivityResult(list(iups), samples, baseline, score_sums / samples, final_scores,
+                             rank_counts, drivers, config['confidence'])
@@ -0,0 +1,120 @@
+"""Array-backed view of the per-session input data.
+
+The inputs of a session live only in its ``ScoringState`` value matrix
+(float64, NaN for missing) and adjustment-code matrix (int8). ``SessionData``
+exposes them with the nested ``data[iup][category][param_key]`` ->
+``{'value', 'adjustment'}`` interface the app has always used; writes go
+through the scoring state's incremental updates.
+"""
+
+from collections.abc import Mapping, MutableMapping
+
+import numpy as np
+from registry import ADJUSTMENT_KEYS, REGISTRY
+
+
+class SessionData(Mapping):
+    """``{iup: {category: {param_key: {'value', 'adjustment'}}}}`` over a ``ScoringState``."""
+
+    __slots__ = ('scoring',)
+
+    def __init__(self, scoring):
+        self.scoring = scoring
+
+    def __getitem__(self, iup):
+        return IUPInputs(self.scoring, self.scoring.rows[iup])
+
+    def __iter__(self):
+        return iter(self.scoring.iups)
+
+    def __len__(self):
+        return len(self.scoring.iups)
+
+    def snapshot(self):
+        """Copy the session inputs as ``(iups, values, adjustments)`` buffers."""
+        return list(self.scoring.iups), self.scoring.values.copy(), self.scoring.adjustments.copy()
+
+
+class IUPInputs(Mapping):
+    """The categories of one IUP that hold at least one input value."""
+
+    __slots__ = ('scoring', 'row')
+
+    def __init__(self, scoring, row):
+        self.scoring = scoring
+        self.row = row
+
+    def _present(self):
+        return ~np.isnan(self.scoring.values[self.row]) @ REGISTRY.category_membership > 0
+
+    def __getitem__(self, category):
+        col = REGISTRY.categories.index(category) if category in REGISTRY.categories else None
+        if col is None or not self._present()[col]:
+            raise KeyError(category)
+        return CategoryInputs(self.scoring, self.row, col)
+
+    def __iter__(self):
+        present = self._present()
+        return iter([category for col, category in enumerate(REGISTRY.categories) if present[col]])
+
+    def __len__(self):
+        return int(self._present().sum())
+
+    def setdefault(self, category, default=None):
+        """Get a category's inputs, including categories without values yet."""
+        return CategoryInputs(self.scoring, self.row, REGISTRY.categories.index(category))
+
+    def __setitem__(self, category, entries):
+        inputs = self.setdefault(category)
+        for param_key, entry in entries.items():
+            inputs[param_key] = entry
+
+
+class CategoryInputs(MutableMapping):
+    """The parameters of one IUP and category that hold an input value.
+
+    Entries are built on access; assign a new ``{'value', 'adjustment'}``
+    dict to change an input (mutating a returned dict has no effect).
+    """
+
+    __slots__ = ('scoring', 'row', 'columns')
+
+    def __init__(self, scoring, row, category_id):
+        self.scoring = scoring
+        self.row = row
+        self.columns = REGISTRY.category_slices[category_id]
+
+    def _col(self, param_key):
+        col = REGISTRY.index.get(param_key)
+        if col is None or not self.columns.start <= col < self.columns.stop:
+            raise KeyError(param_key)
+        return col
+
+    def __getitem__(self, param_key):
+        col = self._col(param_key)
+        value = self.scoring.values[self.row, col]
+        if np.isnan(value):
+            raise KeyError(param_key)
+        return {
+            'value': float(value),
+            'adjustment': ADJUSTMENT_KEYS[self.scoring.adjustments[self.row, col]]
+        }
+
+    def __setitem__(self, param_key, entry):
+        col = self._col(param_key)
+        iup = self.scoring.iups[self.row]
+        if self.scoring.values[self.row, col] != entry['value']:
+            self.scoring.set_value(iup, param_key, entry['value'])
+        if ADJUSTMENT_KEYS[self.scoring.adjustments[self.row, col]] != entry['adjustment']:
+            self.scoring.set_adjustment(iup, param_key, entry['adjustment'])
+
+    def __delitem__(self, param_key):
+        self[param_key]
+        self.scoring.set_value(self.scoring.iups[self.row], param_key, None)
+
+    def __iter__(self):
+        present = ~np.isnan(self.scoring.values[self.row, self.columns])
+        return iter([REGISTRY.keys[col] for col in np.flatnonzero(present) + self.columns.start])
+
+    def __len__(self):
+        return int((~np.isnan(self.scoring.values[self.row, self.columns])).sum())
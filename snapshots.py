@@ -0,0 +1,275 @@
+"""Binary scenario snapshots in the Arrow IPC file format.
+
+A snapshot stores one row per (IUP, period) like ``importer.ImportedData``:
+the IUP as a dictionary-encoded column, the period as months since 1970-01
+(NaT for undated rows, i.e. the current inputs) and the value and
+adjustment matrices as fixed-size list columns whose child buffers are the
+row-major matrices themselves. Reading memory-maps the file (or wraps the
+uploaded buffer) and views those buffers as NumPy arrays, so loading involves
+no per-cell parsing or copying. pyarrow is imported on first use.
+"""
+
+import json
+
+import numpy as np
+from config import ADJUSTMENT_LEVELS, CATEGORY_WEIGHTS
+from importer import ImportedData
+from registry import ADJUSTMENT_KEYS, REGISTRY
+
+FORMAT_VERSION = 1
+METADATA_KEY = b'iup_snapshot'
+SUFFIX = '.arrow'
+
+
+class Snapshot:
+    """A loaded snapshot: its rows as ``ImportedData`` plus the metadata dict.
+
+    Arrays loaded from a file are read-only views of the file's buffers.
+    """
+
+    def __init__(self, data, metadata):
+        self.data = data
+        self.metadata = metadata
+
+    def inputs(self):
+        """Get the current inputs: each IUP's undated row, else its latest period."""
+        rows = list(self.data.latest(prefer_undated=True).items())
+        return ImportedData.from_rows(
+            [iup for iup, _ in rows],
+            self.data.values[[row for _, row in rows]],
+            self.data.adjustments[[row for _, row in rows]]
+        )
+
+    def weights_match(self):
+        """Check whether the snapshot was scored with the current weight configuration."""
+        return self.metadata.get('weights') == weight_config(self.metadata.get('weights', {}).get('normalization'))
+
+
+class SnapshotDiff:
+    """Cell-level differences between two snapshots, aligned by (IUP, period).
+
+    Every changed cell has an entry in ``iups``, ``periods`` and ``columns``
+    (parameter index) plus its old and new value and adjustment code. ``added`` and ``removed`` count rows present
+    in only one side.
+    """
+
+    def __init__(self, iups, periods, columns, old_values, new_values,
+                 old_adjustments, new_adjustments, added, removed):
+        self.iups = iups
+        self.periods = periods
+        self.columns = columns
+        self.old_values = old_values
+        self.new_values = new_values
+        self.old_adjustments = old_adjustments
+        self.new_adjustments = new_adjustments
+        self.added = added
+        self.removed = removed
+
+    def __len__(self):
+        return len(self.columns)
+
+    def records(self, limit=None):
+        """Get the changed cells as ``[{iup, period, parameter, old/new value and adjustment}]``."""
+        cells = slice(None) if limit is None else slice(limit)
+        return [
+            {
+                'iup': iup,
+                'period': '' if np.isnat(period) else str(period),
+                'parameter': REGISTRY.keys[col],
+                'old_value': float(old_value),
+                'new_value': float(new_value),
+                'old_adjustment': ADJUSTMENT_KEYS[old_adjustment],
+                'new_adjustment': ADJUSTMENT_KEYS[new_adjustment]
+            }
+            for iup, period, col, old_value, new_value, old_adjustment, new_adjustment in zip(
+                self.iups[cells], self.periods[cells], self.columns[cells],
+                self.old_values[cells], self.new_values[cells],
+                self.old_adjustments[cells], self.new_adjustments[cells]
+            )
+        ]
+
+
+def weight_config(method='minmax'):
+    """Get the weight configuration recorded with every snapshot."""
+    return {
+        'parameters': dict(zip(REGISTRY.keys, REGISTRY.weights.tolist())),
+        'categories': dict(CATEGORY_WEIGHTS),
+        'adjustments': dict(ADJUSTMENT_LEVELS),
+        'normalization': method
+    }
+
+
+def build_metadata(created, author='', method='minmax', **extra):
+    """Build the metadata stored with a snapshot (``created`` is an ISO timestamp)."""
+    return {
+        'format_version': FORMAT_VERSION,
+        'created': created,
+        'author': author,
+        'parameters': list(REGISTRY.keys),
+        'adjustment_keys': list(ADJUSTMENT_KEYS),
+        'weights': weight_config(method),
+        **extra
+    }
+
+
+def to_table(data, metadata):
+    """Convert ``ImportedData`` rows into an Arrow table without copying the matrices."""
+    import pyarrow as pa
+
+    values = np.ascontiguousarray(data.values, dtype=np.float64)
+    adjustments = np.ascontiguousarray(data.adjustments, dtype=np.int8)
+    schema_metadata = {METADATA_KEY: json.dumps(metadata).encode('utf-8')}
+    return pa.table(
+        {
+            'iup': pa.DictionaryArray.from_arrays(
+                pa.array(np.asarray(data.iup_ids, dtype=np.int32)), pa.array(list(data.iups), pa.string())
+            ),
+            'period': pa.array(np.asarray(data.periods, dtype='datetime64[M]').view(np.int64)),
+            'values': pa.FixedSizeListArray.from_arrays(pa.array(values.ravel()), len(REGISTRY)),
+            'adjustments': pa.FixedSizeListArray.from_arrays(pa.array(adjustments.ravel()), len(REGISTRY))
+        },
+        metadata=schema_metadata
+    )
+
+
+def write_snapshot(sink, data, metadata):
+    """Write ``ImportedData`` rows and metadata to a path or writable file as Arrow IPC."""
+    import pyarrow as pa
+
+    table = to_table(data, metadata)
+    with pa.ipc.new_file(sink, table.schema) as writer:
+        writer.write_table(table)
+
+
+def snapshot_bytes(data, metadata):
+    """Serialize a snapshot to bytes (e.g. for a download button)."""
+    import pyarrow as pa
+
+    sink = pa.BufferOutputStream()
+    write_snapshot(sink, data, metadata)
+    return sink.getvalue().to_pybytes()
+
+
+def _column(table, name):
+    import pyarrow as pa
+
+    column = table.column(name)
+    if column.num_chunks == 0:
+        return pa.array([], type=column.type)
+    return column.chunk(0) if column.num_chunks == 1 else pa.concat_arrays(column.chunks)
+
+
+def _matrix(column, width, dtype):
+    flat = column.flatten().to_numpy(zero_copy_only=True)
+    return flat.view(dtype).reshape(-1, width)
+
+
+def read_snapshot(source):
+    """Load a snapshot from a path (memory-mapped), bytes or an uploaded file."""
+    import pyarrow as pa
+
+    if hasattr(source, 'getbuffer'):
+        buffer = pa.py_buffer(source.getbuffer())
+    elif isinstance(source, (bytes, bytearray, memoryview)):
+        buffer = pa.py_buffer(source)
+    else:
+        buffer = pa.memory_map(str(source), 'r')
+
+    # Everything read from the file is validated here: a damaged or foreign file is a ValueError
+    try:
+        table = pa.ipc.open_file(buffer).read_all().unify_dictionaries()
+        metadata = json.loads(table.schema.metadata[METADATA_KEY])
+        if metadata.get('format_version') != FORMAT_VERSION:
+            raise ValueError(f"Unsupported snapshot version: {metadata.get('format_version')}")
+        keys = list(metadata['parameters'])
+        adjustment_keys = list(metadata['adjustment_keys'])
+
+        iups = _column(table, 'iup')
+        if table.num_rows and not pa.types.is_dictionary(iups.type):
+            raise ValueError("Snapshot IUP column must be dictionary-encoded")
+        iup_ids = iups.indices.to_numpy(zero_copy_only=True) if table.num_rows else np.empty(0, np.int32)
+        if iup_ids.size and (iup_ids.min() < 0 or iup_ids.max() >= len(iups.dictionary)):
+            raise ValueError("Snapshot IUP ids out of range")
+        periods = _column(table, 'period').to_numpy(zero_copy_only=True).view('datetime64[M]')
+        values = _matrix(_column(table, 'values'), len(keys), np.float64)
+        adjustments = _matrix(_column(table, 'adjustments'), len(keys), np.int8)
+        if adjustments.size and (adjustments.min() < 0 or adjustments.max() >= len(adjustment_keys)):
+            raise ValueError("Snapshot adjustment codes out of range")
+
+        # Snapshots from another parameter set are remapped (one copy); unknown parameters are dropped
+        if keys != list(REGISTRY.keys) or adjustment_keys != list(ADJUSTMENT_KEYS):
+            values, adjustments = _remap(keys, adjustment_keys, values, adjustments)
+    except (pa.ArrowInvalid, KeyError, TypeError, IndexError, AttributeError) as exc:
+        raise ValueError(f"Not an IUP snapshot: {exc}") from exc
+
+    return Snapshot(
+        ImportedData(iups.dictionary.to_pylist() if table.num_rows else [], iup_ids, periods, values, adjustments),
+        metadata
+    )
+
+
+def _remap(keys, adjustment_keys, values, adjustments):
+    """Reorder snapshot columns and adjustment codes into the current registry order."""
+    source = [col for col, key in enumerate(keys) if key in REGISTRY]
+    target = [REGISTRY.index[keys[col]] for col in source]
+    codes = np.array([
+        ADJUSTMENT_KEYS.index(key) if key in ADJUSTMENT_KEYS else ADJUSTMENT_KEYS.index('NORMAL')
+        for key in adjustment_keys
+    ], dtype=np.int8)
+
+    remapped_values = np.full((len(values), len(REGISTRY)), np.nan)
+    remapped_adjustments = np.full(remapped_values.shape, ADJUSTMENT_KEYS.index('NORMAL'), dtype=np.int8)
+    remapped_values[:, target] = values[:, source]
+    remapped_adjustments[:, target] = codes[adjustments[:, source]]
+    return remapped_values, remapped_adjustments
+
+
+def _iup_keys(data, names):
+    lookup = np.array([names[iup] for iup in data.iups], dtype=np.int64)
+    return lookup[data.iup_ids] if len(lookup) else np.empty(0, np.int64)
+
+
+def diff_snapshots(old, new):
+    """Compare two ``ImportedData`` (or ``Snapshot``) row sets cell by cell.
+
+    Rows are matched on (IUP, period); a cell changed if its value (NaN
+    equals NaN) or, for a present value, its adjustment differs.
+    """
+    old = getattr(old, 'data', old)
+    new = getattr(new, 'data', new)
+    names = {iup: idx for idx, iup in enumerate(dict.fromkeys(list(old.iups) + list(new.iups)))}
+    iup_keys = np.concatenate([_iup_keys(old, names), _iup_keys(new, names)])
+    month_keys, months = np.unique(
+        np.concatenate([old.periods, new.periods]).astype('datetime64[M]'), return_inverse=True
+    )
+    keys, inverse = np.unique(iup_keys * len(month_keys) + months.ravel(), return_inverse=True)
+
+    # Slot of every distinct (IUP, period) key -> row on each side, -1 if absent
+    old_rows = np.full(len(keys), -1)
+    new_rows = np.full(len(keys), -1)
+    old_rows[inverse[:len(old)]] = np.arange(len(old))
+    new_rows[inverse[len(old):]] = np.arange(len(new))
+    both = np.flatnonzero((old_rows >= 0) & (new_rows >= 0))
+
+    old_values, new_values = old.values[old_rows[both]], new.values[new_rows[both]]
+    old_adjustments, new_adjustments = old.adjustments[old_rows[both]], new.adjustments[new_rows[both]]
+    old_missing, new_missing = np.isnan(old_values), np.isnan(new_values)
+    changed = (
+        ~((old_values == new_values) | (old_missing & new_missing))
+        | ((old_adjustments != new_adjustments) & ~(old_missing & new_missing))
+    )
+
+    cells, columns = np.nonzero(changed)
+    labels = np.array(list(names), dtype=object)
+    slots = keys[both[cells]]
+    return SnapshotDiff(
+        labels[slots // max(len(month_keys), 1)] if len(labels) else np.empty(0, dtype=object),
+        month_keys[slots % max(len(month_keys), 1)],
+        columns,
+        old_values[cells, columns],
+        new_values[cells, columns],
+        old_adjustments[cells, columns],
+        new_adjustments[cells, columns],
+        int(((new_rows >= 0) & (old_rows < 0)).sum()),
+        int(((old_rows >= 0) & (new_rows < 0)).sum())
+    )
@@ -0,0 +1,428 @@
+"""Embedded SQLite persistence for IUP inputs and history.
+
+One ``observations`` row holds the value and adjustment code of one
+(IUP, period, parameter) cell. The table is ``WITHOUT ROWID`` and clustered
+on (IUP, period, parameter), so one IUP-period is a single range scan; a
+covering index on (parameter, period) serves one parameter across all IUPs
+the same way. The dashboard's live inputs are stored under the reserved
+period ``CURRENT_PERIOD``; monthly history uses months since 1970-01.
+"""
+
+import contextlib
+import queue
+import sqlite3
+import threading
+
+import numpy as np
+from cache import LRUCache
+from config import STORAGE_CONFIG
+from importer import ImportedData
+from registry import ADJUSTMENT_CODES, ADJUSTMENT_KEYS, ADJUSTMENT_MULTIPLIERS, REGISTRY
+
+CURRENT_PERIOD = -1
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value INTEGER NOT NULL
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS iups (
+    id INTEGER PRIMARY KEY,
+    name TEXT NOT NULL UNIQUE,
+    grp TEXT NOT NULL DEFAULT ''
+);
+CREATE TABLE IF NOT EXISTS parameters (
+    id INTEGER PRIMARY KEY,
+    key TEXT NOT NULL UNIQUE,
+    category TEXT NOT NULL,
+    subcategory TEXT NOT NULL,
+    unit TEXT NOT NULL,
+    weight REAL NOT NULL,
+    direction REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS periods (
+    id INTEGER PRIMARY KEY,
+    month TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS adjustments (
+    code INTEGER PRIMARY KEY,
+    key TEXT NOT NULL UNIQUE,
+    multiplier REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS observations (
+    iup_id INTEGER NOT NULL REFERENCES iups (id),
+    period_id INTEGER NOT NULL REFERENCES periods (id),
+    parameter_id INTEGER NOT NULL REFERENCES parameters (id),
+    value REAL NOT NULL,
+    adjustment INTEGER NOT NULL REFERENCES adjustments (code),
+    PRIMARY KEY (iup_id, period_id, parameter_id)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS observations_parameter_period
+    ON observations (parameter_id, period_id, iup_id, value, adjustment);
+INSERT OR IGNORE INTO meta VALUES ('revision', 0);
+INSERT OR IGNORE INTO meta VALUES ('history_revision', 0);
+INSERT OR IGNORE INTO periods VALUES (-1, '');
+"""
+
+_UPSERT = (
+    "INSERT INTO observations VALUES (?, ?, ?, ?, ?) "
+    "ON CONFLICT DO UPDATE SET value = excluded.value, adjustment = excluded.adjustment"
+)
+# Keeps the stored adjustment of existing cells
+_UPSERT_VALUE = (
+    "INSERT INTO observations VALUES (?, ?, ?, ?, ?) "
+    "ON CONFLICT DO UPDATE SET value = excluded.value"
+)
+_DELETE = "DELETE FROM observations WHERE iup_id = ? AND period_id = ? AND parameter_id = ?"
+
+
+def check_periods(periods):
+    """Raise ``ValueError`` for months before 1970-01, whose ids would collide with ``CURRENT_PERIOD``."""
+    periods = np.asarray(periods, dtype='datetime64[M]')
+    early = ~np.isnat(periods) & (periods.view(np.int64) < 0)
+    if early.any():
+        raise ValueError(f"Periods before 1970-01 cannot be stored: {periods[early][0]}")
+    return periods
+
+
+def period_ids(periods):
+    """Get period ids (months since 1970-01, ``CURRENT_PERIOD`` for NaT) for datetime64 months."""
+    periods = check_periods(periods)
+    return np.where(np.isnat(periods), CURRENT_PERIOD, periods.view(np.int64))
+
+
+def period_months(ids):
+    """Get datetime64 months (NaT for ``CURRENT_PERIOD``) for period ids."""
+    ids = np.asarray(ids, dtype=np.int64)
+    return np.where(ids == CURRENT_PERIOD, np.datetime64('NaT', 'M'), ids.view('datetime64[M]'))
+
+
+class Store:
+    """Pooled SQLite connections with batched writes and cached reads.
+
+    Every write transaction bumps a revision counter (and a separate history
+    counter when it touches dated periods); cached reads are keyed by them,
+    so they never outlive a write from any process. Read results are shared
+    between callers and must be treated as read-only.
+    """
+
+    def __init__(self, path=None, pool_size=None, cache_entries=None):
+        self.path = STORAGE_CONFIG['path'] if path is None else path
+        self.pool_size = STORAGE_CONFIG['pool_size'] if pool_size is None else pool_size
+        self._pool = queue.LifoQueue()
+        self._cache = LRUCache(STORAGE_CONFIG['cache_entries'] if cache_entries is None else cache_entries)
+        self._local = threading.local()
+        self._lock = threading.Lock()
+
+        with self.connection() as conn, conn:
+            conn.executescript(SCHEMA)
+            conn.executemany(
+                "INSERT INTO parameters (key, category, subcategory, unit, weight, direction) "
+                "VALUES (?, ?, ?, ?, ?, ?) ON CONFLICT (key) DO UPDATE SET "
+                "category = excluded.category, subcategory = excluded.subcategory, unit = excluded.unit, "
+                "weight = excluded.weight, direction = excluded.direction",
+                [(spec.key, spec.category, spec.subcategory, spec.unit, spec.weight, spec.direction)
+                 for spec in REGISTRY.specs]
+            )
+            conn.executemany(
+                "INSERT OR REPLACE INTO adjustments VALUES (?, ?, ?)",
+                [(code, key, float(ADJUSTMENT_MULTIPLIERS[code])) for code, key in enumerate(ADJUSTMENT_KEYS)]
+            )
+            parameter_ids = dict(conn.execute("SELECT key, id FROM parameters"))
+            self._iup_ids = dict(conn.execute("SELECT name, id FROM iups"))
+
+        # Registry column <-> stored parameter id
+        self._parameter_ids = np.array([parameter_ids[key] for key in REGISTRY.keys], dtype=np.int64)
+        self._columns = np.full(max(parameter_ids.values()) + 1, -1, dtype=np.intp)
+        self._columns[self._parameter_ids] = np.arange(len(REGISTRY))
+        self._iup_names = {iup_id: name for name, iup_id in self._iup_ids.items()}
+
+    def _connect(self):
+        conn = sqlite3.connect(self.path, check_same_thread=False, timeout=30)
+        conn.execute("PRAGMA journal_mode = WAL")
+        conn.execute("PRAGMA synchronous = NORMAL")
+        conn.execute("PRAGMA temp_store = MEMORY")
+        return conn
+
+    @contextlib.contextmanager
+    def connection(self):
+        """Borrow a pooled connection."""
+        try:
+            conn = self._pool.get_nowait()
+        except queue.Empty:
+            conn = self._connect()
+        try:
+            yield conn
+        finally:
+            if self._pool.qsize() < self.pool_size:
+                self._pool.put(conn)
+            else:
+                conn.close()
+
+    def close(self):
+        """Close every pooled connection."""
+        while not self._pool.empty():
+            self._pool.get_nowait().close()
+
+    # Writes
+
+    @contextlib.contextmanager
+    def batch(self):
+        """Collect every write made inside the block into one transaction."""
+        if getattr(self._local, 'pending', None) is not None:
+            yield
+            return
+        self._local.pending = ([], [False])
+        try:
+            yield
+            (statements, history), self._local.pending = self._local.pending, None
+            self._execute(statements, history[0])
+        finally:
+            self._local.pending = None
+
+    def _write(self, statements, history=False):
+        pending = getattr(self._local, 'pending', None)
+        if pending is not None:
+            pending[0].extend(statements)
+            pending[1][0] = pending[1][0] or history
+        else:
+            self._execute(statements, history)
+
+    def _execute(self, statements, history=False):
+        if not statements:
+            return
+        keys = ('revision', 'history_revision') if history else ('revision',)
+        with self.connection() as conn, conn:
+            for sql, rows in statements:
+                conn.executemany(sql, rows)
+            conn.execute(
+                f"UPDATE meta SET value = value + 1 WHERE key IN ({','.join('?' * len(keys))})", keys
+            )
+            self._local.revision = conn.execute(
+                "SELECT value FROM meta WHERE key = 'revision'"
+            ).fetchone()[0]
+
+    def last_revision(self):
+        """Get the revision created by this thread's latest write transaction."""
+        return getattr(self._local, 'revision', None)
+
+    def _ensure_iups(self, iups, groups=()):
+        """Get stored ids for ``iups``, registering unknown ones."""
+        missing = [iup for iup in dict.fromkeys(iups) if iup not in self._iup_ids]
+        if missing:
+            groups = dict(zip(iups, groups))
+            with self._lock, self.connection() as conn, conn:
+                conn.executemany(
+                    "INSERT OR IGNORE INTO iups (name, grp) VALUES (?, ?)",
+                    [(iup, groups.get(iup, '')) for iup in missing]
+                )
+                self._iup_ids = dict(conn.execute("SELECT name, id FROM iups"))
+                self._iup_names = {iup_id: name for name, iup_id in self._iup_ids.items()}
+        return np.array([self._iup_ids[iup] for iup in iups], dtype=np.int64)
+
+    def add_iups(self, iups, groups=()):
+        """Register IUPs (with optional groups) without storing any value."""
+        self._ensure_iups(list(iups), list(groups))
+
+    def write_rows(self, iups, periods, values, adjustments, clear_missing=True):
+        """Upsert one row of values and adjustment codes per (IUP, period).
+
+        ``periods`` are datetime64 months (NaT for the live inputs). NaN cells
+        delete the stored value, or are left alone with ``clear_missing=False``.
+        """
+        values = np.asarray(values, dtype=np.float64)
+        iup_ids = self._ensure_iups(list(iups))
+        periods = period_ids(periods)
+        dated = np.unique(periods[periods != CURRENT_PERIOD])
+
+        present = ~np.isnan(values)
+        rows, cols = np.nonzero(present)
+        statements = [("INSERT OR IGNORE INTO periods VALUES (?, ?)", zip(
+            dated.tolist(), dated.view('datetime64[M]').astype(str).tolist()
+        ))]
+        statements.append((_UPSERT, zip(
+            iup_ids[rows].tolist(), periods[rows].tolist(), self._parameter_ids[cols].tolist(),
+            values[rows, cols].tolist(), np.asarray(adjustments)[rows, cols].tolist()
+        )))
+        if clear_missing:
+            rows, cols = np.nonzero(~present)
+            statements.append((_DELETE, zip(
+                iup_ids[rows].tolist(), periods[rows].tolist(), self._parameter_ids[cols].tolist()
+            )))
+        self._write(statements, history=len(dated) > 0)
+
+    def write_inputs(self, iups, values, adjustments, clear_missing=False):
+        """Store the live dashboard inputs of ``iups`` (``CURRENT_PERIOD``)."""
+        periods = np.full(len(iups), np.datetime64('NaT'), dtype='datetime64[M]')
+        self.write_rows(iups, periods, values, adjustments, clear_missing)
+
+    def write_imported(self, imported, clear_missing=False):
+        """Store every row of an ``importer.ImportedData`` in one transaction."""
+        self.write_rows(
+            [imported.iups[iup_id] for iup_id in imported.iup_ids],
+            imported.periods, imported.values, imported.adjustments, clear_missing
+        )
+
+    def write_values(self, iups, param_keys, values):
+        """Store live input values of ``param_keys`` (columns of ``values``), keeping adjustments.
+
+        New cells get the ``NORMAL`` adjustment; NaN cells are left alone.
+        """
+        values = np.asarray(values, dtype=np.float64)
+        iup_ids = self._ensure_iups(list(iups))
+        parameter_ids = self._parameter_ids[[REGISTRY.index[key] for key in param_keys]]
+        rows, cols = np.nonzero(~np.isnan(values))
+        self._write([(_UPSERT_VALUE, zip(
+            iup_ids[rows].tolist(), [CURRENT_PERIOD] * len(rows), parameter_ids[cols].tolist(),
+            values[rows, cols].tolist(), [ADJUSTMENT_CODES['NORMAL']] * len(rows)
+        ))])
+
+    def set_cell(self, iup, param_key, value, adjustment_code, period=CURRENT_PERIOD):
+        """Store (or delete, with ``None``) one value of one IUP-period."""
+        iup_id = int(self._ensure_iups([iup])[0])
+        parameter_id = int(self._parameter_ids[REGISTRY.index[param_key]])
+        history = period != CURRENT_PERIOD
+        if value is None:
+            self._write([(_DELETE, [(iup_id, period, parameter_id)])], history)
+        else:
+            if history:
+                self._write([("INSERT OR IGNORE INTO periods VALUES (?, ?)",
+                              [(period, str(np.datetime64(period, 'M')))])], history)
+            self._write([(_UPSERT, [(iup_id, period, parameter_id, float(value), int(adjustment_code))])], history)
+
+    # Reads
+
+    def revision(self, key='revision'):
+        """Get the write counter of the database (``'history_revision'`` for dated writes only)."""
+        with self.connection() as conn:
+            return conn.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()[0]
+
+    def _cached(self, key, loader, revision='revision'):
+        return self._cache.get_or_create((self.path, self.revision(revision)) + key, loader)
+
+    def _iup_name(self, iup_id):
+        if iup_id not in self._iup_names:
+            # Registered by another process since the last refresh
+            with self._lock:
+                self._iup_ids = dict(self._query("SELECT name, id FROM iups"))
+                self._iup_names = {iup_id: name for name, iup_id in self._iup_ids.items()}
+        return self._iup_names[iup_id]
+
+    def _query(self, sql, params=()):
+        with self.connection() as conn:
+            return conn.execute(sql, params).fetchall()
+
+    def iups(self):
+        """Get ``[(name, group), ...]`` of every stored IUP in id order."""
+        return self._cached(('iups',), lambda: self._query("SELECT name, grp FROM iups ORDER BY id"))
+
+    def iup_period(self, iup, period=CURRENT_PERIOD):
+        """Get ``(values, adjustment_codes)`` arrays in registry order for one IUP-period."""
+        def load():
+            values = np.full(len(REGISTRY), np.nan)
+            adjustments = np.zeros(len(REGISTRY), dtype=np.int8)
+            if iup in self._iup_ids:
+                rows = self._query(
+                    "SELECT parameter_id, value, adjustment FROM observations "
+                    "WHERE iup_id = ? AND period_id = ?",
+                    (self._iup_ids[iup], period)
+                )
+                for parameter_id, value, adjustment in rows:
+                    col = self._columns[parameter_id]
+                    values[col], adjustments[col] = value, adjustment
+            return values, adjustments
+        return self._cached(('iup_period', iup, period), load)
+
+    def parameter_values(self, param_key, period=CURRENT_PERIOD):
+        """Get ``{iup: value}`` of one parameter across all IUPs for one period."""
+        def load():
+            rows = self._query(
+                "SELECT iup_id, value FROM observations WHERE parameter_id = ? AND period_id = ?",
+                (int(self._parameter_ids[REGISTRY.index[param_key]]), period)
+            )
+            return {self._iup_name(iup_id): value for iup_id, value in rows}
+        return self._cached(('parameter_values', param_key, period), load)
+
+    def parameter_series(self, param_key, iups=None, start=None, end=None):
+        """Get ``{iup: {'YYYY-MM': value}}`` of one parameter's monthly history."""
+        # Range bounds are not stored, so they may lie before 1970 (nothing is stored there)
+        start = 0 if start is None else max(int(np.datetime64(start, 'M').astype(np.int64)), 0)
+        end = np.iinfo(np.int64).max if end is None else int(np.datetime64(end, 'M').astype(np.int64))
+
+        def load():
+            rows = self._query(
+                "SELECT iup_id, period_id, value FROM observations "
+                "WHERE parameter_id = ? AND period_id BETWEEN ? AND ? ORDER BY period_id",
+                (int(self._parameter_ids[REGISTRY.index[param_key]]), start, end)
+            )
+            series = {}
+            for iup_id, period, value in rows:
+                label = str(np.datetime64(period, 'M'))
+                series.setdefault(self._iup_name(iup_id), {})[label] = value
+            return series
+
+        series = self._cached(('parameter_series', param_key, start, end), load, 'history_revision')
+        if iups is None:
+            return series
+        return {iup: series[iup] for iup in iups if iup in series}
+
+    def load_matrix(self, iups, period=CURRENT_PERIOD):
+        """Get ``(values, adjustment_codes)`` matrices (IUP x parameter) for one period.
+
+        Cells without a stored value are NaN with the ``NORMAL`` adjustment.
+        """
+        def load():
+            rows = self._query(
+                "SELECT iup_id, parameter_id, value, adjustment FROM observations "
+                f"WHERE parameter_id IN ({','.join('?' * len(REGISTRY))}) AND period_id = ?",
+                self._parameter_ids.tolist() + [period]
+            )
+            return np.array(rows, dtype=np.float64).reshape(-1, 4)
+        cells = self._cached(('period_cells', period), load)
+
+        values = np.full((len(iups), len(REGISTRY)), np.nan)
+        adjustments = np.full(values.shape, ADJUSTMENT_CODES['NORMAL'], dtype=np.int8)
+        lookup = np.full(max(self._iup_names, default=0) + 1, -1, dtype=np.intp)
+        known = [(row, self._iup_ids[iup]) for row, iup in enumerate(iups) if iup in self._iup_ids]
+        if known:
+            lookup[[iup_id for _, iup_id in known]] = [row for row, _ in known]
+        ids = cells[:, 0].astype(np.intp)
+        inside = ids < len(lookup)
+        rows = np.where(inside, lookup[np.where(inside, ids, 0)], -1)
+        keep = rows >= 0
+        cols = self._columns[cells[keep, 1].astype(np.intp)]
+        values[rows[keep], cols] = cells[keep, 2]
+        adjustments[rows[keep], cols] = cells[keep, 3]
+        return values, adjustments
+
+    def load_history(self):
+        """Get every dated row as ``importer.ImportedData``."""
+        def load():
+            cells = np.array(self._query(
+                "SELECT iup_id, period_id, parameter_id, value, adjustment FROM observations "
+                "WHERE period_id >= 0"
+            ), dtype=np.float64).reshape(-1, 5)
+            # One row per (IUP, period): both ids packed into one sortable key
+            keys, rows = np.unique(
+                (cells[:, 0].astype(np.int64) << 32) | cells[:, 1].astype(np.int64), return_inverse=True
+            )
+            rows = rows.ravel()
+            iup_keys, iup_ids = np.unique(keys >> 32, return_inverse=True)
+
+            values = np.full((len(keys), len(REGISTRY)), np.nan)
+            adjustments = np.zeros(values.shape, dtype=np.int8)
+            cols = self._columns[cells[:, 2].astype(np.intp)]
+            values[rows, cols] = cells[:, 3]
+            adjustments[rows, cols] = cells[:, 4]
+            return ImportedData(
+                [self._iup_name(iup_id) for iup_id in iup_keys.tolist()],
+                iup_ids.ravel().astype(np.int32),
+                period_months(keys & 0xFFFFFFFF),
+                values,
+                adjustments
+            )
+        return self._cached(('history',), load, 'history_revision')
+
+    def stats(self):
+        """Get the read cache counters."""
+        return self._cache.stats()
@@ -0,0 +1,525 @@
+"""Live equipment and production telemetry for the IUP Performance Comparison application.
+
+``TelemetryService`` runs an asyncio loop on a background thread that
+consumes JSON-line events from TCP clients, a tailed file or the built-in
+simulator. Each event updates the running ``kpi.SUMS`` of its IUP's current
+month in O(1). Every ``publish_interval`` seconds the IUPs that changed get
+their KPIs recomputed (``kpi.kpi_values``) and published to ``LiveValues``,
+from which dashboard sessions take only what is newer than what they applied.
+
+An event carries the columns of one ``kpi`` log kind::
+
+    {"iup": "BPM", "kind": "trips", "time": "2024-05-03T10:15:00", "distance_km": 4.2, "tonnes": 31.5}
+
+``time`` is an ISO date(time) or epoch seconds (default: now). Events of a
+month before their IUP's current month are counted as late and dropped.
+
+Usage:
+    python telemetry.py serve --source tcp://127.0.0.1:8765 [--store]
+    python telemetry.py simulate --target tcp://127.0.0.1:8765 --rate 5000
+"""
+
+import argparse
+import asyncio
+import json
+import math
+import os
+import random
+import sys
+import threading
+import time
+
+import numpy as np
+from config import IUP_LIST, TELEMETRY_CONFIG
+from kpi import KPI_KEYS, STATUS_ALIASES, SUMS, kpi_values
+
+READ_BYTES = 1 << 16
+# Simulated events are generated in ticks of this many seconds
+SIMULATION_TICK = 0.05
+
+_COLUMNS = {name: col for col, name in enumerate(SUMS)}
+_STATUS_COLUMNS = tuple(_COLUMNS[name] for name in ('operating_hours', 'standby_hours', 'down_hours'))
+
+
+def _amount(event, column):
+    """Get a finite amount; ``json`` accepts NaN and Infinity, which would spoil the month's sums."""
+    amount = float(event[column])
+    if not math.isfinite(amount):
+        raise ValueError(f"{column} is not finite: {amount}")
+    return amount
+
+
+def _trip(event):
+    return (
+        (_COLUMNS['trips'], 1.0),
+        (_COLUMNS['distance_km'], _amount(event, 'distance_km')),
+        (_COLUMNS['tonnes'], _amount(event, 'tonnes'))
+    )
+
+
+def _status(event):
+    return ((_STATUS_COLUMNS[STATUS_ALIASES[event['status'].strip().lower()]], _amount(event, 'hours')),)
+
+
+def _fuel(event):
+    return ((_COLUMNS['fuel_tickets'], 1.0), (_COLUMNS['fuel_cost'], _amount(event, 'cost')))
+
+
+def _target(event):
+    return ((_COLUMNS['target_tonnes'], _amount(event, 'target_tonnes')),)
+
+
+# Log kind -> (SUMS column, amount) pairs of one event
+_AMOUNTS = {'trips': _trip, 'equipment': _status, 'fuel': _fuel, 'targets': _target}
+
+
+def event_month(value=None):
+    """Get the month (since 1970-01) of an event time: ISO text, epoch seconds or ``None`` (now)."""
+    if isinstance(value, str):
+        return (int(value[:4]) - 1970) * 12 + int(value[5:7]) - 1
+    try:
+        moment = time.localtime(value)
+    except (OverflowError, OSError) as exc:
+        raise ValueError(f"Event time out of range: {value!r}") from exc
+    return (moment.tm_year - 1970) * 12 + moment.tm_mon - 1
+
+
+class RunningKPIs:
+    """Running ``kpi.SUMS`` of each IUP's current month, plus the IUPs changed since ``take``.
+
+    Sums are plain Python lists so one event costs a dictionary lookup and a
+    few float additions; a newer month restarts its IUP from zero.
+    """
+
+    def __init__(self):
+        self.iups = []
+        self.late = 0
+        self._rows = {}
+        self._months = []
+        self._sums = []
+        self._dirty = set()
+
+    def __len__(self):
+        return len(self.iups)
+
+    def add(self, iup, month, kind, event):
+        """Add one event of log ``kind``; returns ``False`` if it was late and dropped.
+
+        Raises ``KeyError``/``ValueError`` for an unknown kind or a missing or
+        malformed column, before anything is changed.
+        """
+        amounts = _AMOUNTS[kind](event)
+        row = self._rows.get(iup)
+        if row is None:
+            row = self._rows[iup] = len(self.iups)
+            self.iups.append(iup)
+            self._months.append(month)
+            self._sums.append([0.0] * len(SUMS))
+        elif month != self._months[row]:
+            if month < self._months[row]:
+                self.late += 1
+                return False
+            self._months[row] = month
+            self._sums[row] = [0.0] * len(SUMS)
+
+        sums = self._sums[row]
+        for col, amount in amounts:
+            sums[col] += amount
+        self._dirty.add(row)
+        return True
+
+    def take(self):
+        """Get ``(iups, months, kpis)`` of the IUPs changed since the last call, KPIs in ``KPI_KEYS`` order."""
+        rows = sorted(self._dirty)
+        self._dirty.clear()
+        sums = np.array([self._sums[row] for row in rows], dtype=np.float64).reshape(len(rows), len(SUMS))
+        months = np.array([self._months[row] for row in rows], dtype=np.int64).astype('datetime64[M]')
+        return [self.iups[row] for row in rows], months, kpi_values(sums)
+
+
+class LiveValues:
+    """The latest published KPIs per IUP, each stamped with the version that published it.
+
+    Written by the service thread and read by every session, so all access
+    goes through one lock.
+    """
+
+    def __init__(self):
+        self.version = 0
+        self.updated = None
+        self._entries = {}
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def publish(self, iups, months, values):
+        """Publish one row of KPIs per IUP as a new version."""
+        with self._lock:
+            self.version += 1
+            for iup, month, row in zip(iups, months, values):
+                self._entries[iup] = (self.version, month, row)
+            self.updated = time.time()
+            return self.version
+
+    def changes_since(self, version=0):
+        """Get ``(version, iups, months, values)`` of the IUPs published after ``version``."""
+        with self._lock:
+            current = self.version
+            changed = [(iup, month, row) for iup, (stamp, month, row) in self._entries.items() if stamp > version]
+        return (
+            current,
+            [iup for iup, _, _ in changed],
+            np.array([month for _, month, _ in changed], dtype='datetime64[M]'),
+            np.array([row for _, _, row in changed], dtype=np.float64).reshape(len(changed), len(KPI_KEYS))
+        )
+
+
+def simulated_events(iups, seed=None):
+    """Yield an endless stream of plausible JSON-line events (bytes) for ``iups``.
+
+    Each IUP gets its own productivity, availability and fuel efficiency, so
+    the derived KPIs settle at different levels per IUP.
+    """
+    rng = random.Random(seed)
+    iups = list(iups)
+    profiles = [
+        (rng.uniform(0.7, 1.2), rng.uniform(0.6, 0.95), rng.uniform(0.5, 1.5), rng.uniform(2.0, 8.0))
+        for _ in iups
+    ]
+    kinds = ('trips', 'equipment', 'fuel', 'targets')
+    shares = (0.7, 0.18, 0.05, 0.07)
+    dumps = json.JSONEncoder(separators=(',', ':')).encode
+    while True:
+        row = rng.randrange(len(iups))
+        productivity, availability, fuel, distance = profiles[row]
+        kind = rng.choices(kinds, shares)[0]
+        event = {'iup': iups[row], 'kind': kind, 'time': time.time()}
+        if kind == 'trips':
+            event['distance_km'] = round(rng.gauss(distance, distance * 0.1), 2)
+            event['tonnes'] = round(rng.gauss(30.0, 3.0) * productivity, 1)
+        elif kind == 'equipment':
+            draw = rng.random()
+            event['status'] = 'down' if draw > availability else 'operating' if draw < availability * 0.8 else 'standby'
+            event['hours'] = round(rng.uniform(0.5, 2.0), 2)
+        elif kind == 'fuel':
+            # About 3 USD per tonne hauled at fuel efficiency 1
+            event['cost'] = round(rng.gauss(1260.0, 100.0) * productivity * fuel, 2)
+        else:
+            # Planned tonnes per target event match the hauled tonnes at productivity 1
+            event['target_tonnes'] = 300.0
+        yield (dumps(event) + '\n').encode()
+
+
+class TelemetryService:
+    """Asyncio ingestion of telemetry events with throttled publishing of derived KPIs.
+
+    ``sources`` are ``tcp://host:port`` (a server accepting JSON-line
+    clients), ``file:path`` or a bare path (followed like ``tail -F``) and
+    ``simulate:rate`` (in-process events per second for ``iups``). With a
+    ``store`` each publication is also written as live inputs. With
+    ``known`` (any container of IUP names, e.g. an ``IUPRegistry``) events
+    of other IUPs are counted as errors, like malformed ones.
+    """
+
+    def __init__(self, sources, publish_interval=2.0, tail_poll=0.2, iups=(), store=None, known=None):
+        self.sources = list(sources)
+        self.publish_interval = publish_interval
+        self.tail_poll = tail_poll
+        self.iups = list(iups) or list(IUP_LIST)
+        self.store = store
+        self.known = known
+        self.kpis = RunningKPIs()
+        self.live = LiveValues()
+        self.events = 0
+        self.errors = 0
+        self.rate = 0.0
+        self.addresses = {}
+        self.source_errors = {}
+        self._thread = None
+        self._loop = None
+        self._stopping = None
+        self._ready = threading.Event()
+        self._starting = set()
+        self._published = (time.perf_counter(), 0)
+
+    @classmethod
+    def from_config(cls, config=TELEMETRY_CONFIG, iups=(), store=None, known=None):
+        return cls(config['sources'], config['publish_interval'], config['tail_poll'], iups, store, known)
+
+    def stats(self):
+        """Get the service counters (events, events per second, late, errors, IUPs)."""
+        return {
+            'events': self.events,
+            'rate': self.rate,
+            'late': self.kpis.late,
+            'errors': self.errors,
+            'iups': len(self.live),
+            'updated': self.live.updated
+        }
+
+    # Event handling
+
+    def handle_lines(self, lines):
+        """Add every JSON-line event of ``lines`` (bytes or text), counting malformed and unknown-IUP ones."""
+        add = self.kpis.add
+        loads = json.loads
+        known = self.known
+        handled = errors = 0
+        for line in lines:
+            if not line.strip():
+                continue
+            try:
+                event = loads(line)
+                iup = str(event['iup'])
+                if known is not None and iup not in known:
+                    raise KeyError(iup)
+                add(iup, event_month(event.get('time')), event['kind'], event)
+            except (ValueError, KeyError, TypeError, AttributeError):
+                errors += 1
+            else:
+                handled += 1
+        self.events += handled
+        self.errors += errors
+
+    def _feed(self, pending, chunk):
+        """Handle the complete lines of ``pending + chunk``; returns the incomplete rest."""
+        lines = (pending + chunk).split(b'\n')
+        self.handle_lines(lines[:-1])
+        return lines[-1]
+
+    def publish(self):
+        """Publish the KPIs of the IUPs changed since the last publication; returns ``(iups, values)``."""
+        now = time.perf_counter()
+        last, events = self._published
+        self.rate = (self.events - events) / max(now - last, 1e-9)
+        self._published = (now, self.events)
+
+        iups, months, values = self.kpis.take()
+        if iups:
+            self.live.publish(iups, months, values)
+        return iups, values
+
+    # Sources
+
+    async def _read_stream(self, reader):
+        pending = b''
+        while chunk := await reader.read(READ_BYTES):
+            pending = self._feed(pending, chunk)
+        self.handle_lines([pending])
+
+    async def _handle_client(self, reader, writer):
+        try:
+            await self._read_stream(reader)
+        finally:
+            writer.close()
+
+    async def _serve_tcp(self, spec, host, port):
+        server = await asyncio.start_server(self._handle_client, host, port)
+        self.addresses[spec] = server.sockets[0].getsockname()[:2]
+        self._source_ready(spec)
+        async with server:
+            await server.serve_forever()
+
+    async def _tail(self, spec, path):
+        """Follow ``path`` from its current end, starting over when it is truncated or replaced."""
+        position = os.path.getsize(path) if os.path.exists(path) else 0
+        self._source_ready(spec)
+        pending = b''
+        while True:
+            try:
+                size = os.path.getsize(path)
+            except OSError:
+                size = 0
+            if size < position:
+                position, pending = 0, b''
+            if size == position:
+                await asyncio.sleep(self.tail_poll)
+                continue
+            with open(path, 'rb') as handle:
+                handle.seek(position)
+                chunk = handle.read(min(size - position, READ_BYTES * 16))
+            position += len(chunk)
+            pending = self._feed(pending, chunk)
+            await asyncio.sleep(0)
+
+    async def _simulate(self, spec, rate):
+        events = simulated_events(self.iups)
+        self._source_ready(spec)
+        last = time.perf_counter()
+        owed = 0.0
+        while True:
+            await asyncio.sleep(SIMULATION_TICK)
+            now = time.perf_counter()
+            owed += (now - last) * rate
+            last = now
+            count = int(owed)
+            owed -= count
+            self.handle_lines([next(events) for _ in range(count)])
+
+    def _source(self, spec):
+        scheme, _, target = spec.partition(':')
+        if scheme == 'tcp':
+            host, _, port = target.lstrip('/').rpartition(':')
+            return self._serve_tcp(spec, host or '127.0.0.1', int(port))
+        if scheme == 'simulate':
+            return self._simulate(spec, float(target or 1000))
+        return self._tail(spec, target if scheme == 'file' else spec)
+
+    def _source_ready(self, spec):
+        """Mark ``spec`` as listening (or failed); ``start`` returns once no source is still starting."""
+        self._starting.discard(spec)
+        if not self._starting:
+            self._ready.set()
+
+    async def _run_source(self, spec):
+        try:
+            await self._source(spec)
+        except asyncio.CancelledError:
+            raise
+        except Exception as exc:
+            # One failing source (e.g. a port in use) leaves the others running
+            self.source_errors[spec] = f"{type(exc).__name__}: {exc}"
+        finally:
+            self._source_ready(spec)
+
+    async def _publish_loop(self):
+        while True:
+            await asyncio.sleep(self.publish_interval)
+            iups, values = self.publish()
+            if iups and self.store is not None:
+                # Store writes run off the loop so ingestion keeps going meanwhile
+                await asyncio.to_thread(self.store.write_values, iups, KPI_KEYS, values)
+
+    async def _main(self):
+        self._loop = asyncio.get_running_loop()
+        self._stopping = asyncio.Event()
+        # The sources report when they are listening; None stands for this setup itself
+        self._starting = set(self.sources) | {None}
+        tasks = [asyncio.create_task(self._run_source(spec)) for spec in self.sources]
+        tasks.append(asyncio.create_task(self._publish_loop()))
+        self._source_ready(None)
+        try:
+            await self._stopping.wait()
+        finally:
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+            iups, values = self.publish()
+            if iups and self.store is not None:
+                self.store.write_values(iups, KPI_KEYS, values)
+
+    # Lifecycle
+
+    def run(self):
+        """Run the service on the current thread until ``stop`` is called."""
+        asyncio.run(self._main())
+
+    def start(self):
+        """Run the service on a daemon thread; returns once every source is accepting events.
+
+        TCP sources are then listening and tailed files have their start
+        offset recorded, so anything sent or appended afterwards is ingested.
+        """
+        self._thread = threading.Thread(target=self.run, name='telemetry', daemon=True)
+        self._thread.start()
+        self._ready.wait()
+        return self
+
+    def stop(self, timeout=5.0):
+        if self._loop is not None:
+            self._loop.call_soon_threadsafe(self._stopping.set)
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+
+# Command line
+
+
+def _send(target, events, rate, duration):
+    """Write ``events`` to a TCP service or append them to a file at ``rate`` per second."""
+    import socket
+
+    scheme, _, address = target.partition(':')
+    if scheme == 'tcp':
+        host, _, port = address.lstrip('/').rpartition(':')
+        sink = socket.create_connection((host or '127.0.0.1', int(port)))
+        write = sink.sendall
+    else:
+        sink = open(address if scheme == 'file' else target, 'ab')
+        write = lambda data: (sink.write(data), sink.flush())
+
+    sent = 0
+    start = time.perf_counter()
+    try:
+        while duration is None or time.perf_counter() - start < duration:
+            due = int((time.perf_counter() - start) * rate) - sent
+            if due > 0:
+                write(b''.join(next(events) for _ in range(due)))
+                sent += due
+            time.sleep(SIMULATION_TICK)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        sink.close()
+    return sent, time.perf_counter() - start
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Live IUP telemetry ingestion and simulator.")
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    serve = commands.add_parser('serve', help="Ingest events and publish derived KPIs")
+    serve.add_argument('--source', action='append', help="tcp://host:port, file:path or simulate:rate (repeatable)")
+    serve.add_argument('--interval', type=float, default=TELEMETRY_CONFIG['publish_interval'],
+                       help="Seconds between publications")
+    serve.add_argument('--store', action='store_true', help="Write every publication into the SQLite store")
+
+    simulate = commands.add_parser('simulate', help="Send simulated events to a service or a tailed file")
+    simulate.add_argument('--target', default=TELEMETRY_CONFIG['sources'][0], help="tcp://host:port or file:path")
+    simulate.add_argument('--rate', type=float, default=1000.0, help="Events per second")
+    simulate.add_argument('--duration', type=float, help="Seconds to run (default: until interrupted)")
+    simulate.add_argument('--seed', type=int)
+    args = parser.parse_args(argv)
+
+    from iups import load_iup_registry
+
+    iups = load_iup_registry().names
+    if args.command == 'simulate':
+        sent, elapsed = _send(args.target, simulated_events(iups, args.seed), args.rate, args.duration)
+        print(f"Sent {sent} events in {elapsed:.1f}s ({sent / max(elapsed, 1e-9):,.0f} events/s)", file=sys.stderr)
+        return 0
+
+    store = None
+    known = set(iups)
+    if args.store:
+        from storage import Store
+
+        store = Store()
+        known.update(name for name, _ in store.iups())
+    service = TelemetryService(
+        args.source or TELEMETRY_CONFIG['sources'], args.interval, TELEMETRY_CONFIG['tail_poll'], iups, store, known
+    )
+    service.start()
+    try:
+        while True:
+            time.sleep(args.interval)
+            stats = service.stats()
+            print(
+                f"{stats['events']} events ({stats['rate']:,.0f}/s), {stats['iups']} IUPs, "
+                f"{stats['late']} late, {stats['errors']} malformed or unknown IUP",
+                file=sys.stderr
+            )
+            for spec, error in service.source_errors.items():
+                print(f"source {spec} failed: {error}", file=sys.stderr)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        service.stop()
+        if store is not None:
+            store.close()
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
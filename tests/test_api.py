@@ -0,0 +1,45 @@
+"""Tests for the HTTP-independent routes of the scoring API."""
+
+import json
+
+import pytest
+
+from api import ScoringAPI
+from registry import REGISTRY
+from storage import Store
+
+KEY = REGISTRY.keys[0]
+JSON_HEADERS = {'Content-Type': 'application/json'}
+
+
+@pytest.fixture
+def api(tmp_path):
+    store = Store(str(tmp_path / 'api.sqlite'))
+    yield ScoringAPI(store)
+    store.close()
+
+
+def post_score(api, payload):
+    status, _, body = api.handle('POST', '/score', json.dumps(payload).encode(), JSON_HEADERS)
+    return status, json.loads(body)
+
+
+def test_score_json_scenario(api):
+    status, result = post_score(api, {'A': {KEY: 1.0}, 'B': {KEY: 2.0}})
+    assert status == 200
+    assert result['rows'] == 2
+    assert sorted(result['data']['rank']) == [1, 2]
+
+
+@pytest.mark.parametrize('payload', [
+    5,
+    [1],
+    {'A': 3},
+    {'A': {KEY: {'value': {'nested': 1}}}},
+    {'A': {'nope': 1}},
+    {'scenarios': {'one': {'A': 'x'}}},
+])
+def test_score_rejects_malformed_json_with_value_error(api, payload):
+    status, result = post_score(api, payload)
+    assert status == 400
+    assert result['error'].startswith('ValueError')
@@ -0,0 +1,34 @@
+"""Tests for chart downsampling."""
+
+import numpy as np
+
+from downsample import top_n
+from visualization import create_bar_chart
+
+LABELS = ['a', 'b', 'c', 'd', 'e']
+VALUES = [3.0, 1.0, 5.0, 2.0, 4.0]
+
+
+def test_top_n_keeps_largest_by_default():
+    labels, values = top_n(LABELS, VALUES, n=3, others_label='Others')
+    assert labels == ['c', 'e', 'Others (3)']
+    assert values == [5.0, 4.0, 2.0]
+
+
+def test_top_n_keeps_smallest_when_lower_is_better():
+    labels, values = top_n(LABELS, VALUES, n=3, others_label='Others', direction=-1.0)
+    assert labels == ['b', 'd', 'Others (3)']
+    assert values == [1.0, 2.0, 4.0]
+
+
+def test_top_n_leaves_short_series_alone():
+    assert top_n(LABELS, VALUES, n=5) == (LABELS, VALUES)
+
+
+def test_bar_chart_keeps_best_bars_for_lower_is_better():
+    parameter_values = {f"IUP-{idx}": {'value': float(idx)} for idx in range(100)}
+    figure = create_bar_chart(parameter_values, 'Cost', 'USD', direction=-1.0)
+    bars = list(figure.data[0].x)
+    assert bars[:3] == ['IUP-0', 'IUP-1', 'IUP-2']
+    assert 'IUP-99' not in bars
+    np.testing.assert_array_equal(figure.data[0].y[:3], [0.0, 1.0, 2.0])
@@ -0,0 +1,67 @@
+"""Tests for the CSV and JSON importers."""
+
+import io
+
+import numpy as np
+import pytest
+
+from importer import parse_json, read_csv
+from registry import ADJUSTMENT_CODES, REGISTRY
+
+KEY = REGISTRY.keys[0]
+
+
+def test_read_csv_maps_columns_and_adjustments():
+    imported = read_csv(io.StringIO(f"iup,period,adjustment,{KEY}\nA,2024-01,sulit,1.5\nB,2024-02,,\n"))
+    assert list(imported.iups) == ['A', 'B']
+    assert imported.values[0, REGISTRY.index[KEY]] == 1.5
+    assert np.isnan(imported.values[1, REGISTRY.index[KEY]])
+    assert imported.adjustments[0, 0] == ADJUSTMENT_CODES['SULIT']
+    assert imported.adjustments[1, 0] == ADJUSTMENT_CODES['NORMAL']
+    assert [str(period) for period in imported.periods] == ['2024-01', '2024-02']
+
+
+def test_read_csv_skips_blank_iups():
+    imported = read_csv(io.StringIO(f"iup,{KEY}\nA,1\n ,2\n,3\nB,4\n"))
+    assert list(imported.iups) == ['A', 'B']
+    assert imported.values[:, REGISTRY.index[KEY]].tolist() == [1.0, 4.0]
+
+
+def test_read_csv_without_parameter_columns():
+    with pytest.raises(ValueError, match="No columns match"):
+        read_csv(io.StringIO("iup,nope\nA,1\n"))
+
+
+def test_parse_json_flat_and_nested_layouts():
+    imported = parse_json({
+        'A': {KEY: 2.0},
+        'B': {REGISTRY.specs[0].category: {KEY: {'value': 3.0, 'adjustment': 'MUDAH'}}}
+    })
+    col = REGISTRY.index[KEY]
+    assert imported.values[:, col].tolist() == [2.0, 3.0]
+    assert imported.adjustments[1, col] == ADJUSTMENT_CODES['MUDAH']
+
+
+def test_parse_json_records_skip_blank_iups():
+    imported = parse_json([{'iup': None, KEY: 1}, {'iup': 'X', KEY: 2}])
+    assert list(imported.iups) == ['X']
+
+
+@pytest.mark.parametrize('payload', [
+    5,
+    'text',
+    None,
+    [1, 2],
+    [{'iup': 'A', KEY: {'value': 1}}],
+    [{'iup': {'name': 'A'}, KEY: 1}],
+    {'A': 3},
+    {'A': [1, 2]},
+    {'A': {KEY: {'value': {'nested': 1}}}},
+    {'A': {KEY: [1]}},
+    {'A': {KEY: 'abc'}},
+    {'A': {KEY: {'value': 1, 'adjustment': 'unknown'}}},
+    {'A': {'nope': 1}},
+])
+def test_parse_json_rejects_malformed_payloads(payload):
+    with pytest.raises(ValueError):
+        parse_json(payload)
@@ -0,0 +1,126 @@
+"""Tests that the vectorized scoring matches the per-parameter reference in ``utils``."""
+
+import random
+
+import numpy as np
+import pytest
+
+from config import ADJUSTMENT_LEVELS, NORMALIZATION_METHODS
+from parameters import PARAMETERS
+from registry import ADJUSTMENT_CODES, REGISTRY
+from scoring import ScoringEngine, ScoringState
+from utils import calculate_category_score, calculate_final_score
+
+IUPS = [f"IUP-{row}" for row in range(6)]
+
+
+def random_data(seed=1):
+    """Get ``{iup: {category: {param_key: {'value', 'adjustment'}}}}`` with gaps, ties and zeros."""
+    rng = random.Random(seed)
+    data = {}
+    for iup in IUPS:
+        data[iup] = {}
+        for category, subcategories in PARAMETERS.items():
+            if rng.random() < 0.15:
+                continue
+            data[iup][category] = {
+                param_key: {
+                    'value': rng.choice([0.0, 5.0, rng.uniform(-2, 100)]),
+                    'adjustment': rng.choice(list(ADJUSTMENT_LEVELS))
+                }
+                for params in subcategories.values()
+                for param_key in params
+                if rng.random() >= 0.1
+            }
+    return data
+
+
+def reference_scores(data):
+    """Score ``data`` one parameter at a time with the ``utils`` functions."""
+    flat = {iup: {key: entry for params in categories.values() for key, entry in params.items()}
+            for iup, categories in data.items()}
+    categories = {
+        iup: {category: calculate_category_score(flat[iup], PARAMETERS[category], flat)
+              for category in PARAMETERS if category in data[iup]}
+        for iup in data
+    }
+    return categories, {iup: calculate_final_score(scores) for iup, scores in categories.items()}
+
+
+def state_from(data):
+    engine = ScoringEngine.from_data(data, IUPS)
+    adjustments = np.full(engine.values.shape, ADJUSTMENT_CODES['NORMAL'], dtype=np.int8)
+    for row, iup in enumerate(IUPS):
+        for params in data[iup].values():
+            for param_key, entry in params.items():
+                adjustments[row, REGISTRY.index[param_key]] = ADJUSTMENT_CODES[entry['adjustment']]
+    return ScoringState(IUPS, engine.values.copy(), adjustments)
+
+
+@pytest.mark.parametrize('seed', [1, 2, 3])
+def test_engine_matches_reference(seed):
+    data = random_data(seed)
+    categories, finals = reference_scores(data)
+    engine = ScoringEngine.from_data(data, IUPS)
+
+    score_dict = engine.score_dict()
+    for iup in IUPS:
+        assert set(score_dict[iup]) == set(categories[iup])
+        for category, score in categories[iup].items():
+            assert score_dict[iup][category] == pytest.approx(score, abs=1e-12)
+    np.testing.assert_allclose(engine.final_scores(), [finals[iup] for iup in IUPS], atol=1e-12)
+    np.testing.assert_allclose(engine.hierarchy().final, engine.final_scores(), atol=1e-12)
+
+
+def test_state_matches_engine():
+    data = random_data()
+    state = state_from(data)
+    engine = ScoringEngine.from_data(data, IUPS)
+    np.testing.assert_allclose(state.category_scores(), engine.category_scores(), atol=1e-12)
+    np.testing.assert_allclose(state.final_scores(), engine.final_scores(), atol=1e-12)
+
+
+@pytest.mark.parametrize('method', NORMALIZATION_METHODS)
+def test_incremental_updates_match_rescoring(method):
+    data = random_data()
+    state = state_from(data)
+    state.set_method(method)
+    rng = random.Random(7)
+    keys = list(REGISTRY.keys)
+
+    for _ in range(200):
+        iup, param_key = rng.choice(IUPS), rng.choice(keys)
+        action = rng.random()
+        if action < 0.5:
+            state.set_value(iup, param_key, rng.choice([0.0, 5.0, rng.uniform(-2, 100)]))
+        elif action < 0.65:
+            state.set_value(iup, param_key, None)
+        elif action < 0.85:
+            state.set_adjustment(iup, param_key, rng.choice(list(ADJUSTMENT_LEVELS)))
+        else:
+            others = rng.sample(IUPS, 3)
+            state.set_values(others, param_key, [rng.uniform(0, 10), np.nan, 5.0])
+
+    fresh = ScoringState(IUPS, state.values.copy(), state.adjustments.copy(), method)
+    np.testing.assert_allclose(state.category_scores(), fresh.category_scores(), atol=1e-9)
+    np.testing.assert_allclose(state.final_scores(), fresh.final_scores(), atol=1e-9)
+    np.testing.assert_allclose(state.hierarchy().subcategories, fresh.hierarchy().subcategories, atol=1e-9)
+
+
+def test_add_iups_scores_new_rows_as_empty():
+    state = state_from(random_data())
+    before = state.final_scores().copy()
+    state.add_iups(['IUP-new', IUPS[0]])
+
+    assert state.iups == IUPS + ['IUP-new']
+    assert state.final_scores()[-1] == 0
+    np.testing.assert_allclose(state.final_scores()[:-1], before)
+
+
+def test_set_method_rescores():
+    state = state_from(random_data())
+    version = state.version
+    state.set_method('percentile')
+    expected = ScoringEngine(IUPS, state.values, state.multipliers, 'percentile').final_scores()
+    assert state.version > version
+    np.testing.assert_allclose(state.final_scores(), expected, atol=1e-12)
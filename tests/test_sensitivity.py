@@ -0,0 +1,38 @@
+"""Tests for the Monte Carlo sensitivity analysis."""
+
+import numpy as np
+import pytest
+
+from config import SENSITIVITY_CONFIG
+from registry import ADJUSTMENT_KEYS, REGISTRY
+from sensitivity import run_sensitivity
+
+IUPS = [f"IUP-{row}" for row in range(6)]
+
+
+@pytest.fixture
+def inputs():
+    rng = np.random.default_rng(0)
+    values = rng.random((len(IUPS), len(REGISTRY)))
+    values[rng.random(values.shape) < 0.1] = np.nan
+    adjustments = rng.integers(0, len(ADJUSTMENT_KEYS), values.shape, dtype=np.int8)
+    return values, adjustments
+
+
+def test_rank_probabilities_sum_to_one(inputs):
+    result = run_sensitivity(IUPS, *inputs, samples=2_000, seed=1)
+    np.testing.assert_allclose(result.rank_probabilities.sum(axis=0), 1)
+    np.testing.assert_allclose(result.rank_probabilities.sum(axis=1), 1)
+    assert np.all(result.ci_low <= result.mean) and np.all(result.mean <= result.ci_high)
+    assert result.ci_samples == result.samples
+
+
+def test_score_cap_keeps_statistics_over_all_samples(inputs):
+    config = dict(SENSITIVITY_CONFIG, chunk_size=300, max_score_cells=500 * len(IUPS))
+    full = run_sensitivity(IUPS, *inputs, samples=2_000, seed=1, config=dict(config, max_score_cells=10 ** 9))
+    capped = run_sensitivity(IUPS, *inputs, samples=2_000, seed=1, config=config)
+
+    assert capped.ci_samples == 500
+    np.testing.assert_allclose(capped.mean, full.mean, rtol=1e-6)
+    np.testing.assert_array_equal(capped.rank_probabilities, full.rank_probabilities)
+    assert capped.drivers == full.drivers
@@ -0,0 +1,101 @@
+"""Tests for Arrow IPC scenario snapshots."""
+
+import json
+
+import numpy as np
+import pyarrow as pa
+import pytest
+
+from importer import ImportedData
+from registry import ADJUSTMENT_KEYS, REGISTRY
+from snapshots import METADATA_KEY, build_metadata, read_snapshot, snapshot_bytes, to_table, write_snapshot
+
+
+def sample_data(rows=3):
+    rng = np.random.default_rng(0)
+    values = rng.random((rows, len(REGISTRY)))
+    values[:1, 1] = np.nan
+    adjustments = rng.integers(0, len(ADJUSTMENT_KEYS), values.shape, dtype=np.int8)
+    periods = np.array((['NaT'] + ['2024-01'] * rows)[:rows], dtype='datetime64[M]')
+    return ImportedData.from_rows([f"IUP-{row}" for row in range(rows)], values, adjustments, periods)
+
+
+def table_bytes(table):
+    sink = pa.BufferOutputStream()
+    with pa.ipc.new_file(sink, table.schema) as writer:
+        writer.write_table(table)
+    return sink.getvalue().to_pybytes()
+
+
+def with_metadata(table, metadata):
+    return table.replace_schema_metadata({METADATA_KEY: json.dumps(metadata).encode()})
+
+
+def test_round_trip_bytes():
+    data = sample_data()
+    snapshot = read_snapshot(snapshot_bytes(data, build_metadata('2024-01-01T00:00:00', 'tester')))
+    assert list(snapshot.data.iups) == data.iups
+    np.testing.assert_array_equal(snapshot.data.values, data.values)
+    np.testing.assert_array_equal(snapshot.data.adjustments, data.adjustments)
+    np.testing.assert_array_equal(snapshot.data.periods, data.periods)
+    assert snapshot.metadata['author'] == 'tester'
+    assert snapshot.weights_match()
+
+
+def test_round_trip_file(tmp_path):
+    data = sample_data()
+    path = tmp_path / 'scenario.arrow'
+    write_snapshot(str(path), data, build_metadata('2024-01-01T00:00:00'))
+    np.testing.assert_array_equal(read_snapshot(path).data.values, data.values)
+
+
+def test_round_trip_empty():
+    snapshot = read_snapshot(snapshot_bytes(sample_data(0), build_metadata('2024-01-01T00:00:00')))
+    assert len(snapshot.data) == 0
+    assert snapshot.data.values.shape == (0, len(REGISTRY))
+
+
+def test_remaps_reordered_parameters():
+    data = sample_data()
+    metadata = build_metadata('2024-01-01T00:00:00')
+    metadata['parameters'] = list(reversed(REGISTRY.keys))
+    table = to_table(ImportedData(data.iups, data.iup_ids, data.periods,
+                                  np.ascontiguousarray(data.values[:, ::-1]), data.adjustments[:, ::-1].copy()), metadata)
+    np.testing.assert_array_equal(read_snapshot(table_bytes(table)).data.values, data.values)
+
+
+@pytest.mark.parametrize('source', [b'', b'not an arrow file', b'ARROW1' + b'\0' * 64])
+def test_rejects_non_snapshots(source):
+    with pytest.raises(ValueError):
+        read_snapshot(source)
+
+
+@pytest.mark.parametrize('missing', ['parameters', 'adjustment_keys'])
+def test_rejects_missing_metadata(missing):
+    metadata = build_metadata('2024-01-01T00:00:00')
+    del metadata[missing]
+    with pytest.raises(ValueError):
+        read_snapshot(table_bytes(to_table(sample_data(), metadata)))
+
+
+def test_rejects_other_versions():
+    metadata = dict(build_metadata('2024-01-01T00:00:00'), format_version=99)
+    with pytest.raises(ValueError, match='version'):
+        read_snapshot(table_bytes(to_table(sample_data(), metadata)))
+
+
+@pytest.mark.parametrize('remapped', [False, True])
+def test_rejects_out_of_range_adjustment_codes(remapped):
+    data = sample_data()
+    data.adjustments[0, 0] = len(ADJUSTMENT_KEYS) + 3
+    metadata = build_metadata('2024-01-01T00:00:00')
+    if remapped:
+        metadata['adjustment_keys'] = list(reversed(ADJUSTMENT_KEYS))
+    with pytest.raises(ValueError, match='adjustment'):
+        read_snapshot(snapshot_bytes(data, metadata))
+
+
+def test_rejects_missing_columns():
+    table = to_table(sample_data(), build_metadata('2024-01-01T00:00:00')).drop_columns(['values'])
+    with pytest.raises(ValueError):
+        read_snapshot(table_bytes(with_metadata(table, build_metadata('2024-01-01T00:00:00'))))
@@ -0,0 +1,62 @@
+"""Tests for the SQLite store."""
+
+import numpy as np
+import pytest
+
+from registry import ADJUSTMENT_CODES, REGISTRY
+from storage import CURRENT_PERIOD, Store, period_ids, period_months
+
+KEY = REGISTRY.keys[0]
+
+
+@pytest.fixture
+def store(tmp_path):
+    store = Store(str(tmp_path / 'store.sqlite'))
+    yield store
+    store.close()
+
+
+def row(value, adjustment='NORMAL'):
+    values = np.full((1, len(REGISTRY)), np.nan)
+    values[0, REGISTRY.index[KEY]] = value
+    return values, np.full(values.shape, ADJUSTMENT_CODES[adjustment], dtype=np.int8)
+
+
+def test_period_ids_round_trip():
+    months = np.array(['NaT', '1970-01', '2024-05'], dtype='datetime64[M]')
+    ids = period_ids(months)
+    assert ids.tolist() == [CURRENT_PERIOD, 0, 652]
+    np.testing.assert_array_equal(period_months(ids), months)
+
+
+def test_period_ids_reject_months_before_1970():
+    with pytest.raises(ValueError, match='1969-12'):
+        period_ids(np.array(['2024-01', '1969-12'], dtype='datetime64[M]'))
+
+
+def test_history_is_kept_apart_from_current_inputs(store):
+    values, adjustments = row(1.0)
+    store.write_inputs(['A'], values, adjustments)
+    store.write_rows(['A'], np.array(['2024-01'], dtype='datetime64[M]'), *row(2.0))
+
+    current, _ = store.load_matrix(['A'])
+    assert current[0, REGISTRY.index[KEY]] == 1.0
+    history = store.load_history()
+    assert [str(period) for period in history.periods] == ['2024-01']
+    assert history.values[0, REGISTRY.index[KEY]] == 2.0
+
+
+def test_write_rows_rejects_months_before_1970(store):
+    with pytest.raises(ValueError):
+        store.write_rows(['A'], np.array(['1969-12'], dtype='datetime64[M]'), *row(2.0))
+    assert len(store.load_history()) == 0
+
+
+def test_write_values_keeps_adjustments(store):
+    store.write_inputs(['A'], *row(1.0, 'SULIT'))
+    store.write_values(['A', 'B'], [KEY], [[5.0], [6.0]])
+
+    values, adjustments = store.load_matrix(['A', 'B'])
+    col = REGISTRY.index[KEY]
+    assert values[:, col].tolist() == [5.0, 6.0]
+    assert adjustments[:, col].tolist() == [ADJUSTMENT_CODES['SULIT'], ADJUSTMENT_CODES['NORMAL']]
@@ -0,0 +1,120 @@
+"""Tests for telemetry event handling and the service lifecycle."""
+
+import json
+import socket
+import time
+
+import numpy as np
+import pytest
+
+from kpi import KPI_KEYS, SUMS
+from telemetry import TelemetryService, event_month
+
+
+def line(**event):
+    return json.dumps({'iup': 'BPM', 'kind': 'trips', 'time': '2024-05-03', 'distance_km': 4.0, 'tonnes': 30.0,
+                       **event})
+
+
+@pytest.fixture
+def service():
+    return TelemetryService([], known={'BPM', 'BSJ'})
+
+
+def test_event_month():
+    assert event_month('1970-01-31T23:00:00') == 0
+    assert event_month('2024-05-03') == (2024 - 1970) * 12 + 4
+    assert event_month(time.mktime((2024, 5, 3, 12, 0, 0, 0, 0, -1))) == (2024 - 1970) * 12 + 4
+
+
+@pytest.mark.parametrize('value', [1e20, -1e20])
+def test_event_month_out_of_range(value):
+    with pytest.raises(ValueError):
+        event_month(value)
+
+
+def test_valid_events_are_summed(service):
+    service.handle_lines([line(), line(distance_km=6.0), line(iup='BSJ'), b'', '  '])
+    assert (service.events, service.errors) == (3, 0)
+
+    iups, months, values = service.kpis.take()
+    assert iups == ['BPM', 'BSJ']
+    assert months[0] == np.datetime64('2024-05')
+    assert values.shape == (2, len(KPI_KEYS))
+    assert service.kpis._sums[0][SUMS.index('distance_km')] == 10.0
+
+
+@pytest.mark.parametrize('bad', [
+    '{not json',
+    '[1, 2]',
+    '"text"',
+    line(iup='UNKNOWN'),
+    line(kind='unknown'),
+    json.dumps({'iup': 'BPM', 'kind': 'trips', 'time': '2024-05-03'}),
+    line(distance_km='far'),
+    line(distance_km=float('nan')),
+    line(tonnes=float('inf')),
+    line(time=1e20),
+    line(kind='equipment', status='exploded', hours=1.0),
+    line(kind='equipment', status=3, hours=1.0),
+])
+def test_malformed_events_are_counted_as_errors(service, bad):
+    service.handle_lines([bad])
+    assert (service.events, service.errors) == (0, 1)
+    assert len(service.kpis) == 0
+
+
+def test_late_events_are_dropped(service):
+    service.handle_lines([line(time='2024-06-01'), line(time='2024-05-31', tonnes=1000.0)])
+    assert service.kpis.late == 1
+    assert service.kpis._sums[0][SUMS.index('tonnes')] == 30.0
+
+    service.handle_lines([line(time='2024-07-01')])
+    assert service.kpis._months[0] == event_month('2024-07-01')
+    assert service.kpis._sums[0][SUMS.index('trips')] == 1.0
+
+
+def test_publish_only_changed_iups(service):
+    service.handle_lines([line(), line(iup='BSJ')])
+    assert service.publish()[0] == ['BPM', 'BSJ']
+    version = service.live.version
+
+    service.handle_lines([line(iup='BSJ')])
+    assert service.publish()[0] == ['BSJ']
+    assert service.publish()[0] == []
+    _, iups, _, values = service.live.changes_since(version)
+    assert iups == ['BSJ'] and values.shape == (1, len(KPI_KEYS))
+
+
+def wait_for(condition, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline
+        time.sleep(0.01)
+
+
+def test_sources_accept_events_once_started(tmp_path):
+    path = tmp_path / 'events.jsonl'
+    path.write_text(line(tonnes=1.0) + '\n')
+    service = TelemetryService(['tcp://127.0.0.1:0', f"file:{path}"], publish_interval=60, tail_poll=0.01)
+    service.start()
+    try:
+        with socket.create_connection(service.addresses['tcp://127.0.0.1:0']) as client:
+            client.sendall((line() + '\n' + line(iup='BSJ')).encode())
+        with open(path, 'a') as handle:
+            handle.write(line(kind='fuel', cost=100.0) + '\n')
+        wait_for(lambda: service.events == 3)
+    finally:
+        service.stop()
+    # The line already in the file predates the start and is not replayed
+    assert (service.events, service.errors) == (3, 0)
+    assert service.source_errors == {}
+
+
+def test_failing_source_does_not_block_start(tmp_path):
+    service = TelemetryService(['tcp://127.0.0.1:not-a-port', f"file:{tmp_path / 'events.jsonl'}"],
+                               publish_interval=60)
+    service.start()
+    service.stop()
+    assert list(service.source_errors) == ['tcp://127.0.0.1:not-a-port']
+    assert service.source_errors['tcp://127.0.0.1:not-a-port'].startswith('ValueError')
@@ -1,7 +1,7 @@
 """Utility functions for the IUP Performance Comparison application."""
 
-import numpy as np
 from config import ADJUSTMENT_LEVELS, CATEGORY_WEIGHTS
+from registry import REGISTRY
 
 def normalize_value(value, optimal_direction, min_val, max_val):
     """Normalize a value between 0 and 1."""
@@ -20,11 +20,18 @@ def calculate_parameter_score(value, adjustment, param_config, min_val, max_val)
     return normalized * adjustment_multiplier * param_config['weight']
 
 def get_min_max_values(all_data, param_key):
-    """Get minimum and maximum values for a parameter across all IUPs."""
-    values = []
-    for iup_data in all_data.values():
-        if param_key in iup_data:
-            values.append(iup_data[param_key]['value'])
+    """Get minimum and maximum values for a parameter across all IUPs.
+    
+    ``all_data`` is either ``{iup: {param_key: {'value', 'adjustment'}}}`` or a
+    ``storage.Store``, whose indexed parameter column is read instead.
+    """
+    if hasattr(all_data, 'parameter_values'):
+        values = list(all_data.parameter_values(param_key).values())
+    else:
+        values = []
+        for iup_data in all_data.values():
+            if param_key in iup_data:
+                values.append(iup_data[param_key]['value'])
     
     if not values:
         return 0, 1  # Default values if no data
@@ -48,16 +55,17 @@ def calculate_category_score(category_data, category_params, all_data):
     total_weight = 0
     
     for subcategory, params in category_params.items():
-        for param_key, param_config in params.items():
+        for param_key in params:
             if param_key in category_data:
+                spec = REGISTRY[param_key]
                 value = category_data[param_key]['value']
                 adjustment = category_data[param_key]['adjustment']
                 
                 min_val, max_val = get_min_max_values(all_data, param_key)
                 
-                score = calculate_parameter_score(value, adjustment, param_config, min_val, max_val)
+                score = calculate_parameter_score(value, adjustment, spec, min_val, max_val)
                 total_score += score
-                total_weight += param_config['weight']
+                total_weight += spec.weight
     
     return total_score / total_weight if total_weight > 0 else 0
 
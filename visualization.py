@@ -1,40 +1,84 @@
-"""Visualization functions for the IUP Performance Comparison application."""
+"""Visualization functions for the IUP Performance Comparison application.
 
-import plotly.graph_objects as go
-import plotly.express as px
-from config import CHART_CONFIG, IUP_LIST
+Plotly is imported by the chart builders on first use, so importing this
+module (and rendering sections without charts) does not load it.
+"""
 
-def create_radar_chart(category_scores, category):
-    """Create radar chart for category comparison across IUPs."""
+from cache import FIGURE_CACHE, memoized
+from config import ADJUSTMENT_LEVELS, CHART_CONFIG, DOWNSAMPLING_CONFIG, LABELS
+from downsample import downsample, top_n
+from profiling import PROFILER
+from registry import REGISTRY
+
+def _closed(values):
+    """Get radar ``r`` values with the first point repeated; NaN becomes a gap."""
+    r = [None if value != value else float(value) for value in values]
+    return r + r[:1]
+
+@PROFILER.timed()
+def create_radar_chart(names, axes, scores, title=None):
+    """Create one radar chart comparing IUPs (or IUP groups) on every axis.
+    
+    ``scores`` holds one row per name and one column per axis (category or
+    subcategory), NaN where there is no data. Not memoized: callers own the
+    figure and ``update_radar_chart`` changes it in place.
+    """
+    import plotly.graph_objects as go
+    
     fig = go.Figure()
+    theta = list(axes) + list(axes[:1])
     
-    for iup in IUP_LIST:
-        if iup in category_scores:
-            scores = category_scores[iup]
-            if category in scores:  # Add check for category
-                fig.add_trace(go.Scatterpolar(
-                    r=[scores[category]],  # Single score for the category
-                    theta=[category],
-                    name=iup,
-                    fill='toself'
-                ))
+    for name, row in zip(names, scores):
+        fig.add_trace(go.Scatterpolar(
+            r=_closed(row),
+            theta=theta,
+            name=name,
+            fill='toself'
+        ))
     
     fig.update_layout(
         polar=dict(
             radialaxis=dict(
                 visible=True,
-                range=[0, 1]
+                # Fixed so in-place updates never rescale; adjustments can lift scores above 1
+                range=[0, max(ADJUSTMENT_LEVELS.values())]
             )
         ),
         showlegend=True,
-        title=f"{category} Performance Comparison",
+        title=title,
+        # Keeps legend and zoom state in the browser across updates
+        uirevision='radar',
         **CHART_CONFIG
     )
     
     return fig
 
-def create_bar_chart(parameter_values, parameter_name, unit):
-    """Create bar chart for parameter comparison across IUPs."""
+@PROFILER.timed()
+def update_radar_chart(fig, names, axes, scores):
+    """Replace the scores of a ``create_radar_chart`` figure in place.
+    
+    Returns False, leaving the figure untouched, when its traces or axes
+    differ from ``names`` and ``axes`` and it has to be rebuilt instead.
+    """
+    theta = tuple(axes) + tuple(axes[:1])
+    if [trace.name for trace in fig.data] != list(names) or any(trace.theta != theta for trace in fig.data):
+        return False
+    
+    with fig.batch_update():
+        for trace, row in zip(fig.data, scores):
+            trace.r = _closed(row)
+    return True
+
+@PROFILER.timed()
+@memoized(FIGURE_CACHE, CHART_CONFIG, DOWNSAMPLING_CONFIG)
+def create_bar_chart(parameter_values, parameter_name, unit, direction=1.0):
+    """Create bar chart for parameter comparison across IUPs.
+
+    ``direction`` is the parameter's ``ParameterSpec.direction``, so that the
+    bars kept for long selections are the best ones rather than the largest.
+    """
+    import plotly.graph_objects as go
+    
     fig = go.Figure()
     
     iups = []
@@ -47,6 +91,10 @@ def create_bar_chart(parameter_values, parameter_name, unit):
             values.append(data['value'])
             colors.append('rgba(31, 119, 180, 0.8)')  # Default blue color
     
+    # Fold the long tail into a single bar to keep the figure small
+    iups, values = top_n(iups, values, others_label=LABELS['analysis']['others'], direction=direction)
+    colors = colors[:len(values)]
+    
     if values:  # Only create chart if there are values
         fig.add_trace(go.Bar(
             x=iups,
@@ -65,19 +113,31 @@ def create_bar_chart(parameter_values, parameter_name, unit):
     
     return fig
 
+@PROFILER.timed()
+@memoized(FIGURE_CACHE, CHART_CONFIG, DOWNSAMPLING_CONFIG)
 def create_trend_chart(historical_data, parameter_name, unit):
     """Create line chart for historical trend analysis."""
+    import plotly.graph_objects as go
+    
     fig = go.Figure()
     
-    for iup in IUP_LIST:
-        if iup in historical_data:
-            data = historical_data[iup]
-            fig.add_trace(go.Scatter(
-                x=list(data.keys()),
-                y=list(data.values()),
-                mode='lines+markers',
-                name=iup
-            ))
+    series = {
+        iup: downsample(list(points.keys()), list(points.values()))
+        for iup, points in historical_data.items()
+    }
+    
+    # Large figures go to WebGL and drop per-point markers
+    total_points = sum(len(y) for x, y in series.values())
+    large = total_points > DOWNSAMPLING_CONFIG['webgl_threshold']
+    trace_type = go.Scattergl if large else go.Scatter
+    
+    for iup, (x, y) in series.items():
+        fig.add_trace(trace_type(
+            x=x,
+            y=y,
+            mode='lines' if large else 'lines+markers',
+            name=iup
+        ))
     
     fig.update_layout(
         title=f"{parameter_name} Historical Trend",
@@ -88,9 +148,21 @@ def create_trend_chart(historical_data, parameter_name, unit):
     
     return fig
 
-def create_comparison_table(data, category):
-    """Create comparison table for parameters within a category."""
-    headers = ['Parameter', 'Unit'] + IUP_LIST + ['Best Performer']
+@PROFILER.timed()
+@memoized(FIGURE_CACHE)
+def create_comparison_table(data, category, best_performers=None, iups=None):
+    """Create comparison table for parameters within a category.
+    
+    ``iups`` sets the IUP (or IUP group) columns and defaults to every IUP
+    found in ``data``. ``best_performers`` maps parameter keys to precomputed
+    best IUPs (e.g. from ``ranking.RankingIndex``); otherwise the best value
+    is picked using each parameter's optimal direction.
+    """
+    if iups is None:
+        iups = list(dict.fromkeys(
+            iup for param_data in data.values() for iup in param_data['values']
+        ))
+    headers = ['Parameter', 'Unit'] + list(iups) + ['Best Performer']
     rows = []
     
     for param_key, param_data in data.items():
@@ -100,7 +172,7 @@ def create_comparison_table(data, category):
         ]
         
         values = {}
-        for iup in IUP_LIST:
+        for iup in iups:
             if iup in param_data['values'] and 'value' in param_data['values'][iup]:
                 value = param_data['values'][iup]['value']
                 values[iup] = value
@@ -109,8 +181,11 @@ def create_comparison_table(data, category):
                 row.append("-")
         
         # Determine best performer
-        if values:
-            best_iup = max(values.items(), key=lambda x: x[1])[0]
+        if best_performers is not None and param_key in best_performers:
+            row.append(best_performers[param_key] or "-")
+        elif values:
+            direction = REGISTRY[param_key].direction if param_key in REGISTRY else 1.0
+            best_iup = max(values.items(), key=lambda x: x[1] * direction)[0]
             row.append(best_iup)
         else:
             row.append("-")
@@ -118,3 +193,30 @@ def create_comparison_table(data, category):
         rows.append(row)
     
     return headers, rows
+
+@PROFILER.timed()
+@memoized(FIGURE_CACHE, CHART_CONFIG)
+def create_rank_probability_chart(iups, rank_probabilities):
+    """Create heatmap of the probability of each IUP ending at each rank."""
+    import plotly.graph_objects as go
+    
+    fig = go.Figure(go.Heatmap(
+        z=[[float(p) for p in row] for row in rank_probabilities],
+        x=[f"#{rank + 1}" for rank in range(len(iups))],
+        y=list(iups),
+        zmin=0,
+        zmax=1,
+        colorscale='Blues',
+        text=[[f"{p:.0%}" for p in row] for row in rank_probabilities],
+        texttemplate="%{text}"
+    ))
+    
+    fig.update_layout(
+        title="Rank Probability",
+        xaxis_title="Rank",
+        yaxis_title="IUP",
+        yaxis_autorange='reversed',
+        **CHART_CONFIG
+    )
+    
+    return fig